@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+
+def timestack(
+    frames: int,
+    size: int,
+    bands: int = 1,
+    dtype: str = "float32",
+    nan_fraction: float = 0.0,
+    seed: int = 0,
+) -> xr.DataArray:
+    """
+    A synthetic (``time``, ``band``, ``y``, ``x``) timestack that compresses like real imagery.
+
+    Each frame is a smooth pattern drifting over time, plus a little noise, so neighboring
+    pixels and frames are similar but not identical. ``nan_fraction`` of each frame is
+    covered by blobs of NaN "clouds" (floats only). Integer data fills most of its dtype's
+    range; float data looks like reflectance, from 750 to 2250.
+    """
+    dtype = np.dtype(dtype)
+    if nan_fraction and dtype.kind != "f":
+        raise ValueError(f"Only floats can have NaNs, not {dtype}")
+
+    rng = np.random.default_rng(seed)
+    y, x = np.linspace(0, 1, size)[:, None], np.linspace(0, 1, size)[None]
+    if dtype.kind in "iu":
+        info = np.iinfo(dtype)
+        span = float(info.max) - float(info.min)
+        offset, scale = info.min + span * 0.5, span * 0.4
+    else:
+        offset, scale = 1500, 750
+
+    data = np.empty((frames, bands, size, size), dtype=dtype)
+    for i in range(frames):
+        t = i / frames
+        for band in range(bands):
+            phase = band / bands
+            field = np.sin(2 * np.pi * (3 * x + t + phase)) * np.cos(
+                2 * np.pi * (2 * y - t)
+            )
+            field = field + rng.normal(0, 0.05, field.shape)
+            data[i, band] = np.clip(field, -1, 1) * scale + offset
+        if nan_fraction:
+            clouds = np.sin(2 * np.pi * (5 * x + 2 * t)) * np.sin(2 * np.pi * 4 * y)
+            data[i, :, clouds > np.quantile(clouds, 1 - nan_fraction)] = np.nan
+
+    return xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=frames, freq="5D")},
+    )
@@ -0,0 +1,93 @@
+"""
+Each phase of rendering one frame, timed separately.
+
+These call into private parts of `geogif.gif`, so they may need updating when those change.
+"""
+
+from __future__ import annotations
+
+import importlib
+
+import matplotlib.cm
+import numpy as np
+
+from .common import timestack
+
+# `geogif.gif` itself is shadowed by the `gif` function
+gif_module = importlib.import_module("geogif.gif")
+
+
+class Phases:
+    params = (
+        ["uint8", "uint16", "float32", "float64"],
+        [1, 3],
+        [0.0, 0.25],
+        [256, 1024],
+    )
+    param_names = ["dtype", "bands", "nan_fraction", "size"]
+
+    def setup(self, dtype, bands, nan_fraction, size):
+        if nan_fraction and np.dtype(dtype).kind != "f":
+            raise NotImplementedError("Only floats can have NaNs")
+        arr = timestack(1, size, bands, dtype, nan_fraction)
+        self.frame = arr.data[0]
+        self.vmin, self.vmax = gif_module._resolve_limits(
+            arr.data, None, None, robust=True
+        )
+        # Single-band data gets a colormap; RGB doesn't
+        self.cmap = matplotlib.cm.get_cmap("viridis") if bands == 1 else None
+        self.rgba = gif_module._render_frame(
+            self.frame, self.vmin, self.vmax, self.cmap
+        )
+
+        self.fnt = gif_module._get_font(0.15, ["2021-01-01"], size)
+        self.label = "2021-01-01"
+        # Warm the label cache, like every frame after the first with the same timestamp
+        gif_module._draw_label(
+            self.rgba.copy(), self.label, self.fnt, "ul", (255, 255, 255), (0, 0, 0)
+        )
+
+        if self.cmap is not None:
+            self.palette = gif_module._colormap_palette(
+                self.cmap, True, (255, 255, 255), (0, 0, 0)
+            )
+            match = None
+        else:
+            self.palette = gif_module._rgb_palette(
+                [self.rgba], True, (255, 255, 255), (0, 0, 0)
+            )
+            match = gif_module._color_matcher(self.palette)
+        indices, _ = gif_module._render_indexed_frame(
+            self.frame, self.vmin, self.vmax, self.palette, match
+        )
+        self.img = gif_module._palette_image(indices, self.palette)
+
+    def time_rescale(self, *args):
+        gif_module._rescale(self.frame, self.vmin, self.vmax)
+
+    def time_colormap(self, *args):
+        gif_module._render_frame(self.frame, self.vmin, self.vmax, self.cmap)
+
+    def time_label(self, *args):
+        gif_module._draw_label(
+            self.rgba, self.label, self.fnt, "ul", (255, 255, 255), (0, 0, 0)
+        )
+
+    def time_render_label(self, *args):
+        # Drawing a new timestamp's text, which happens once per distinct label
+        gif_module._render_label(
+            self.rgba.shape[1::-1],
+            self.label,
+            self.fnt,
+            "ul",
+            (255, 255, 255),
+            (0, 0, 0),
+        )
+
+    def time_encode(self, *args):
+        gif_module._encode_gif_frame(self.img, self.palette.missing, 6)
+
+    def track_encoded_size(self, *args):
+        return len(gif_module._encode_gif_frame(self.img, self.palette.missing, 6))
+
+    track_encoded_size.unit = "bytes"
@@ -0,0 +1,88 @@
+"""
+Whole animations with `gif` and `dgif`: wall time, peak memory, and output size.
+"""
+
+from __future__ import annotations
+
+import io
+
+import dask
+
+from geogif import dgif, gif
+
+from .common import timestack
+
+
+class Gif:
+    params = ([10, 100], [128, 512], [1, 3], [True, False])
+    param_names = ["frames", "size", "bands", "labels"]
+
+    def setup(self, frames, size, bands, labels):
+        self.arr = timestack(frames, size, bands, nan_fraction=0.1)
+        self.kwargs = dict(
+            cmap="viridis" if bands == 1 else None,
+            date_format="%Y-%m-%d" if labels else None,
+        )
+
+    def _gif(self) -> bytes:
+        out = io.BytesIO()
+        gif(self.arr, to=out, **self.kwargs)
+        return out.getvalue()
+
+    def time_gif(self, *args):
+        self._gif()
+
+    def peakmem_gif(self, *args):
+        self._gif()
+
+    def track_size(self, *args):
+        return len(self._gif())
+
+    track_size.unit = "bytes"
+
+
+class Dgif:
+    params = (["threads", "sync"], [10, 100], [1, 3], [True, False])
+    param_names = ["scheduler", "frames", "bands", "parallel"]
+
+    def setup(self, scheduler, frames, bands, parallel):
+        arr = timestack(frames, 512, bands, nan_fraction=0.1)
+        self.delayed = dgif(
+            arr.chunk({"time": 10}),
+            bytes=True,
+            parallel=parallel,
+            cmap="viridis" if bands == 1 else None,
+        )
+        self.scheduler = scheduler
+
+    def _compute(self) -> bytes:
+        return dask.compute(self.delayed, scheduler=self.scheduler)[0]
+
+    def time_dgif(self, *args):
+        self._compute()
+
+    def peakmem_dgif(self, *args):
+        self._compute()
+
+    def track_size(self, *args):
+        return len(self._compute())
+
+    track_size.unit = "bytes"
+
+
+class Workers:
+    "How rendering and compressing frames scales with threads"
+
+    params = ([1, 2, 4, 8],)
+    param_names = ["workers"]
+
+    def setup(self, workers):
+        self.arr = timestack(100, 512, nan_fraction=0.1)
+
+    def time_gif(self, workers):
+        gif(self.arr, to=io.BytesIO(), workers=workers, cmap="viridis")
+
+    def time_dgif(self, workers):
+        # All one chunk along time, which `dgif` splits into several tasks
+        delayed = dgif(self.arr.chunk(), bytes=True, cmap="viridis")
+        dask.compute(delayed, scheduler="threads", num_workers=workers)
@@ -1,4 +1,4 @@
-from .gif import dgif, gif
+from .gif import dgif, dgif_many, encode, gif
 
 # Single-source version from pyproject.toml: https://github.com/python-poetry/poetry/issues/273#issuecomment-769269759
 # Note that this will be incorrect for local installs
@@ -8,4 +8,4 @@ __version__ = importlib.metadata.version("geogif")
 del importlib
 
 
-__all__ = ["gif", "dgif"]
+__all__ = ["gif", "dgif", "dgif_many", "encode"]
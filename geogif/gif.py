@@ -1,23 +1,259 @@
 from __future__ import annotations
 
+import collections
+import contextlib
+import contextvars
+import functools
 import io
+import itertools
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING, BinaryIO, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Sequence,
+)
 
 import dask
 import dask.array as da
+import dask.core
 import matplotlib.cm
 import matplotlib.colors
 import numpy as np
+import pandas as pd
 import xarray as xr
 from dask.delayed import Delayed
 from PIL import Image, ImageDraw, ImageFont
 from typing_extensions import Literal
-from xarray.plot.utils import _rescale_imshow_rgb
 
 if TYPE_CHECKING:
     import IPython.display
 
+# Same as `xarray.plot.utils.ROBUST_PERCENTILE`
+_ROBUST_PERCENTILE = 2.0
+
+
+class _Stats:
+    """
+    Statistics about rendering one animation (or one task of it), collected while it's the
+    current `_STATS`.
+
+    ``stages`` maps each stage name to its total seconds and number of calls.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.stages: dict[str, list[float]] = {}
+        self.seconds = 0.0
+        self.frames: int | None = None
+        self.bytes: int | None = None
+        self.memory: int | None = None
+        # Whether any other `_measuring` ran at the same time, in any thread
+        self.overlapped = False
+
+    def add(self, stage: str, seconds: float, calls: int = 1) -> None:
+        with self.lock:
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += calls
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "memory": self.memory,
+            "stages": {
+                stage: {"seconds": seconds, "calls": int(calls)}
+                for stage, (seconds, calls) in self.stages.items()
+            },
+            "tasks": 1,
+        }
+
+
+_STATS: contextvars.ContextVar[_Stats | None] = contextvars.ContextVar(
+    "geogif_stats", default=None
+)
+# The stage currently running in this context, as a mutable ``[name, start time]``
+_STAGE: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "geogif_stage", default=None
+)
+# Every `_Stats` being measured right now, in any thread
+_MEASURING: set[_Stats] = set()
+_MEASURING_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def _measuring(callback: Callable[[dict], Any] | None = None) -> Iterator[_Stats]:
+    """
+    Collect `_Stats` about everything run within this context (in this thread, or in `_frame_map`).
+
+    If ``callback`` is given, it's called with them (as a dict) at the end, unless there was an error.
+
+    `tracemalloc` only traces the whole process, so memory is only recorded if no other
+    measurement ran at the same time (like another dask task, in another thread). It still
+    counts anything else the process allocated meanwhile.
+    """
+    stats = _Stats()
+    stats_token, stage_token = _STATS.set(stats), _STAGE.set(None)
+    with _MEASURING_LOCK:
+        for other in _MEASURING:
+            other.overlapped = stats.overlapped = True
+        _MEASURING.add(stats)
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        if not stats.overlapped and hasattr(tracemalloc, "reset_peak"):  # Python >= 3.9
+            tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - start
+        with _MEASURING_LOCK:
+            _MEASURING.discard(stats)
+            if tracing and not stats.overlapped:
+                stats.memory = tracemalloc.get_traced_memory()[1] - start_memory
+        _STAGE.reset(stage_token)
+        _STATS.reset(stats_token)
+    if callback is not None:
+        callback(stats.as_dict())
+
+
+@contextlib.contextmanager
+def _stage(name: str) -> Iterator[None]:
+    """
+    Time this context as stage ``name`` of the current `_Stats`, if any.
+
+    Stages don't overlap: while another stage runs inside this one, this one's clock is paused.
+    Re-entering the stage that's already running is ignored.
+    """
+    stats = _STATS.get()
+    parent = _STAGE.get()
+    if stats is None or (parent is not None and parent[0] == name):
+        yield
+        return
+
+    start = time.perf_counter()
+    if parent is not None:
+        stats.add(parent[0], start - parent[1], calls=0)
+    current = [name, start]
+    token = _STAGE.set(current)
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        stats.add(name, end - current[1])
+        _STAGE.reset(token)
+        if parent is not None:
+            parent[1] = end
+
+
+def _staged(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    "Decorate a function to run as stage ``name`` (see `_stage`) when stats are being collected"
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _STATS.get() is None:
+                return func(*args, **kwargs)
+            with _stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _record_output(frames: int, nbytes: int | None) -> None:
+    "Note the number of frames and size of the output in the current `_Stats`, if any"
+    stats = _STATS.get()
+    if stats is not None:
+        stats.frames, stats.bytes = frames, nbytes
+
+
+def _tell(fp: BinaryIO) -> int | None:
+    "Position of ``fp``, or None if it can't tell"
+    try:
+        return fp.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _bytes_written(fp: BinaryIO, start: int | None) -> int | None:
+    "How far ``fp`` has moved since it was at ``start``, if it can tell"
+    end = _tell(fp)
+    return end - start if start is not None and end is not None else None
+
+
+def _merge_stats(stats: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Combine the stats of many tasks into one summary.
+
+    Seconds, calls, and tasks are summed; ``memory`` is the largest of any task, and ``frames`` and
+    ``bytes`` come from whichever task wrote the output.
+    """
+    merged: dict[str, Any] = {
+        "seconds": 0.0,
+        "frames": None,
+        "bytes": None,
+        "memory": None,
+        "stages": {},
+        "tasks": 0,
+    }
+    for s in stats:
+        merged["seconds"] += s["seconds"]
+        merged["tasks"] += s["tasks"]
+        for key in ("frames", "bytes"):
+            if s[key] is not None:
+                merged[key] = s[key]
+        if s["memory"] is not None:
+            merged["memory"] = max(merged["memory"] or 0, s["memory"])
+        for stage, totals in s["stages"].items():
+            into = merged["stages"].setdefault(stage, {"seconds": 0.0, "calls": 0})
+            into["seconds"] += totals["seconds"]
+            into["calls"] += totals["calls"]
+    return merged
+
+
+def _check_tiles(
+    tile_size: int | None,
+    format: str,
+    palette: str,
+    cmap: matplotlib.colors.Colormap | None,
+    delta: bool,
+) -> None:
+    "Check that ``tile_size`` (if given) works with the other arguments to `gif` or `dgif`"
+    if tile_size is None:
+        return
+    assert tile_size > 0, f"tile_size must be positive, not {tile_size}"
+    if format != "gif":
+        raise ValueError(f"`tile_size` only works for GIFs, not format={format!r}")
+    if palette == "frame" and cmap is None:
+        raise ValueError(
+            "`tile_size` needs one palette for the whole GIF. Use `palette='global'` instead."
+        )
+    if delta:
+        raise ValueError("`tile_size` can't be used with `delta=True`")
+
 
 def _validate_arr_for_gif(
     arr: xr.DataArray,
@@ -61,14 +297,11 @@ def _validate_arr_for_gif(
                 f"Coordinates for the {time_coord.name} dimension are not datetimes, or don't support `strftime`. "
                 "Set `date_format=False`"
             )
-        assert (
-            date_position
-            in (
-                "ul",
-                "ur",
-                "ll",
-                "lr",
-            )
+        assert date_position in (
+            "ul",
+            "ur",
+            "ll",
+            "lr",
         ), f"date_position must be one of ('ul', 'ur', 'll', 'lr'), not {date_position}."
 
         if isinstance(date_size, int):
@@ -82,283 +315,3444 @@ def _validate_arr_for_gif(
                 f"date_size must be int or float, not {type(date_size)}: {date_size}"
             )
 
-    return (arr, cmap)
+    return (arr, cmap)
+
+
+def _select_frames(
+    arr: xr.DataArray,
+    max_frames: int | None,
+    resample: str | None,
+    max_duration: float | None,
+    fps: int,
+) -> xr.DataArray:
+    """
+    Pick which frames of a timestack to animate, using only its time coordinate.
+
+    With ``resample``, keeps the first frame in each period of that pandas frequency. Then, if
+    there are more than ``max_frames`` (or ``max_duration`` seconds at ``fps``) left, keeps that
+    many, evenly spaced. Selecting is lazy, so with dask, the dropped frames are never computed.
+    """
+    index = np.arange(arr.shape[0])
+    if resample is not None:
+        times = arr[arr.dims[0]].to_index()
+        if not isinstance(times, (pd.DatetimeIndex, pd.TimedeltaIndex)):
+            raise TypeError(
+                f"Coordinates for the {arr.dims[0]} dimension must be datetimes or timedeltas "
+                f"to resample them, not {times.dtype}"
+            )
+        index = pd.Series(index, index=times).resample(resample).first().dropna()
+        index = index.to_numpy().astype(int)
+
+    limits = []
+    if max_frames is not None:
+        assert max_frames > 0, f"max_frames must be > 0, not {max_frames}"
+        limits.append(max_frames)
+    if max_duration is not None:
+        assert max_duration > 0, f"max_duration must be > 0, not {max_duration}"
+        limits.append(max(int(max_duration * fps), 1))
+    if limits and len(index) > min(limits):
+        keep = np.linspace(0, len(index) - 1, min(limits)).round().astype(int)
+        index = index[keep]
+
+    if len(index) == arr.shape[0]:
+        return arr
+    return arr.isel({arr.dims[0]: index})
+
+
+def _downsample(arr: xr.DataArray, max_size: int | None, scale: int) -> xr.DataArray:
+    """
+    Shrink the ``y`` and ``x`` dimensions of a (``time``, ``band``, ``y``, ``x``) array by a whole-number factor.
+
+    The factor is ``scale``, or larger if needed to fit within ``max_size``. Each block of pixels is
+    averaged, ignoring NaNs (so a pixel is only missing if its whole block was), and partial blocks
+    at the edges are kept. Integers are rounded back to their own dtype (they can't be missing),
+    so the smaller array doesn't take more memory per pixel, and 8- and 16-bit data can still use
+    the fast paths for integers. Booleans take the majority value. Works lazily on dask arrays.
+    """
+    assert (
+        isinstance(scale, int) and scale >= 1
+    ), f"scale must be an int >= 1, not {scale!r}"
+    factor = scale
+    if max_size is not None:
+        assert max_size > 0, f"max_size must be > 0, not {max_size}"
+        factor = max(factor, -(-max(arr.shape[-2:]) // max_size))
+    if factor == 1:
+        return arr
+
+    coarse = arr.coarsen(
+        {arr.dims[-2]: factor, arr.dims[-1]: factor}, boundary="pad"
+    ).mean()
+    if arr.dtype.kind == "b":
+        coarse = coarse >= 0.5
+    elif arr.dtype.kind in "iu":
+        # Every block has at least one pixel, and integers are never NaN
+        coarse = coarse.round().astype(arr.dtype)
+    return coarse
+
+
+@functools.lru_cache(maxsize=64)
+def _default_font(size: int) -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
+    "Pillow's default font at ``size``, loaded only once"
+    return ImageFont.load_default(size=size)
+
+
+def _get_font(
+    date_size: int | float, labels: Sequence[str], image_width: int
+) -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
+    """
+    Get an appropriately-sized font for the requested ``date_size``
+
+    When ``date_size`` is a float, figure out a font size that will make the width of the
+    text that fraction of the width of the image.
+    """
+    if isinstance(date_size, int):
+        # absolute font size
+        return _default_font(date_size)
+
+    return _fit_font(date_size, max(labels, key=len), image_width)
+
+
+@functools.lru_cache(maxsize=256)
+def _fit_font(
+    date_size: float, test_label: str, image_width: int
+) -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
+    """
+    The smallest font (of at least size 5) where ``test_label`` is wider than ``date_size`` of ``image_width``.
+
+    Fonts are shared between threads, so they're only measured under `_TEXT_LOCK`.
+    """
+    target_width = date_size * image_width
+
+    fnt = _default_font(5)
+    if not isinstance(fnt, ImageFont.FreeTypeFont):
+        # NOTE: if Pillow doesn't have FreeType support, we won't get a font
+        # with adjustable size. So trying to increase the size would just
+        # loop forever.
+        return fnt
+
+    def text_width(size: int) -> float:
+        try:
+            font = _default_font(size)
+        except OSError:
+            # too big to load: treat it as too wide
+            return np.inf
+        with _TEXT_LOCK:
+            bbox = font.getbbox(test_label)
+        return bbox[2] - bbox[0]
+
+    width = text_width(5)
+    if width == 0 or width > target_width:
+        # zero-width could happen if `test_label` is an empty string or non-printable character
+        return fnt
+
+    # Text width grows about linearly with font size, so start from a scaled estimate,
+    # widen until it's too big, then binary search for the first size that's too big.
+    lo = 5
+    hi = max(int(np.ceil(5 * target_width / width)), lo + 1)
+    while text_width(hi) <= target_width:
+        lo, hi = hi, hi * 2
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if text_width(mid) > target_width:
+            hi = mid
+        else:
+            lo = mid
+
+    try:
+        return _default_font(hi)
+    except OSError as e:
+        raise RuntimeError(f"Invalid font size: {hi}") from e
+
+
+def _resolve_limits(
+    data: np.ndarray, vmin: float | None, vmax: float | None, robust: bool
+) -> tuple[float | None, float | None]:
+    """
+    Figure out the ``vmin`` and ``vmax`` to use for the whole animation, so frames can be rescaled independently.
+
+    Follows the same rules as xarray's ``imshow`` (and what `gif` has always done):
+    with ``robust``, missing limits come from the 2nd/98th percentiles; otherwise they
+    default to the data's min and max. Returns ``(None, None)`` for boolean data, which
+    isn't rescaled.
+    """
+    if data.dtype.kind == "b":
+        return None, None
+    vmin, vmax = _as_limit(vmin), _as_limit(vmax)
+
+    if not robust and vmin is None and vmax is None:
+        vmin = np.nanmin(data)
+        vmax = np.nanmax(data)
+
+    if robust:
+        percentile = np.nanpercentile
+        if _has_int_lut(data) and data.size > 0:
+            percentile = _int_percentile
+        if vmax is None:
+            vmax = percentile(data, 100 - _ROBUST_PERCENTILE)
+        if vmin is None:
+            vmin = percentile(data, _ROBUST_PERCENTILE)
+    elif vmax is None:
+        vmax = 255 if np.issubdtype(data.dtype, np.integer) else 1
+        if vmax < vmin:
+            raise ValueError(
+                f"vmin={vmin!r} is less than the default vmax ({vmax!r}) - you must supply "
+                "a vmax > vmin in this case."
+            )
+    elif vmin is None:
+        vmin = 0
+        if vmin > vmax:
+            raise ValueError(
+                f"vmax={vmax!r} is less than the default vmin (0) - you must supply "
+                "a vmin < vmax in this case."
+            )
+    return vmin, vmax
+
+
+def _as_limit(limit: Any) -> Any:
+    "Per-band limits (any sequence or array of them) as a tuple; single limits unchanged"
+    if limit is not None and np.ndim(limit) > 0:
+        return tuple(np.asarray(limit).tolist())
+    return limit
+
+
+def _band_limit(limit: Any, band: int) -> Any:
+    "The limit for ``band``, from per-band limits or a single limit for every band"
+    limit = _as_limit(limit)
+    return limit[band] if isinstance(limit, tuple) else limit
+
+
+@_staged("limits")
+def _stretch_limits(
+    data: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    robust: bool,
+    robust_method: Literal["histogram", "exact"] = "exact",
+    per_band: bool = False,
+    tile_size: int | None = None,
+) -> tuple[Any, Any]:
+    """
+    `_resolve_limits` of a whole (``time``, ``band``, ``y``, ``x``) array.
+
+    With ``per_band`` (and more than one band), each band gets its own limits, and they're
+    returned as tuples. With ``robust_method="histogram"``, percentiles are estimated by
+    `_streaming_limits` instead (going tile-by-tile with ``tile_size``).
+    """
+    if per_band and data.shape[1] > 1 and data.dtype.kind != "b":
+        limits = [
+            _stretch_limits(
+                data[:, slice(band, band + 1)],
+                _band_limit(vmin, band),
+                _band_limit(vmax, band),
+                robust,
+                robust_method,
+                tile_size=tile_size,
+            )
+            for band in range(data.shape[1])
+        ]
+        return tuple(lo for lo, _ in limits), tuple(hi for _, hi in limits)
+
+    needs_percentiles = robust and (vmin is None or vmax is None)
+    if needs_percentiles and robust_method == "histogram" and data.dtype.kind != "b":
+        vmin, vmax = _streaming_limits(data, vmin, vmax, tile_size)
+    return _resolve_limits(data, vmin, vmax, robust)
+
+
+def _int_values(dtype: np.dtype) -> np.ndarray:
+    "Every possible value of 8- or 16-bit integer ``dtype``, in order of their `_unsigned` views"
+    return np.arange(1 << (8 * dtype.itemsize), dtype=_unsigned(dtype)).view(dtype)
+
+
+def _value_counts(data: np.ndarray) -> np.ndarray:
+    "How many times each of the `_int_values` occurs in 8- or 16-bit integer ``data``"
+    return np.bincount(
+        data.view(_unsigned(data.dtype)).ravel(),
+        minlength=1 << (8 * data.dtype.itemsize),
+    )
+
+
+def _counts_percentile(counts: np.ndarray, dtype: np.dtype, q: float) -> np.float64:
+    """
+    ``np.percentile(data, q)`` of 8- or 16-bit integer data, from its `_value_counts`.
+
+    Gives exactly the same result as NumPy, without sorting (or partitioning) the data.
+    NaN if there's no data.
+    """
+    values = _int_values(dtype)
+    order = np.argsort(values, kind="stable")
+    ends = np.cumsum(counts[order])
+    size = int(ends[-1])
+    if size == 0:
+        return np.float64(np.nan)
+
+    # Interpolate between the values on either side, the same way NumPy does
+    index = q / 100 * (size - 1)
+    below = np.floor(index)
+    t = index - below
+    above = min(below + 1, size - 1)
+    a, b = values[order[np.searchsorted(ends, [below, above], side="right")]]
+    a, b = np.float64(a), np.float64(b)
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def _int_percentile(data: np.ndarray, q: float) -> np.float64:
+    "``np.percentile(data, q)`` for 8- or 16-bit integer data, exactly, by `_counts_percentile`"
+    return _counts_percentile(_value_counts(data), data.dtype, q)
+
+
+def _count_limits(
+    counts: np.ndarray, dtype: np.dtype, vmin: float | None, vmax: float | None
+) -> tuple[Any, Any]:
+    "Fill in missing robust limits of 8- or 16-bit integer data from its `_value_counts`"
+    if vmin is None:
+        vmin = _counts_percentile(counts, dtype, _ROBUST_PERCENTILE)
+    if vmax is None:
+        vmax = _counts_percentile(counts, dtype, 100 - _ROBUST_PERCENTILE)
+    return vmin, vmax
+
+
+def _tile_slices(
+    height: int, width: int, tile_size: int
+) -> Iterator[tuple[slice, slice]]:
+    "``(y, x)`` slices of the ``tile_size`` square tiles covering a ``height`` by ``width`` frame"
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield slice(y, y + tile_size), slice(x, x + tile_size)
+
+
+def _pieces(data: np.ndarray, tile_size: int | None) -> Iterator[np.ndarray]:
+    "Each frame of ``data``, or each (``band``, ``y``, ``x``) tile of each frame with ``tile_size``"
+    for frame in data:
+        if tile_size is None:
+            yield frame
+        else:
+            for tile in _tile_slices(*frame.shape[1:], tile_size):
+                yield frame[(slice(None),) + tile]
+
+
+def _streaming_limits(
+    data: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    tile_size: int | None = None,
+) -> tuple[Any, Any]:
+    """
+    Fill in missing robust limits from a histogram of ``data``, built one frame (or tile) at a time.
+
+    Unlike `np.nanpercentile`, this never copies or sorts the whole array. For 8- and 16-bit
+    integer data, the histogram counts every possible value, so the limits are exact.
+    Otherwise, like `_dask_robust_limits`, it takes two passes: one for the range of the
+    (finite) data, and one for a histogram with `_HISTOGRAM_BINS` bins across it.
+    """
+    if _has_int_lut(data):
+        counts = sum(_value_counts(frame) for frame in _pieces(data, tile_size))
+        return _count_limits(counts, data.dtype, vmin, vmax)
+
+    lo, hi = np.inf, -np.inf
+    for frame in _pieces(data, tile_size):
+        finite = frame[np.isfinite(frame)]
+        if finite.size:
+            lo, hi = min(lo, finite.min()), max(hi, finite.max())
+    if lo > hi:
+        # All NaN, like `np.nanpercentile`
+        return _histogram_limits(np.zeros(1), np.zeros(2), vmin, vmax)
+    if lo == hi:
+        # Every value is the same. (`np.histogram` would pad the range, which can round to nothing.)
+        return (lo if vmin is None else vmin, hi if vmax is None else vmax)
+
+    # Halving (which is exact for floats) keeps ``hi - lo`` from overflowing for huge values.
+    # Binning by hand, rather than with `np.histogram`, also works for tiny (subnormal) ranges.
+    scale = 2 if data.dtype.kind == "f" else 1
+    start, width = lo / scale, hi / scale - lo / scale
+    counts = np.zeros(_HISTOGRAM_BINS, dtype="int64")
+    for frame in _pieces(data, tile_size):
+        values = frame[np.isfinite(frame)] if frame.dtype.kind == "f" else frame.ravel()
+        bins = ((values / scale - start) / width * _HISTOGRAM_BINS).astype(np.intp)
+        np.clip(bins, 0, _HISTOGRAM_BINS - 1, out=bins)
+        counts += np.bincount(bins, minlength=_HISTOGRAM_BINS)
+    edges = np.linspace(start, hi / scale, _HISTOGRAM_BINS + 1) * scale
+    return _histogram_limits(counts, edges, vmin, vmax)
+
+
+# Number of bins used to estimate percentiles from a histogram. Error is at most
+# 1/65536th of the data's range---well under one of the 256 output levels.
+_HISTOGRAM_BINS = 2**16
+
+
+def _histogram_percentiles(
+    counts: np.ndarray, edges: np.ndarray, qs: Sequence[float]
+) -> list[float]:
+    """
+    Estimate percentiles of data (like `np.nanpercentile`) from its histogram.
+
+    Values are assumed to be spread evenly within each bin, and interpolated linearly.
+    Returns NaN if the histogram is empty (like `np.nanpercentile` on all-NaN data).
+    """
+    cdf = np.cumsum(counts)
+    n = cdf[-1] if len(cdf) else 0
+    if n == 0:
+        return [np.nan] * len(qs)
+
+    results = []
+    for q in qs:
+        rank = (
+            q / 100 * (n - 1)
+        )  # 0-based rank of the value, as numpy's "linear" method
+        i = min(int(np.searchsorted(cdf, rank, side="right")), len(counts) - 1)
+        before = cdf[i - 1] if i > 0 else 0
+        frac = min(max((rank - before + 0.5) / max(counts[i], 1), 0), 1)
+        results.append(float(edges[i] + frac * (edges[i + 1] - edges[i])))
+    return results
+
+
+def _histogram_limits(
+    counts: np.ndarray, edges: np.ndarray, vmin: float | None, vmax: float | None
+) -> tuple[float, float]:
+    "Fill in missing robust limits from a histogram of the data"
+    lo, hi = _histogram_percentiles(
+        counts, edges, [_ROBUST_PERCENTILE, 100 - _ROBUST_PERCENTILE]
+    )
+    return (lo if vmin is None else vmin, hi if vmax is None else vmax)
+
+
+_dhistogram_limits = dask.delayed(_histogram_limits, pure=True, nout=2)
+
+
+_dcount_limits = dask.delayed(_count_limits, pure=True, nout=2)
+_dtuple = dask.delayed(tuple, pure=True)
+
+
+def _dask_robust_limits(
+    data: da.Array | Sequence[da.Array],
+    vmin: float | None,
+    vmax: float | None,
+    per_band: bool = False,
+) -> tuple[Delayed, Delayed]:
+    """
+    Approximate the robust ``vmin`` and ``vmax`` of a dask array, without gathering it in one place.
+
+    For 8- and 16-bit integer data, one chunk-wise tree reduction counts every possible value,
+    which gives exact percentiles. Otherwise, two passes over the data: first the min and max,
+    then a histogram between them. Only these small results are combined to estimate the
+    percentiles.
+
+    Given several arrays, estimates the limits of all their values together. With ``per_band``,
+    the (``time``, ``band``, ``y``, ``x``) arrays get separate limits for each band, as tuples.
+    """
+    arrays = [data] if isinstance(data, da.Array) else list(data)
+    if per_band and arrays[0].shape[1] > 1:
+        limits = [
+            _dask_robust_limits(
+                [a[:, band] for a in arrays],
+                _band_limit(vmin, band),
+                _band_limit(vmax, band),
+            )
+            for band in range(arrays[0].shape[1])
+        ]
+        return _dtuple([lo for lo, _ in limits]), _dtuple([hi for _, hi in limits])
+
+    dtype = arrays[0].dtype
+    if all(a.dtype == dtype for a in arrays) and _has_int_lut(arrays[0]):
+        counts = sum(
+            da.bincount(
+                a.ravel().view(_unsigned(dtype)), minlength=1 << (8 * dtype.itemsize)
+            )
+            for a in arrays
+        )
+        return _dcount_limits(counts, dtype, vmin, vmax)
+
+    scale = 1
+    if any(a.dtype.kind == "f" for a in arrays):
+        # Infinite values would make the histogram's range infinite.
+        # Halving (which is exact) keeps ``hi - lo`` from overflowing for huge values.
+        arrays = [da.where(da.isfinite(a), a, np.nan) / 2 for a in arrays]
+        scale = 2
+    if len(arrays) == 1:
+        lo, hi = da.nanmin(arrays[0]), da.nanmax(arrays[0])
+    else:
+        lo = da.nanmin(da.stack([da.nanmin(a) for a in arrays]))
+        hi = da.nanmax(da.stack([da.nanmax(a) for a in arrays]))
+    histograms = [da.histogram(a, bins=_HISTOGRAM_BINS, range=(lo, hi)) for a in arrays]
+    counts = sum(counts for counts, _ in histograms)
+    edges = histograms[0][1]
+    return _dhistogram_limits(counts, edges * scale, vmin, vmax)
+
+
+def _rescale(frame: np.ndarray, vmin: float | None, vmax: float | None) -> np.ndarray:
+    "Scale ``[vmin .. vmax]`` to ``[0 .. 1]`` as float32, keeping NaNs. Booleans become 0 or 1."
+    if frame.dtype.kind == "b":
+        return frame.astype("f4")
+    if isinstance(vmin, tuple) or isinstance(vmax, tuple):
+        # Per-band limits, along the first axis
+        bands = (-1,) + (1,) * (frame.ndim - 1)
+        vmin = np.reshape(vmin, bands) if isinstance(vmin, tuple) else vmin
+        vmax = np.reshape(vmax, bands) if isinstance(vmax, tuple) else vmax
+    # float32 holds float32 and 16-bit integer data exactly, so scale those in float32
+    # (unless the limits don't fit). Scale anything wider in 64-bit float to avoid precision
+    # loss or integer over/underflow, then downcast to save memory (same as xarray does).
+    exact = (frame.dtype.itemsize <= 2 or frame.dtype == np.float32) and np.all(
+        np.maximum(np.abs(vmin), np.abs(vmax)) < np.finfo("f4").max
+    )
+    data = np.subtract(frame, vmin, dtype="f4" if exact else "f8")
+    np.divide(data, vmax - vmin, out=data)
+    np.clip(data, 0, 1, out=data)
+    return data.astype("f4", copy=False)
+
+
+def _has_int_lut(frame: np.ndarray) -> bool:
+    "Whether ``frame`` has few enough possible values to rescale with `_int_lut`"
+    return frame.dtype.kind in "iu" and frame.dtype.itemsize <= 2
+
+
+@functools.lru_cache(maxsize=16)
+def _int_lut(dtype: np.dtype, vmin: float, vmax: float, n: int) -> np.ndarray:
+    """
+    Table of the result of `_levels` (for ``n`` levels) for every possible value of 8- or 16-bit
+    integer ``dtype`` (see `_int_values`). Index it with the data viewed as `_unsigned`.
+
+    For ``n=0``, instead makes three tables of `_render_frame`'s RGB channel values, as uint32s
+    with the byte for that channel set (and alpha set in the first), which can be OR'd together
+    into RGBA pixels (with per-band limits, if ``vmin`` and ``vmax`` are tuples). Since each entry
+    goes through the same arithmetic as a whole frame would, the results are identical.
+    """
+    values = _int_values(dtype)
+    if n:
+        return _levels(_rescale(values, vmin, vmax), n)[0]
+    channels = np.zeros((3, len(values), 4), dtype="uint8")
+    for i in range(3):
+        data = _rescale(values, _band_limit(vmin, i), _band_limit(vmax, i))
+        channels[i, :, i] = data * 255
+    channels[0, :, 3] = 255
+    return channels.view("uint32")[..., 0]
+
+
+def _unsigned(dtype: np.dtype) -> np.dtype:
+    "Unsigned integer dtype the same size and byte order as ``dtype``, to view integer data as table indices"
+    return np.dtype(f"u{dtype.itemsize}").newbyteorder(dtype.byteorder)
+
+
+def _frame_levels(
+    frame: np.ndarray, vmin: float | None, vmax: float | None, n: int
+) -> tuple[np.ndarray, np.ndarray | None]:
+    "`_levels` of a rescaled (``y``, ``x``) frame"
+    if _has_int_lut(frame):
+        lut = _int_lut(frame.dtype, vmin, vmax, n)
+        return lut[frame.view(_unsigned(frame.dtype))], None
+    return _levels(_rescale(frame, vmin, vmax), n)
+
+
+def _levels(data: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Quantize rescaled ``[0 .. 1]`` data into ``n`` evenly-spaced integer levels.
+
+    Uses the same binning as matplotlib colormaps. Returns the (uint8, or uint16 if ``n > 256``)
+    level indices, and a mask of NaN pixels (None if there aren't any). NaNs get level 0.
+    """
+    nan = np.isnan(data)
+    scaled = data * np.float32(n)
+    np.minimum(scaled, n - 1, out=scaled)
+    if nan.any():
+        scaled[nan] = 0
+    else:
+        nan = None
+    return scaled.astype("uint8" if n <= 256 else "uint16", copy=False), nan
+
+
+# Lookup tables for each colormap, keyed by (id(cmap), n, bad color).
+# Entries are removed when their colormap is garbage-collected.
+_LUTS: dict[tuple[int, int, tuple[float, ...]], np.ndarray] = {}
+
+
+def _forget_luts(cmap_id: int) -> None:
+    for key in [k for k in _LUTS if k[0] == cmap_id]:
+        _LUTS.pop(key, None)
+
+
+def _colormap_lut(cmap: matplotlib.colors.Colormap, n: int) -> np.ndarray:
+    """
+    Colors of ``cmap`` at ``n`` evenly-spaced levels, as an (``n + 1``, 4) uint8 RGBA array.
+
+    Level ``i`` gets the color for the middle of its bin, so for ``n == cmap.N`` this matches
+    ``cmap(values, bytes=True)`` exactly. The last entry is the colormap's "bad" (NaN) color.
+
+    Tables are cached, so they're only built once per colormap.
+    """
+    key = (id(cmap), n, tuple(cmap.get_bad()))
+    lut = _LUTS.get(key)
+    if lut is None:
+        if not any(k[0] == key[0] for k in _LUTS):
+            weakref.finalize(cmap, _forget_luts, key[0])
+        lut = cmap(np.append((np.arange(n) + 0.5) / n, np.nan), bytes=True)
+        lut.flags.writeable = False
+        _LUTS[key] = lut
+    return lut
+
+
+@_staged("render")
+def _render_frame(
+    frame: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    cmap: matplotlib.colors.Colormap | None,
+) -> np.ndarray:
+    """
+    Render one (``band``, ``y``, ``x``) frame into a (``y``, ``x``, 4) uint8 RGBA array.
+
+    Missing (NaN) pixels become fully transparent (or the colormap's "bad" color).
+    """
+    shape = frame.shape[1:] + (4,)
+    # Colormap
+    if frame.shape[0] == 1:
+        assert isinstance(cmap, matplotlib.colors.Colormap)
+        # Look up colors from a table, instead of `cmap(data)` making a float64 RGBA array.
+        # Treating each RGBA color as one uint32 makes the lookup much faster.
+        colors = _colormap_lut(cmap, cmap.N).view("uint32")[:, 0]
+        if _has_int_lut(frame):
+            # Map every possible value to a color first, then look up each pixel's color directly
+            colors = colors[_int_lut(frame.dtype, vmin, vmax, cmap.N)]
+            rgba = colors[frame[0].view(_unsigned(frame.dtype))]
+        else:
+            levels, nan = _levels(_rescale(frame[0], vmin, vmax), cmap.N)
+            rgba = colors[levels]
+            if nan is not None:
+                rgba[nan] = colors[-1]
+        return rgba.view("uint8").reshape(shape)
+
+    if _has_int_lut(frame):
+        # Assemble whole RGBA pixels from a table for each channel, with no float arithmetic
+        luts = _int_lut(frame.dtype, vmin, vmax, 0)
+        bands = frame.view(_unsigned(frame.dtype))
+        rgba = luts[0][bands[0]]
+        rgba |= luts[1][bands[1]]
+        rgba |= luts[2][bands[2]]
+        return rgba.view("uint8").reshape(shape)
+
+    # Write the channels straight into a channel-last uint8 buffer (casting as it goes)
+    u8 = np.empty(shape, dtype="uint8")
+    u8[..., 3] = 255
+    rgb = np.moveaxis(u8[..., :3], -1, 0)
+    data = _rescale(frame, vmin, vmax)
+    data *= 255
+    with np.errstate(invalid="ignore"):
+        # NaNs are overwritten below
+        rgb[:] = data
+    if frame.dtype.kind == "f":
+        # Zero out the color of transparent pixels too, so they all quantize to one palette entry
+        u8[np.isnan(data).any(axis=0)] = 0
+    return u8
+
+
+# Number of palette entries used to antialias labels drawn onto palette images
+_LABEL_LEVELS = 8
+
+
+class _Palette(NamedTuple):
+    """
+    A fixed palette for every frame of a GIF, with entries reserved for labels and missing data.
+
+    Indices ``0 .. levels - 1`` hold the data's colors. Then come ``label_levels`` entries for
+    the label, blending from ``date_bg`` to ``date_color`` (or just ``date_color`` if there's
+    no background). The last entry is for missing (NaN) data.
+    """
+
+    colors: bytes
+    levels: int
+    label: int
+    label_levels: int
+    missing: int
+    missing_transparent: bool
+
+
+def _label_ramp(
+    labels: bool,
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> np.ndarray:
+    "Palette entries to reserve for labels: a blend from ``date_bg`` to ``date_color``, or just ``date_color``"
+    if not labels:
+        return np.empty((0, 3), dtype="uint8")
+    if date_bg:
+        return np.linspace(date_bg, date_color, _LABEL_LEVELS).round().astype("uint8")
+    return np.array([date_color], dtype="uint8")
+
+
+def _palette(
+    data_colors: np.ndarray, ramp: np.ndarray, missing_color: np.ndarray
+) -> _Palette:
+    "Lay out a `_Palette` from its data colors, label ramp, and missing-data color (RGBA)"
+    levels = len(data_colors)
+    colors = np.zeros((256, 3), dtype="uint8")
+    colors[:levels] = data_colors
+    label_end = levels + len(ramp)
+    colors[levels:label_end] = ramp
+    colors[255] = missing_color[:3]
+    return _Palette(
+        colors=colors.tobytes(),
+        levels=levels,
+        label=levels,
+        label_levels=len(ramp),
+        missing=255,
+        missing_transparent=bool(missing_color[3] < 128),
+    )
+
+
+def _colormap_palette(
+    cmap: matplotlib.colors.Colormap,
+    labels: bool,
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> _Palette:
+    """
+    Build a GIF palette directly from a colormap, so frames never need to be quantized.
+
+    The colormap is sampled at as many levels as fit in 256 entries alongside the reserved ones.
+    """
+    ramp = _label_ramp(labels, date_color, date_bg)
+    lut = _colormap_lut(cmap, 255 - len(ramp))
+    return _palette(lut[:-1, :3], ramp, lut[-1])
+
+
+# Max number of frames, and pixels across them, to sample when picking a palette for RGB data
+_PALETTE_SAMPLE_FRAMES = 16
+_PALETTE_SAMPLE_PIXELS = 2**16
+
+
+def _sample_frames(n_frames: int) -> np.ndarray:
+    "Indices of evenly-spaced frames to sample when picking a palette"
+    return np.unique(
+        np.linspace(0, n_frames - 1, min(n_frames, _PALETTE_SAMPLE_FRAMES)).round()
+    ).astype(int)
+
+
+def _palette_samples(data: np.ndarray, tile_size: int | None = None) -> np.ndarray:
+    """
+    Frames of (``time``, ``band``, ``y``, ``x``) ``data`` to pick an RGB palette from.
+
+    With ``tile_size``, they're thinned out to about one tile's worth of pixels each.
+    """
+    if tile_size is not None:
+        step = -(-max(data.shape[-2:]) // tile_size)
+        data = data[..., ::step, ::step]
+    return data[_sample_frames(len(data))]
+
+
+def _rgb_palette(
+    samples: Iterable[np.ndarray],
+    labels: bool,
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> _Palette:
+    """
+    Pick a GIF palette for RGB data with median-cut, from a sample of rendered RGBA (or RGB) frames.
+    """
+    ramp = _label_ramp(labels, date_color, date_bg)
+    pixels = np.concatenate(
+        [
+            rgba[rgba[..., 3] == 255][:, :3] if rgba.shape[-1] == 4 else rgba
+            for rgba in samples
+        ]
+    ).reshape(-1, 3)
+    pixels = pixels[:: max(len(pixels) // _PALETTE_SAMPLE_PIXELS, 1)]
+    if len(pixels) == 0:
+        data_colors = np.zeros((1, 3), dtype="uint8")
+    else:
+        quantized = Image.fromarray(pixels[None]).quantize(
+            255 - len(ramp), method=Image.Quantize.MEDIANCUT
+        )
+        used = np.unique(np.asarray(quantized))
+        data_colors = np.array(quantized.getpalette("RGB"), dtype="uint8")
+        data_colors = data_colors.reshape(-1, 3)[used]
+    return _palette(data_colors, ramp, np.zeros(4, dtype="uint8"))
+
+
+@_staged("palette")
+def _global_palette(
+    samples: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    cmap: matplotlib.colors.Colormap | None,
+    labels: bool,
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> _Palette:
+    """
+    One palette for a whole animation.
+
+    Made from the colormap for single-band data, otherwise picked from ``samples``:
+    a few (``band``, ``y``, ``x``) frames of the data.
+    """
+    if cmap is not None:
+        return _colormap_palette(cmap, labels, date_color, date_bg)
+    return _rgb_palette(
+        (_render_frame(frame, vmin, vmax, None) for frame in samples),
+        labels,
+        date_color,
+        date_bg,
+    )
+
+
+# Bits per channel of the colors looked up by `_color_matcher`
+_MATCH_BITS = 6
+
+
+@functools.lru_cache(maxsize=8)
+def _color_matcher(palette: _Palette) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Make a function mapping RGB pixels to the indices of their nearest data colors in ``palette``.
+
+    Colors are matched at 6 bits per channel, using a lookup table of the nearest palette entry
+    for every such color, so each frame only needs one vectorized lookup. Building the table
+    takes a moment, so matchers are cached (and shared between chunks of the same GIF).
+    """
+    colors = np.frombuffer(palette.colors, dtype="uint8").reshape(256, 3)
+    colors = colors[: palette.levels].astype("float32")
+    shift = 8 - _MATCH_BITS
+
+    # Center of every 6-bit color's cell, as 8-bit RGB
+    codes = np.arange(1 << (3 * _MATCH_BITS))
+    mask = (1 << _MATCH_BITS) - 1
+    centers = np.stack(
+        [codes >> (2 * _MATCH_BITS), (codes >> _MATCH_BITS) & mask, codes & mask],
+        axis=-1,
+    )
+    centers = (centers << shift | (1 << shift >> 1)).astype("float32")
+
+    # Squared distance is |center|^2 - 2 center.color + |color|^2; the first term is the same
+    # for every color, so leave it out. Go in batches to bound the size of the distance matrix.
+    table = np.empty(len(codes), dtype="uint8")
+    color_norms = (colors**2).sum(axis=-1)
+    for batch in np.array_split(np.arange(len(codes)), 16):
+        dists = color_norms - 2 * centers[batch] @ colors.T
+        table[batch] = dists.argmin(axis=-1)
+
+    def match(rgb: np.ndarray) -> np.ndarray:
+        q = rgb >> shift
+        codes = q[..., 0].astype("int32") << (2 * _MATCH_BITS)
+        codes |= q[..., 1].astype("int32") << _MATCH_BITS
+        codes |= q[..., 2]
+        return table[codes]
+
+    return match
+
+
+@_staged("render")
+def _render_indexed_frame(
+    frame: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    palette: _Palette,
+    match: Callable[[np.ndarray], np.ndarray] | None,
+) -> tuple[np.ndarray, bool]:
+    """
+    Render one (``band``, ``y``, ``x``) frame into (``y``, ``x``) uint8 indices into ``palette``.
+
+    Single-band data is binned straight into the palette's levels; RGB data is rendered,
+    then matched to the nearest palette colors with ``match``.
+    Also returns whether any pixels are missing.
+    """
+    if frame.shape[0] != 1:
+        assert match is not None
+        return _match_frame(_render_frame(frame, vmin, vmax, None), palette, match)
+    indices, nan = _frame_levels(frame[0], vmin, vmax, palette.levels)
+    if nan is not None:
+        indices[nan] = palette.missing
+    return indices, nan is not None
+
+
+def _match_frame(
+    rgba: np.ndarray, palette: _Palette, match: Callable[[np.ndarray], np.ndarray]
+) -> tuple[np.ndarray, bool]:
+    """
+    Map a (``y``, ``x``, 4) RGBA (or 3-channel RGB) frame to uint8 indices into ``palette`` with ``match``.
+
+    Fully transparent pixels are missing. Also returns whether there are any.
+    """
+    indices = match(rgba[..., :3])
+    if rgba.shape[-1] == 3:
+        return indices, False
+    nan = rgba[..., 3] == 0
+    if not nan.any():
+        return indices, False
+    indices[nan] = palette.missing
+    return indices, True
+
+
+def _label_box(
+    size: tuple[int, int],
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont,
+    label: str,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+) -> tuple[int, int, tuple[int, int, int, int]]:
+    """
+    Where to put a label on a frame of ``size``.
+
+    Returns the upper-left corner of the text, and its bounding box from `ImageFont.getbbox`.
+    """
+    width, height = size
+    t_bbox = fnt.getbbox(label)
+    t_width = t_bbox[2] - t_bbox[0]
+    t_height = t_bbox[3] - t_bbox[1]
+
+    offset = 15
+    if date_position[0] == "u":
+        y = offset
+    else:
+        y = height - t_height - offset
+
+    if date_position[1] == "l":
+        x = offset
+    else:
+        x = width - t_width - offset
+
+    return x, y, t_bbox
+
+
+class _LabelSprite(NamedTuple):
+    """
+    A label rendered once, to paste onto frames with its upper-left corner at ``(x, y)``.
+
+    ``pixels`` are RGBA colors or palette indices. ``alpha`` is how much of each pixel to paste:
+    0-255 coverage for RGBA, or a boolean mask for palette indices. None means all of it.
+    """
+
+    x: int
+    y: int
+    pixels: np.ndarray
+    alpha: np.ndarray | None
+
+
+# Pillow's FreeType fonts can't safely be used from multiple threads at once
+_TEXT_LOCK = threading.Lock()
+
+# Recently-used label sprites, keyed by everything that affects how they look.
+# Labels repeat a lot (across frames, and across calls), so they're only rendered once.
+_LABEL_SPRITES: collections.OrderedDict[tuple, _LabelSprite] = collections.OrderedDict()
+_LABEL_CACHE_SIZE = 256
+
+
+def _cached_label(
+    key: tuple,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont,
+    render: Callable[[], _LabelSprite],
+) -> _LabelSprite:
+    "Get the sprite for ``key`` and ``fnt`` from the cache, or ``render`` it"
+    with _TEXT_LOCK:
+        # Fonts are made fresh for every GIF, so identify them by what they'd draw
+        if isinstance(fnt, ImageFont.FreeTypeFont):
+            key += (fnt.getname(), fnt.size)
+        else:
+            key += (type(fnt),)
+        sprite = _LABEL_SPRITES.get(key)
+        if sprite is None:
+            sprite = render()
+            for array in (sprite.pixels, sprite.alpha):
+                if array is not None:
+                    array.flags.writeable = False
+            _LABEL_SPRITES[key] = sprite
+            if len(_LABEL_SPRITES) > _LABEL_CACHE_SIZE:
+                _LABEL_SPRITES.popitem(last=False)
+        else:
+            _LABEL_SPRITES.move_to_end(key)
+    return sprite
+
+
+def _union_box(boxes: Iterable[tuple[int, int, int, int]]) -> tuple[int, int, int, int]:
+    "The ``(x0, y0, x1, y1)`` box around some boxes, or an empty box at the origin if there are none"
+    boxes = [b for b in boxes if b[0] < b[2] and b[1] < b[3]]
+    if not boxes:
+        return 0, 0, 0, 0
+    x0s, y0s, x1s, y1s = zip(*boxes)
+    return min(x0s), min(y0s), max(x1s), max(y1s)
+
+
+def _div255(x: np.ndarray) -> np.ndarray:
+    "Divide uint16 ``x`` by 255 with rounding, exactly like Pillow does when blending"
+    x = x + 128
+    return ((x >> 8) + x) >> 8
+
+
+def _render_label(
+    size: tuple[int, int],
+    label: str,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> _LabelSprite:
+    """
+    Render a timestamp label into an RGBA sprite, for a frame of ``size``.
+
+    When pasted with `_paste_label`, the result is exactly what drawing it onto the frame with
+    Pillow would give.
+    """
+    x, y, t_bbox = _label_box(size, fnt, label, date_position)
+    t_width = t_bbox[2] - t_bbox[0]
+    t_height = t_bbox[3] - t_bbox[1]
+
+    # NOTE: sometimes the text seems to incorporate its own internal offset.
+    # This will show up in the first two coordinates of `t_bbox`, so we
+    # "de-offset" by these to make the rectangle and text align.
+    origin = (-t_bbox[0], -t_bbox[1])
+    boxes = [
+        ImageDraw.Draw(Image.new("L", (1, 1))).multiline_textbbox(
+            origin, label, font=fnt
+        )
+    ]
+    if date_bg:
+        pad = 0.1 * t_height  # looks nicer
+        # Pillow truncates the corners, and includes the lower-right one
+        rect = (
+            int(x - pad) - x,
+            int(y - pad) - y,
+            int(x + t_width + pad) - x + 1,
+            int(y + t_height + pad) - y + 1,
+        )
+        boxes.append(rect)
+    x0, y0, x1, y1 = _union_box(boxes)
+
+    mask = Image.new("L", (x1 - x0, y1 - y0))
+    ImageDraw.Draw(mask).multiline_text(
+        (origin[0] - x0, origin[1] - y0), label, font=fnt, fill=255
+    )
+    coverage = np.asarray(mask).astype("uint16")
+
+    pixels = np.empty(coverage.shape + (4,), dtype="uint16")
+    pixels[:] = (*date_color, 255)
+    alpha = coverage
+    if date_bg:
+        bg = np.array((*date_bg, 255), dtype="uint16")
+        rx0, ry0, rx1, ry1 = rect[0] - x0, rect[1] - y0, rect[2] - x0, rect[3] - y0
+        in_rect = (slice(ry0, ry1), slice(rx0, rx1))
+        # text over the background is the same every time, so blend it now
+        c = coverage[in_rect][..., None]
+        pixels[in_rect] = _div255(bg * (255 - c) + pixels[in_rect] * c)
+        alpha = coverage.copy()
+        alpha[in_rect] = 255
+
+    return _LabelSprite(
+        x + x0,
+        y + y0,
+        pixels.astype("uint8"),
+        None if (alpha == 255).all() else alpha.astype("uint8"),
+    )
+
+
+@_staged("labels")
+def _draw_label(
+    rgba: np.ndarray,
+    label: str,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> None:
+    "Write a timestamp label onto an RGBA frame, in-place"
+    date_color = tuple(date_color)
+    date_bg = tuple(date_bg) if date_bg else None
+    sprite = _cached_label(
+        ("rgba", rgba.shape[:2], label, date_position, date_color, date_bg),
+        fnt,
+        lambda: _render_label(
+            rgba.shape[1::-1], label, fnt, date_position, date_color, date_bg
+        ),
+    )
+    _paste_label(rgba, sprite)
+
+
+def _clip(
+    dst_shape: tuple[int, ...], src_shape: tuple[int, ...], x: int, y: int
+) -> tuple[tuple[slice, slice], tuple[slice, slice]] | None:
+    """
+    Slices of ``dst`` and ``src`` that overlap when ``src``'s upper-left corner is at ``(x, y)``.
+
+    None if they don't overlap at all.
+    """
+    h, w = src_shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, dst_shape[1]), min(y + h, dst_shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return (
+        (slice(y0, y1), slice(x0, x1)),
+        (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x)),
+    )
+
+
+def _blit(
+    dst: np.ndarray, src: np.ndarray, x: int, y: int, where: np.ndarray | None = None
+) -> None:
+    """
+    Copy ``src`` into ``dst`` with its upper-left corner at ``(x, y)``, clipped to the bounds of ``dst``.
+
+    If ``where`` is given, only pixels where it's True are copied.
+    """
+    clipped = _clip(dst.shape, src.shape, x, y)
+    if clipped is None:
+        return
+    dst_slices, src_slices = clipped
+    if where is None:
+        dst[dst_slices] = src[src_slices]
+    else:
+        where = where[src_slices]
+        dst[dst_slices][where] = src[src_slices][where]
+
+
+def _paste_label(rgba: np.ndarray, sprite: _LabelSprite) -> None:
+    """
+    Blend an RGBA label sprite onto an RGBA frame, in-place.
+
+    Blends the same way Pillow does when drawing onto pixels that are either opaque
+    or fully transparent (which is all rendered frames have).
+    """
+    if sprite.alpha is None:
+        _blit(rgba, sprite.pixels, sprite.x, sprite.y)
+        return
+    clipped = _clip(rgba.shape, sprite.pixels.shape, sprite.x, sprite.y)
+    if clipped is None:
+        return
+    dst_slices, src_slices = clipped
+    dst = rgba[dst_slices]
+    alpha = np.repeat(sprite.alpha[src_slices][..., None], 4, axis=-1).astype("uint16")
+    # Over transparent pixels, Pillow paints colors at full strength
+    alpha[..., :3][(dst[..., 3] < 255) & (alpha[..., 3] > 0)] = 255
+    dst[:] = _div255(
+        dst.astype("uint16") * (255 - alpha) + sprite.pixels[src_slices] * alpha
+    )
+
+
+def _render_indexed_label(
+    size: tuple[int, int],
+    label: str,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    label_index: int,
+    label_levels: int,
+) -> _LabelSprite:
+    """
+    Render a timestamp label into a sprite of palette indices, for a frame of ``size``.
+
+    Uses the ``label_levels`` entries starting at ``label_index`` reserved in the palette.
+    When there's a background, the text is antialiased against it using those entries;
+    otherwise the text is drawn without antialiasing, since it has to cover arbitrary colors.
+    """
+    x, y, t_bbox = _label_box(size, fnt, label, date_position)
+    t_width = t_bbox[2] - t_bbox[0]
+    t_height = t_bbox[3] - t_bbox[1]
+
+    text_box = (0, 0, t_width, t_height)
+    rect_box = (0, 0, 0, 0)
+    if label_levels > 1:
+        pad = 0.1 * t_height  # looks nicer
+        rect_box = (
+            round(x - pad) - x,
+            round(y - pad) - y,
+            round(x + t_width + pad) - x + 1,
+            round(y + t_height + pad) - y + 1,
+        )
+    x0, y0, x1, y1 = _union_box([text_box, rect_box])
+    pixels = np.full((y1 - y0, x1 - x0), label_index, dtype="uint8")
+    alpha = np.zeros(pixels.shape, dtype=bool)
+    in_rect = (
+        slice(rect_box[1] - y0, rect_box[3] - y0),
+        slice(rect_box[0] - x0, rect_box[2] - x0),
+    )
+    alpha[in_rect] = True
+
+    if t_width > 0 and t_height > 0:
+        mask = Image.new("L", (t_width, t_height))
+        # see `_render_label` about de-offsetting
+        ImageDraw.Draw(mask).multiline_text(
+            (-t_bbox[0], -t_bbox[1]), label, font=fnt, fill=255
+        )
+        coverage = np.asarray(mask).astype("uint16")
+        levels = (coverage * (label_levels - 1) + 127) // 255
+        text = (label_index + levels).astype("uint8")
+        in_text = (slice(-y0, t_height - y0), slice(-x0, t_width - x0))
+        if label_levels == 1:
+            pixels[in_text][coverage >= 128] = text[coverage >= 128]
+            alpha[in_text] |= coverage >= 128
+        else:
+            pixels[in_text] = text
+            alpha[in_text] = True
+
+    return _LabelSprite(x + x0, y + y0, pixels, None if alpha.all() else alpha)
+
+
+@_staged("labels")
+def _draw_indexed_label(
+    indices: np.ndarray,
+    label: str,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    palette: _Palette,
+) -> None:
+    "Write a timestamp label onto a frame of palette indices, in-place"
+    sprite = _cached_label(
+        (
+            "indexed",
+            indices.shape,
+            label,
+            date_position,
+            palette.label,
+            palette.label_levels,
+        ),
+        fnt,
+        lambda: _render_indexed_label(
+            indices.shape[::-1],
+            label,
+            fnt,
+            date_position,
+            palette.label,
+            palette.label_levels,
+        ),
+    )
+    _blit(indices, sprite.pixels, sprite.x, sprite.y, sprite.alpha)
+
+
+@contextlib.contextmanager
+def _open_output(to: str | Path | BinaryIO) -> Iterator[BinaryIO]:
+    "Open ``to`` for writing if it's a path, otherwise use it as-is (and leave it open)"
+    if isinstance(to, (str, Path)):
+        with open(to, "wb") as f:
+            yield f
+    else:
+        yield to
+        if hasattr(to, "flush"):
+            to.flush()
+
+
+@_staged("quantize")
+def _quantize(img: Image.Image) -> tuple[Image.Image, int | None]:
+    """
+    Convert an RGBA frame to a palette ("P") image with at most 256 colors.
+
+    Returns the palette image, and the palette index of transparent pixels, if there are any.
+    """
+    # This is the same conversion Pillow does when saving RGBA images as GIFs
+    p = img.convert("P", palette=Image.Palette.ADAPTIVE)
+    transparency = None
+    if p.palette is not None and p.palette.mode == "RGBA":
+        for rgba, i in p.palette.colors.items():
+            if rgba[3] == 0:
+                transparency = i
+                break
+    return p, transparency
+
+
+def _frame_image(frame: np.ndarray) -> Image.Image:
+    """
+    Wrap a (``y``, ``x``, 4) RGBA or (``y``, ``x``, 3) RGB uint8 frame as an image.
+
+    C-contiguous RGBA frames are used in place, without copying them. Pillow has no
+    3-byte-per-pixel layout it can use in place, so RGB frames are always copied.
+    """
+    mode = "RGBA" if frame.shape[-1] == 4 else "RGB"
+    frame = np.ascontiguousarray(frame)
+    return Image.frombuffer(mode, frame.shape[1::-1], frame, "raw", mode, 0, 1)
+
+
+def _palette_image(indices: np.ndarray, palette: _Palette) -> Image.Image:
+    "Wrap (``y``, ``x``) uint8 indices into ``palette`` as a palette-mode image"
+    indices = np.ascontiguousarray(indices)
+    p = Image.frombuffer("P", indices.shape[::-1], indices, "raw", "P", 0, 1)
+    p.putpalette(palette.colors)
+    return p
+
+
+def _color_table(palette: bytes, n_colors: int) -> tuple[bytes, int]:
+    """
+    Pad a palette to the next power-of-2 size that GIF requires.
+
+    Returns the color table, and the size field (N, for ``2 ** (N + 1)`` colors)
+    to put in the GIF's packed flags.
+    """
+    size = max(n_colors - 1, 1).bit_length() - 1
+    n_entries = 2 << size
+    table = palette[: n_entries * 3]
+    return table.ljust(n_entries * 3, b"\0"), size
+
+
+@_staged("encode")
+def _encode_gif_frame(
+    img: Image.Image,
+    transparency: int | None,
+    duration: int,
+    disposal: int = 2,
+    offset: tuple[int, int] = (0, 0),
+    local_palette: bool = True,
+    lzw: Callable[[np.ndarray], bytes] | None = None,
+) -> bytes:
+    """
+    Encode a palette image as a GIF image block, with its own local color table.
+
+    If not ``local_palette``, the image's palette is left out, and the indices refer
+    to the GIF's global color table instead.
+
+    The pixels are LZW-compressed by Pillow, or by ``lzw`` if given (see `gif`'s ``encoder``).
+
+    The result includes the Graphic Control Extension (``duration``, in hundredths of a second,
+    ``disposal`` method, and ``transparency`` index), and can be written directly after the
+    GIF header (or any other frame).
+    """
+    assert img.mode == "P", img.mode
+    if local_palette:
+        n_colors = img.getextrema()[1] + 1
+        table, size = _color_table(bytes(img.getpalette("RGB")), n_colors)
+        flags = 0x80 | size  # local color table flag
+    else:
+        table, flags = b"", 0
+
+    packed = disposal << 2 | (transparency is not None)
+    gce = (
+        b"!\xf9\x04" + struct.pack("<BHB", packed, duration, transparency or 0) + b"\0"
+    )
+    descriptor = (
+        b","
+        + struct.pack("<HHHH", offset[0], offset[1], img.width, img.height)
+        + bytes([flags])
+    )
+    if lzw is None:
+        # `tobytes` with the "gif" encoder gives the LZW-compressed data, already split into sub-blocks
+        data = img.tobytes("gif", "P")
+    else:
+        data = _sub_blocks(lzw(np.asarray(img)))
+    return b"".join([gce, descriptor, table, b"\x08", data, b"\0"])
+
+
+def _sub_blocks(data: bytes) -> bytes:
+    "Split LZW-compressed data into GIF data sub-blocks: up to 255 bytes each, after their length"
+    starts = range(0, len(data), 255)
+    return b"".join(
+        bytes([len(chunk)]) + chunk
+        for chunk in (data[slice(start, start + 255)] for start in starts)
+    )
+
+
+_GIF_ENCODERS = ("pillow", "gifsicle")
+
+
+def _check_encoder(
+    encoder: str | Callable[[np.ndarray], bytes],
+    format: Literal["gif", "webp", "png", "mp4"],
+) -> Callable[[np.ndarray], bytes] | None:
+    "Check ``encoder`` works with ``format``, and return it if it's a function to LZW-compress frames"
+    if callable(encoder):
+        lzw = encoder
+    else:
+        assert (
+            encoder in _GIF_ENCODERS
+        ), f"encoder must be one of {_GIF_ENCODERS} or a function, not {encoder!r}"
+        lzw = None
+    if encoder != "pillow" and format != "gif":
+        raise ValueError(f"`encoder` only applies to GIFs, not format={format!r}")
+    return lzw
+
+
+@contextlib.contextmanager
+def _gifsicle(fp: BinaryIO, options: dict[str, Any] | None) -> Iterator[BinaryIO]:
+    """
+    Yield a file to write a GIF into, which the ``gifsicle`` program optimizes into ``fp`` as it goes.
+
+    ``options`` are gifsicle's long options, like ``{"optimize": 3, "lossy": 20}``
+    for ``--optimize=3 --lossy=20`` (True for a flag on its own). Default: ``--optimize=3``.
+    """
+    gifsicle = shutil.which("gifsicle")
+    if gifsicle is None:
+        raise ImportError(
+            "`encoder='gifsicle'` needs the `gifsicle` program. "
+            "Install it (https://www.lcdf.org/gifsicle) and make sure it's on your PATH."
+        )
+    args = [gifsicle, "--no-warnings"]
+    for key, value in (options if options is not None else {"optimize": 3}).items():
+        args.append(f"--{key}" if value is True else f"--{key}={value}")
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(
+            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr
+        )
+        assert proc.stdin is not None and proc.stdout is not None
+        # gifsicle reads the whole GIF before writing anything, but copy it out as it comes anyway
+        reader = threading.Thread(
+            target=shutil.copyfileobj, args=(proc.stdout, fp), daemon=True
+        )
+        reader.start()
+        try:
+            try:
+                yield proc.stdin
+            except BrokenPipeError:
+                # gifsicle failed; its error is raised below
+                pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = proc.wait()
+            reader.join()
+        if returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(
+                f"gifsicle failed to optimize the GIF:\n{stderr.read().decode(errors='replace')}"
+            )
+
+
+def _gif_header(size: tuple[int, int], palette: bytes | None = None) -> bytes:
+    """
+    GIF header and logical screen descriptor, set to loop forever.
+
+    If ``palette`` is given, it's written as the global color table.
+    """
+    width, height = size
+    if palette is not None:
+        table, table_size = _color_table(palette, len(palette) // 3)
+        flags = (
+            0x80 | table_size << 4 | table_size
+        )  # global color table, color resolution
+    else:
+        # no global color table (every frame has a local one)
+        table, flags = b"", 0
+    return (
+        b"GIF89a"
+        + struct.pack(
+            "<HHBBB", width, height, flags, 0, 0
+        )  # background 0, no aspect ratio
+        + table
+        # NETSCAPE2.0 application extension: loop forever
+        + b"!\xff\x0bNETSCAPE2.0\x03\x01"
+        + struct.pack("<H", 0)
+        + b"\0"
+    )
+
+
+_GIF_TRAILER = b";"
+
+
+def _bbox(mask: np.ndarray) -> tuple[int, int, int, int]:
+    "The ``(x0, y0, x1, y1)`` box around the True pixels of a 2D mask, or the top-left pixel if there are none"
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return 0, 0, 1, 1
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def _delta_frames(
+    indexed: Iterable[np.ndarray],
+    palette: _Palette,
+    screen: np.ndarray | None = None,
+) -> Iterator[tuple[np.ndarray, tuple[int, int], int, int | None]]:
+    """
+    Crop each frame of palette indices to just the part that changed since the frame before it.
+
+    Yields the cropped indices, their ``(x, y)`` offset, the disposal method, and the transparent index.
+
+    Frames are left on screen (disposal 1) for the next one to draw over. If missing data is
+    transparent, unchanged pixels within the crop are made transparent too, so they compress to
+    almost nothing. A pixel that's about to *become* transparent can't be drawn over the frame
+    before it, though, so that frame is cleared instead (disposal 2) over both its own changes
+    and those pixels. That means each frame is only yielded once the next one is known.
+
+    ``screen`` is what's already on screen before the first frame is drawn, if the frames
+    continue from earlier ones; otherwise, the screen starts out blank.
+    """
+    transparent = palette.missing if palette.missing_transparent else None
+    # What's on screen before the pending frame is drawn. None means blank, if blank isn't a color.
+    base = screen
+    pending: np.ndarray | None = None
+    for indices in itertools.chain(indexed, [None]):
+        if pending is None:
+            pending = indices
+            if base is None and transparent is not None and pending is not None:
+                base = np.full_like(pending, transparent)
+            continue
+
+        changed = pending != base if base is not None else np.ones(pending.shape, bool)
+        clear = None
+        if transparent is not None and indices is not None:
+            clear = (indices == transparent) & (pending != transparent)
+            if not clear.any():
+                clear = None
+
+        x0, y0, x1, y1 = _bbox(changed if clear is None else changed | clear)
+        crop = pending[y0:y1, x0:x1].copy()
+        if transparent is not None:
+            crop[~changed[y0:y1, x0:x1]] = transparent
+        has_transparent = transparent is not None and bool((crop == transparent).any())
+        yield (
+            crop,
+            (x0, y0),
+            1 if clear is None else 2,
+            transparent if has_transparent else None,
+        )
+
+        # Once drawn, the screen shows exactly the pending frame (minus whatever gets cleared)
+        base = pending
+        if clear is not None:
+            base = pending.copy()
+            base[y0:y1, x0:x1] = transparent
+        pending = indices
+
+
+@contextlib.contextmanager
+def _frame_map(
+    workers: int,
+) -> Iterator[Callable[[Callable[[Any], Any], Iterable[Any]], Iterator[Any]]]:
+    """
+    Context for mapping functions over frames in a pool of ``workers`` threads.
+
+    Yields a function like `map`, which keeps results in order, but only runs a couple of items
+    per worker ahead of whoever is consuming the results, so memory use stays bounded.
+    With one worker, it's just `map`. Any `_Stats` being collected are collected from the workers too.
+    """
+    if workers <= 1:
+        yield map
+        return
+
+    with ThreadPoolExecutor(workers) as executor:
+
+        def submit(func: Callable[[Any], Any], item: Any) -> Future:
+            if _STATS.get() is None:
+                return executor.submit(func, item)
+            # Each worker gets its own copy of the context, with no stage running yet
+            return executor.submit(
+                contextvars.copy_context().run, _unstaged, func, item
+            )
+
+        def imap(func: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+            pending: collections.deque[Future] = collections.deque()
+            try:
+                for item in items:
+                    pending.append(submit(func, item))
+                    if len(pending) > 2 * workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        yield imap
+
+
+def _unstaged(func: Callable[[Any], Any], item: Any) -> Any:
+    "Call ``func(item)`` outside any `_stage`"
+    _STAGE.set(None)
+    return func(item)
+
+
+def _scratch(
+    shape: tuple[int, ...],
+    dtype: str = "uint8",
+    dir: str | os.PathLike | None = None,
+) -> np.ndarray:
+    """
+    A zeroed array backed by a temporary file instead of memory, so the OS can page it out.
+
+    The file (in ``dir``, or the default temporary directory) is already deleted; its space
+    is freed once the array is garbage-collected.
+    """
+    with tempfile.TemporaryFile(dir=dir) as f:
+        f.truncate(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        # The memory map stays valid after the file is closed
+        return np.memmap(f, dtype=dtype, mode="r+", shape=shape)
+
+
+def _spill(
+    frames: Iterable[np.ndarray], n: int, dir: str | os.PathLike | None
+) -> np.ndarray:
+    "Write ``n`` frames into one `_scratch` array in ``dir`` as they're rendered, one at a time"
+    stack = None
+    for i, frame in enumerate(frames):
+        if stack is None:
+            stack = _scratch((n,) + frame.shape, frame.dtype.str, dir)
+        stack[i] = frame
+    assert stack is not None, "No frames to spill"
+    return stack
+
+
+def _render_tiled_frame(
+    frame: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    palette: _Palette,
+    match: Callable[[np.ndarray], np.ndarray] | None,
+    tile_size: int,
+    scratch_dir: str | os.PathLike | None = None,
+) -> tuple[np.ndarray, bool]:
+    """
+    `_render_indexed_frame`, one ``tile_size`` square tile at a time, into a `_scratch` array.
+
+    Memory use depends on the size of the tiles, not the frame.
+    """
+    indices = _scratch(frame.shape[1:], dir=scratch_dir)
+    missing = False
+    for tile in _tile_slices(*frame.shape[1:], tile_size):
+        indices[tile], tile_missing = _render_indexed_frame(
+            frame[(slice(None),) + tile], vmin, vmax, palette, match
+        )
+        missing = missing or tile_missing
+    return indices, missing
+
+
+def _indexed_frames(
+    frames: np.ndarray,
+    labels: Sequence[str] | None,
+    vmin: float | None,
+    vmax: float | None,
+    cmap: matplotlib.colors.Colormap | None,
+    palette: _Palette,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont | None,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    imap: Callable[[Callable[[Any], Any], Iterable[Any]], Iterator[Any]] = map,
+    tile_size: int | None = None,
+    scratch_dir: str | os.PathLike | None = None,
+) -> Iterator[tuple[np.ndarray, bool]]:
+    """
+    Render and label frames with ``imap``, as palette indices and whether any pixels are missing.
+
+    With ``tile_size``, each frame is rendered tile-by-tile into a `_scratch` array in ``scratch_dir``.
+    """
+    match = _color_matcher(palette) if cmap is None else None
+
+    def render(i: int) -> tuple[np.ndarray, bool]:
+        if tile_size is None:
+            indices, missing = _render_indexed_frame(
+                frames[i], vmin, vmax, palette, match
+            )
+        else:
+            indices, missing = _render_tiled_frame(
+                frames[i], vmin, vmax, palette, match, tile_size, scratch_dir
+            )
+        if labels is not None:
+            assert fnt is not None
+            _draw_indexed_label(indices, labels[i], fnt, date_position, palette)
+        return indices, missing
+
+    return imap(render, range(len(frames)))
+
+
+def _render_labeled_frame(
+    frame: np.ndarray,
+    label: str | None,
+    vmin: float | None,
+    vmax: float | None,
+    cmap: matplotlib.colors.Colormap | None,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont | None,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> np.ndarray:
+    "`_render_frame`, then write ``label`` onto it (if not None)"
+    rgba = _render_frame(frame, vmin, vmax, cmap)
+    if label is not None:
+        assert fnt is not None
+        _draw_label(rgba, label, fnt, date_position, date_color, date_bg)
+    return rgba
+
+
+def _rgba_frames(
+    frames: np.ndarray,
+    labels: Sequence[str] | None,
+    vmin: float | None,
+    vmax: float | None,
+    cmap: matplotlib.colors.Colormap | None,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont | None,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+    imap: Callable[[Callable[[Any], Any], Iterable[Any]], Iterator[Any]] = map,
+) -> Iterator[np.ndarray]:
+    "Render and label frames with ``imap``, as (``y``, ``x``, 4) RGBA arrays"
+
+    def render(i: int) -> np.ndarray:
+        label = labels[i] if labels is not None else None
+        return _render_labeled_frame(
+            frames[i], label, vmin, vmax, cmap, fnt, date_position, date_color, date_bg
+        )
+
+    return imap(render, range(len(frames)))
+
+
+def _quantized_frames(
+    frames: np.ndarray,
+    labels: Sequence[str] | None,
+    vmin: float | None,
+    vmax: float | None,
+    cmap: matplotlib.colors.Colormap | None,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont | None,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+    imap: Callable[[Callable[[Any], Any], Iterable[Any]], Iterator[Any]] = map,
+) -> Iterator[tuple[Image.Image, int | None]]:
+    "Render and label frames with ``imap``, each quantized to its own palette (see `_quantize`)"
+
+    def render(i: int) -> tuple[Image.Image, int | None]:
+        label = labels[i] if labels is not None else None
+        rgba = _render_labeled_frame(
+            frames[i], label, vmin, vmax, cmap, fnt, date_position, date_color, date_bg
+        )
+        return _quantize(_frame_image(rgba))
+
+    return imap(render, range(len(frames)))
+
+
+def _indexed_parts(
+    indexed: Iterable[tuple[np.ndarray, bool]], palette: _Palette, delta: bool = False
+) -> Iterator[tuple[Image.Image, int | None, int, tuple[int, int]]]:
+    """
+    Turn frames of palette indices (and whether any pixels are missing) into palette images to encode.
+
+    Yields each image, with its transparent index, disposal method, and offset.
+    With ``delta``, frames are cropped to what changed (see `_delta_frames`).
+    """
+    if delta:
+        crops = _delta_frames((indices for indices, _ in indexed), palette)
+    else:
+        transparent = palette.missing if palette.missing_transparent else None
+        crops = (
+            (indices, (0, 0), 2, transparent if missing else None)
+            for indices, missing in indexed
+        )
+    return (
+        (_palette_image(indices, palette), transparency, disposal, offset)
+        for indices, offset, disposal, transparency in crops
+    )
+
+
+def _gif_frames(
+    frames: np.ndarray,
+    labels: Sequence[str] | None,
+    vmin: float | None,
+    vmax: float | None,
+    cmap: matplotlib.colors.Colormap | None,
+    palette: _Palette | None,
+    fnt: ImageFont.ImageFont | ImageFont.FreeTypeFont | None,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+    duration: int,
+    local_palette: bool = True,
+    delta: bool = False,
+    workers: int = 1,
+    tile_size: int | None = None,
+    scratch_dir: str | os.PathLike | None = None,
+    lzw: Callable[[np.ndarray], bytes] | None = None,
+) -> Iterator[bytes]:
+    """
+    Render (``time``, ``band``, ``y``, ``x``) frames into encoded GIF image blocks, in order.
+
+    Frames are rendered and encoded in a pool of ``workers`` threads, which only run a few frames
+    ahead of the consumer, so memory use doesn't grow with the number of frames. The blocks can be
+    written directly after a `_gif_header`, and chunks of frames can be rendered separately and
+    concatenated later.
+
+    If ``palette`` is None, each RGB frame is quantized to its own palette. Otherwise,
+    frames are mapped onto ``palette``, which is written into every frame if ``local_palette``,
+    or else must be the GIF's global color table.
+
+    With ``delta`` (which only applies with a ``palette``), frames just contain what changed since
+    the one before (see `_delta_frames`), so they depend on their neighbors, and chunks of them
+    can't be rendered separately this way (see `_gif_chunk` for that).
+
+    With ``tile_size`` (which needs a ``palette``), frames are rendered in tiles (see `_render_tiled_frame`),
+    into scratch files in ``scratch_dir``.
+
+    Each frame is LZW-compressed by Pillow, or ``lzw`` if given (see `_encode_gif_frame`).
+    """
+
+    def encode(part: tuple[Image.Image, int | None, int, tuple[int, int]]) -> bytes:
+        p, transparency, disposal, offset = part
+        return _encode_gif_frame(
+            p, transparency, duration, disposal, offset, local_palette, lzw
+        )
+
+    with _frame_map(workers) as imap:
+        parts: Iterator[tuple[Image.Image, int | None, int, tuple[int, int]]]
+        if palette is None:
+            parts = (
+                (p, transparency, 2, (0, 0))
+                for p, transparency in _quantized_frames(
+                    frames,
+                    labels,
+                    vmin,
+                    vmax,
+                    cmap,
+                    fnt,
+                    date_position,
+                    date_color,
+                    date_bg,
+                    imap,
+                )
+            )
+        else:
+            indexed = _indexed_frames(
+                frames,
+                labels,
+                vmin,
+                vmax,
+                cmap,
+                palette,
+                fnt,
+                date_position,
+                imap,
+                tile_size,
+                scratch_dir,
+            )
+            parts = _indexed_parts(indexed, palette, delta)
+
+        yield from imap(encode, parts)
+
+
+def _gif_duration(fps: int) -> int:
+    "Frame duration for ``fps``, in the hundredths of a second GIF uses"
+    return int(1 / fps * 1000 / 10)
+
+
+_FORMATS = ("gif", "webp", "png", "mp4")
+
+
+@_staged("encode")
+def _write_animation(
+    fp: BinaryIO,
+    frames: Iterable[np.ndarray],
+    format: Literal["webp", "png", "mp4"],
+    fps: int,
+    options: dict[str, Any] | None,
+    nodata_color: tuple[int, int, int] = (0, 0, 0),
+) -> None:
+    """
+    Encode RGBA (or RGB) frames as an animated WebP or APNG with Pillow (looping forever),
+    or as an MP4 video with `_write_video`.
+    """
+    if format == "mp4":
+        _write_video(fp, frames, fps, options, nodata_color)
+        return
+
+    # Views of the frames, so a `_spill`ed stack stays on disk until Pillow reads it
+    first, *rest = [_frame_image(rgba) for rgba in frames]
+    first.save(
+        fp,
+        format=format.upper(),
+        save_all=True,
+        append_images=rest,
+        duration=int(1000 / fps),
+        loop=0,
+        **(options or {}),
+    )
+
+
+def _fill_nodata(rgba: np.ndarray, color: tuple[int, int, int]) -> np.ndarray:
+    """
+    Composite an RGBA frame over a solid ``color``, into an RGB frame (RGB frames are left as they are).
+
+    Odd widths and heights are padded by one pixel of ``color``, since H.264 needs even ones.
+    """
+    height, width = rgba.shape[:2]
+    rgb = np.empty((height + height % 2, width + width % 2, 3), dtype="uint8")
+    rgb[...] = color
+    if rgba.shape[-1] == 3:
+        rgb[:height, :width] = rgba
+        return rgb
+    alpha = rgba[..., 3:].astype("uint16")
+    rgb[:height, :width] = _div255(
+        rgba[..., :3] * alpha + np.array(color, dtype="uint16") * (255 - alpha)
+    )
+    return rgb
+
+
+@contextlib.contextmanager
+def _video_encoder(
+    fp: BinaryIO, size: tuple[int, int], fps: int, options: dict[str, Any] | None
+) -> Iterator[Callable[[np.ndarray], None]]:
+    """
+    Yield a function that encodes each RGB frame it's given into an H.264 MP4 video in ``fp``.
+
+    Uses PyAV if it's installed, otherwise an ``ffmpeg`` subprocess. Either way, the MP4 is
+    fragmented, so it can be written as it goes to files that can't seek.
+    """
+    options = {key: str(value) for key, value in (options or {}).items()}
+    try:
+        import av
+    except ImportError:
+        pass
+    else:
+        with av.open(
+            fp, "w", format="mp4", options={"movflags": "frag_keyframe+empty_moov"}
+        ) as container:
+            stream = container.add_stream("libx264", rate=fps)
+            stream.width, stream.height = size
+            stream.pix_fmt = "yuv420p"
+            stream.options = options
+
+            def encode(rgb: np.ndarray) -> None:
+                frame = av.VideoFrame.from_ndarray(rgb, format="rgb24")
+                container.mux(stream.encode(frame))
+
+            yield encode
+            container.mux(stream.encode())
+        return
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise ImportError(
+            "Writing MP4 video needs either PyAV or the `ffmpeg` program. "
+            "Install PyAV with `pip install av`, or install ffmpeg and make sure it's on your PATH."
+        )
+    width, height = size
+    args = [ffmpeg, "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24"]
+    args += ["-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+    args += ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+    for key, value in options.items():
+        args += [f"-{key}", value]
+    args += ["-movflags", "frag_keyframe+empty_moov", "-f", "mp4", "-"]
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(
+            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr
+        )
+        assert proc.stdin is not None and proc.stdout is not None
+        # Read the video as it's encoded, so ffmpeg never blocks on a full pipe
+        reader = threading.Thread(
+            target=shutil.copyfileobj, args=(proc.stdout, fp), daemon=True
+        )
+        reader.start()
+
+        def encode(rgb: np.ndarray) -> None:
+            assert proc.stdin is not None
+            try:
+                proc.stdin.write(rgb.tobytes())
+            except BrokenPipeError:
+                # ffmpeg failed; its error is raised below
+                pass
+
+        try:
+            yield encode
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = proc.wait()
+            reader.join()
+        if returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(
+                f"ffmpeg failed to encode the video:\n{stderr.read().decode(errors='replace')}"
+            )
+
+
+def _write_video(
+    fp: BinaryIO,
+    frames: Iterable[np.ndarray],
+    fps: int,
+    options: dict[str, Any] | None,
+    nodata_color: tuple[int, int, int],
+) -> None:
+    "Encode RGBA (or RGB) frames as an H.264 MP4 video one at a time, filling transparent pixels with ``nodata_color``"
+    rgbs = (_fill_nodata(rgba, nodata_color) for rgba in frames)
+    first = next(rgbs)
+    with _video_encoder(fp, (first.shape[1], first.shape[0]), fps, options) as encode:
+        for rgb in itertools.chain([first], rgbs):
+            encode(rgb)
+
+
+def _display_image(
+    data: bytes, format: Literal["gif", "webp", "png", "mp4"] = "gif"
+) -> IPython.display.Image | IPython.display.Video:
+    try:
+        import IPython.display
+    except ImportError:
+        raise ImportError(
+            "Cannot return an Image to display in a notebook, since IPython is not installed. "
+            "Pass a path or file to save the GIF to as the `to=` argument. "
+            "To get the GIF data as bytes, pass an instance of `io.BytesIO()`.\n"
+            "If this error is coming from your distributed cluster and you called `dgif`, "
+            "then IPython is not installed on your dask workers. Either install it, or "
+            "pass `dgif(arr, bytes=True)` to return the GIF as bytes. "
+            "Then use `IPython.display.Image(data=computed_bytes)` to show the image."
+        )
+    else:
+        if format == "mp4":
+            return IPython.display.Video(data, embed=True, mimetype="video/mp4")
+        return IPython.display.Image(data=data)
+
+
+def gif(
+    arr: xr.DataArray,
+    *,
+    to: str | Path | BinaryIO | None = None,
+    fps: int = 16,
+    robust: bool = True,
+    robust_method: Literal["histogram", "exact"] = "exact",
+    vmin: float | None = None,
+    vmax: float | None = None,
+    per_band: bool = False,
+    cmap: str | matplotlib.colors.Colormap | None = None,
+    date_format: str | None = "%Y-%m-%d",
+    date_position: Literal["ul", "ur", "ll", "lr"] = "ul",
+    date_color: tuple[int, int, int] = (255, 255, 255),
+    date_bg: tuple[int, int, int] | None = (0, 0, 0),
+    date_size: int | float = 0.15,
+    palette: Literal["global", "frame"] = "frame",
+    delta: bool = False,
+    format: Literal["gif", "webp", "png", "mp4"] = "gif",
+    format_options: dict[str, Any] | None = None,
+    encoder: Literal["pillow", "gifsicle"] | Callable[[np.ndarray], bytes] = "pillow",
+    nodata_color: tuple[int, int, int] = (0, 0, 0),
+    workers: int | None = 1,
+    tile_size: int | None = None,
+    scratch_dir: str | os.PathLike | None = None,
+    max_size: int | None = None,
+    scale: int = 1,
+    max_frames: int | None = None,
+    resample: str | None = None,
+    max_duration: float | None = None,
+    stats: Callable[[dict[str, Any]], Any] | None = None,
+) -> IPython.display.Image | None:
+    """
+    Render a `~xarray.DataArray` timestack (``time``, ``band``, ``y``, ``x``) into a GIF.
+
+    If the `~xarray.DataArray` contains a `dask.array.Array`, use `dgif` (delayed-GIF) instead.
+
+    The `~xarray.DataArray` must have 1 or 3 bands.
+
+    Unless ``date_format=None``, a small timestamp will be printed onto each frame of the animation.
+    You can control the position and styling of this with the ``date_position``, ``date_color``, and
+    ``date_bg`` arguments.
+
+    Parameters
+    ----------
+    arr:
+        Time-stacked array to animate. Must have 3 or 4 dimensions, which are assumed to be
+        in the order ``time``, [optional ``band``], ``y``, ``x``.
+    to:
+        Where to write the GIF. If None (default), an `IPython.display.Image` is returned,
+        which will display the GIF in your Jupyter notebook.
+    fps:
+        Frames per second
+    robust:
+        Calculate ``vmin`` and ``vmax`` from the 2nd and 98th percentiles of the data
+        (default True)
+    robust_method:
+        How to calculate the percentiles when ``robust=True``.
+
+        ``"exact"`` (default) calculates the exact percentiles.
+
+        ``"histogram"`` estimates them from a histogram of the data, built one frame at a
+        time. That's faster and uses less memory for long timestacks, since the data is never
+        copied or sorted. The estimates are within 1/65536th of the data's range of the exact
+        values.
+
+        Either way, percentiles of 8- and 16-bit integer data are exact, and calculated by
+        counting how many times each value occurs.
+    vmin:
+        Value in the data to map to 0 (black). If None (default), it's calculated
+        from the minimum value of the data or the 2nd percentile, depending on ``robust``.
+    vmax:
+        Value in the data to map to 255 (white). If None (default), it's calculated
+        from the maximum value of the data or the 98nd percentile, depending on ``robust``.
+    per_band:
+        Stretch each band of RGB data separately (default False). Missing ``vmin`` and ``vmax``
+        are calculated for each band on its own, like a per-band contrast stretch, which can
+        bring out color in hazy or unbalanced imagery. Given ``vmin`` or ``vmax`` apply to
+        every band.
+    cmap:
+        Colormap to use for single-band data. Can be a
+        :doc:`matplotlib colormap name <gallery/color/colormap_reference>` as a string,
+        or a `~matplotlib.colors.Colormap` object for custom colormapping.
+
+        If None (default), the default matplotlib colormap (usually ``viridis``) will automatically
+        be used for 1-band data. Setting a colormap for multi-band data is an error.
+    date_format:
+        Date format string (like ``"%Y-%m-%d"``, the default) used to format the timestamps
+        written onto each frame of the animation. If the coordinates for axis 0 of the
+        `~xarray.DataArray` are not timestamps or timedeltas, you must explicitly pass
+        ``date_format=None``.
+
+        See the `Python string format doc
+        <https://docs.python.org/3/library/datetime.html#strftime-strptime-behavior>`__
+        for details.
+    date_position:
+        Where to print the timestamp on each frame.
+        One of ``"ul"`` (upper-left), ``"ur"`` (upper-right), ``"ll"`` (lower-left),
+        ``"lr"`` (lower-right), default ``"ul"``.
+    date_color:
+        Color for the timestamp font, as an RGB 3-tuple. Default: ``(255, 255, 255)``
+        (white).
+    date_bg:
+        Fill color to draw behind the timestamp (for legibility), as an RGB 3-tuple.
+        Default: ``(0, 0, 0)`` (black). Set to None to disable.
+    date_size:
+        If a float, make the label this fraction of the width of the image.
+        If an int, use this absolute font size for the label.
+        Default: 0.15 (so the label is 15% of the image width).
+
+        Note that if Pillow does not have FreeType support, the font size
+        cannot be adjusted, and the text will be whatever size Pillow's
+        default basic font is (usually rather small).
+    palette:
+        How to pick the (at most 256) colors in the GIF. Single-band data always uses one palette
+        made from the colormap, whichever you pick; this only matters for RGB data.
+
+        ``"frame"`` (default) picks a separate palette for every frame, which matches each frame's
+        colors as closely as possible.
+
+        ``"global"`` uses one palette for the whole animation, picked from a sample of frames, and
+        stored once in the GIF. This is much faster, keeps colors from flickering between frames,
+        and is needed for ``delta`` and ``tile_size``. But 256 colors shared by every frame can't
+        match any one of them as well, so colors are noticeably less accurate: typically about
+        20% more error on average, and much more in the worst-matched pixels.
+    delta:
+        Only write the part of each frame that changed since the previous one (default False).
+
+        Each frame is cropped to the box around the pixels that changed, and unchanged pixels in
+        that box are made transparent, so they compress to almost nothing. For timestacks with
+        large static areas (nodata, water, masked clouds), this makes the GIF much smaller and
+        faster to write. It only applies when frames share a palette; RGB data with
+        ``palette="frame"`` (the default) is always written as full frames.
+    format:
+        Animation format to write: ``"gif"`` (default), ``"webp"`` for animated WebP,
+        ``"png"`` for APNG (animated PNG), or ``"mp4"`` for H.264 video.
+        ``palette`` and ``delta`` only apply to GIFs.
+
+        WebP and APNG aren't limited to 256 colors, and are often several times smaller
+        than GIFs. They're encoded by Pillow, which needs all the rendered frames in memory
+        at once (or on disk, with ``scratch_dir``).
+
+        MP4 is best for very long timestacks, which would make huge GIFs. Frames are encoded
+        one at a time, with `PyAV <https://pyav.org>`__ if it's installed, otherwise with the
+        ``ffmpeg`` program. Video has no transparency, so missing pixels are ``nodata_color``.
+    format_options:
+        Extra options for the encoder, when ``format`` isn't ``"gif"``. For WebP, like
+        ``{"lossless": True}`` or ``{"quality": 90, "method": 6, "minimize_size": True}``;
+        for APNG, like ``{"optimize": True}``. See the `Pillow docs
+        <https://pillow.readthedocs.io/en/stable/handbook/image-file-formats.html>`__
+        for all the options. For MP4, these are
+        `libx264 options <https://trac.ffmpeg.org/wiki/Encode/H.264>`__,
+        like ``{"crf": 28, "preset": "fast"}``. For GIFs with ``encoder="gifsicle"``, these are
+        `gifsicle options <https://www.lcdf.org/gifsicle/man.html>`__, like
+        ``{"optimize": 3, "lossy": 20}`` (default ``{"optimize": 3}``).
+    encoder:
+        How to compress GIF frames. ``"pillow"`` (default) LZW-compresses each frame with Pillow.
+        With ``workers``, frames are compressed in parallel, since they're independent.
+
+        ``"gifsicle"`` also runs the whole GIF through the `gifsicle
+        <https://www.lcdf.org/gifsicle>`__ program (which must be installed) as it's written,
+        for more control over how hard it tries to shrink it, with ``format_options``.
+
+        Or, a function to LZW-compress each frame instead of Pillow, like a faster native
+        implementation. It's given the frame's palette indices, as a (``y``, ``x``) uint8
+        array, and must return the LZW code stream (with a minimum code size of 8) as bytes.
+        It's called in parallel from the ``workers`` threads.
+    nodata_color:
+        Color for missing (NaN) pixels in MP4 videos, as an RGB 3-tuple.
+        Default: ``(0, 0, 0)`` (black).
+    workers:
+        Number of threads to render frames with (default 1). Frames are colormapped, labeled, and
+        compressed in parallel, and written out in order as they're ready. If None, use one
+        thread per CPU.
+    tile_size:
+        Render each frame in square tiles this many pixels across, for rasters too big to render
+        all at once. Default: None (whole frames). Each tile is rescaled, colormapped, and matched
+        to the palette on its own, into a frame of palette indices kept in a temporary file instead
+        of memory, which is then labeled and compressed. So besides ``arr`` itself, memory use
+        depends on the size of the tiles, not the frames.
+
+        Robust ``vmin`` and ``vmax`` are always estimated from a histogram, built tile-by-tile
+        (see ``robust_method``), and the palette for RGB data is picked from a thinned-out sample
+        of frames. Only works for GIFs with one palette (``palette="global"``, or single-band
+        data), without ``delta``.
+    scratch_dir:
+        Directory to keep rendered frames in while they wait to be encoded, in memory-mapped
+        temporary files instead of memory, so the OS can page them out. Default: None (in memory).
+        This matters for WebP and APNG, which Pillow encodes from the whole stack of RGBA frames
+        at once; GIFs and MP4s are encoded frame-by-frame as they're rendered, so they don't need
+        it. With ``tile_size``, the frames of palette indices go here too (otherwise, in the
+        default temporary directory).
+    max_size:
+        Largest width or height of the GIF, in pixels. If ``arr`` is bigger, it's shrunk by the
+        smallest whole-number factor that fits, just like ``scale``. Default: None (no limit).
+    scale:
+        Shrink ``arr`` by this whole-number factor in both ``x`` and ``y`` (default 1), by averaging
+        each ``scale`` by ``scale`` block of pixels. NaNs are ignored in the average, so a pixel
+        is only missing if its whole block was.
+
+        This happens before anything else (including calculating ``vmin`` and ``vmax``), so it's
+        a cheap way to make small GIFs of huge arrays.
+    max_frames:
+        Most frames to animate. If there are more, this many are picked, evenly spaced in time.
+        Default: None (no limit).
+    resample:
+        Keep only the first frame in each period of this `pandas frequency
+        <https://pandas.pydata.org/docs/user_guide/timeseries.html#offset-aliases>`__, like
+        ``"MS"`` for one frame per month. The time coordinates must be datetimes or timedeltas.
+        Default: None (keep every frame).
+    max_duration:
+        Longest the animation should run, in seconds. Like ``max_frames``, with the number
+        of frames that fit in this time at ``fps``. Default: None (no limit).
+
+        Frames are selected (after ``resample``, then ``max_frames`` or ``max_duration``)
+        from the time coordinate alone, before any data is read.
+    stats:
+        Function to call with statistics about rendering the animation, once it's been written,
+        to find out where the time went. Default: None. It's given a dict of:
+
+        * ``"seconds"``: total time taken
+        * ``"frames"``: number of frames in the animation
+        * ``"bytes"``: size of the output, or None if it can't be told from ``to``
+        * ``"memory"``: peak bytes allocated while rendering, if `tracemalloc` is tracing;
+          otherwise None. `tracemalloc` traces the whole process, so this counts anything
+          else allocated meanwhile, and is None if another animation was being measured at
+          the same time, in another thread.
+        * ``"stages"``: a dict of ``{"seconds": ..., "calls": ...}`` for each stage of rendering:
+          ``"limits"`` (calculating ``vmin`` and ``vmax``), ``"palette"`` (picking the global
+          palette), ``"render"`` (rescaling and colormapping frames), ``"labels"`` (drawing
+          timestamps), ``"quantize"`` (fitting frames to their own palettes), and ``"encode"``
+          (compressing frames). A stage's time doesn't include any other stage running within
+          it. With ``workers``, time is summed across all the threads.
+        * ``"tasks"``: always 1 (see `dgif`)
+
+    Returns
+    -------
+    IPython.display.Image or None
+        If ``to`` is None, returns an `IPython.display.Image`, which will display the
+        GIF in a Jupyter Notebook. (You can also get the GIF data as bytes from the Image's
+        ``.data`` attribute.) For ``format="mp4"``, it's an `IPython.display.Video` instead.
+
+        Otherwise, returns None, and the GIF data is written to ``to``.
+
+    Example
+    -------
+    >>> # Generate a GIF and show it in your notebook:
+    >>> geogif.gif(arr, date_format="Year: %Y")
+
+    >>> # Write the GIF to a file, with no timestamp printed:
+    >>> geogif.gif(arr, to="animation.gif", fps=24, date_format=None)
+
+    >>> # Show a colormapped GIF of single-band data in your notebook,
+    >>> # with the timestamp font in black and no background behind it:
+    >>> geogif.gif(
+    ...     arr.sel(band="ndvi"), cmap="YlGn", date_color=(0, 0, 0), date_bg=None
+    ... )
+    """
+    if isinstance(arr.data, da.Array):
+        raise TypeError("DataArray contains delayed data; use `dgif` instead.")
+
+    arr, cmap = _validate_arr_for_gif(arr, cmap, date_format, date_position, date_size)
+    arr = _select_frames(arr, max_frames, resample, max_duration, fps)
+    arr = _downsample(arr, max_size, scale)
+    assert palette in (
+        "global",
+        "frame",
+    ), f"palette must be 'global' or 'frame', not {palette!r}"
+    assert robust_method in (
+        "histogram",
+        "exact",
+    ), f"robust_method must be 'histogram' or 'exact', not {robust_method!r}"
+    assert format in _FORMATS, f"format must be one of {_FORMATS}, not {format!r}"
+    assert workers is None or workers > 0, f"workers must be positive, not {workers}"
+    workers = workers if workers is not None else os.cpu_count() or 1
+    lzw = _check_encoder(encoder, format)
+    _check_tiles(tile_size, format, palette, cmap, delta)
+    if tile_size is not None:
+        robust_method = "histogram"
+    with _measuring(stats) if stats is not None else contextlib.nullcontext():
+        vmin, vmax = _stretch_limits(
+            arr.data, vmin, vmax, robust, robust_method, per_band, tile_size
+        )
+
+        labels = fnt = None
+        if date_format:
+            time_coord = arr[arr.dims[0]]
+            labels = time_coord.dt.strftime(date_format).data
+            fnt = _get_font(date_size, labels, arr.shape[-1])
+
+        out = to if to is not None else io.BytesIO()
+        if format != "gif":
+            with _frame_map(workers) as imap, _open_output(out) as fp:
+                start = _tell(fp)
+                frames = _rgba_frames(
+                    arr.data,
+                    labels,
+                    vmin,
+                    vmax,
+                    cmap,
+                    fnt,
+                    date_position,
+                    date_color,
+                    date_bg,
+                    imap,
+                )
+                if scratch_dir is not None and format != "mp4":
+                    # Pillow needs every frame at once to write WebP or APNG
+                    frames = _spill(frames, len(arr), scratch_dir)
+                _write_animation(fp, frames, format, fps, format_options, nodata_color)
+                _record_output(len(arr), _bytes_written(fp, start))
+            if to is None and isinstance(out, io.BytesIO):
+                return _display_image(out.getvalue(), format)
+            return None
+
+        gif_palette = None
+        if palette == "global" or cmap is not None:
+            samples = _palette_samples(arr.data, tile_size) if cmap is None else None
+            gif_palette = _global_palette(
+                samples, vmin, vmax, cmap, labels is not None, date_color, date_bg
+            )
+        # The colormap is one palette for every frame, so it's only stored once
+        global_palette = palette == "global" or cmap is not None
+
+        with _open_output(out) as fp:
+            start = _tell(fp)
+            with (
+                _gifsicle(fp, format_options)
+                if encoder == "gifsicle"
+                else contextlib.nullcontext(fp)
+            ) as gif_fp:
+                gif_fp.write(
+                    _gif_header(
+                        (arr.shape[-1], arr.shape[-2]),
+                        gif_palette.colors if global_palette and gif_palette else None,
+                    )
+                )
+                for block in _gif_frames(
+                    arr.data,
+                    labels,
+                    vmin,
+                    vmax,
+                    cmap,
+                    gif_palette,
+                    fnt,
+                    date_position,
+                    date_color,
+                    date_bg,
+                    duration=_gif_duration(fps),
+                    local_palette=not global_palette,
+                    delta=delta,
+                    workers=workers,
+                    tile_size=tile_size,
+                    scratch_dir=scratch_dir,
+                    lzw=lzw,
+                ):
+                    gif_fp.write(block)
+                gif_fp.write(_GIF_TRAILER)
+            _record_output(len(arr), _bytes_written(fp, start))
+
+        if to is None and isinstance(out, io.BytesIO):
+            # second `isinstance` is just for the typechecker
+            return _display_image(out.getvalue())
+
+
+def _check_frame(frame: np.ndarray, shape: tuple[int, ...] | None = None) -> np.ndarray:
+    "Check that ``frame`` is a uint8 RGB or RGBA frame (of ``shape``, if given) for `encode`"
+    frame = np.asarray(frame)
+    if frame.dtype != np.uint8 or frame.ndim != 3 or frame.shape[-1] not in (3, 4):
+        raise ValueError(
+            "Frames must be uint8 arrays of shape (y, x, 3) for RGB or (y, x, 4) for RGBA, "
+            f"not {frame.dtype} with shape {frame.shape}"
+        )
+    if shape is not None and frame.shape != shape:
+        raise ValueError(
+            f"Every frame must have the same shape as the first, {shape}, not {frame.shape}"
+        )
+    return frame
+
+
+def encode(
+    frames: Iterable[np.ndarray],
+    *,
+    to: str | Path | BinaryIO | None = None,
+    fps: int = 16,
+    palette: Literal["global", "frame"] = "frame",
+    delta: bool = False,
+    format: Literal["gif", "webp", "png", "mp4"] = "gif",
+    format_options: dict[str, Any] | None = None,
+    encoder: Literal["pillow", "gifsicle"] | Callable[[np.ndarray], bytes] = "pillow",
+    nodata_color: tuple[int, int, int] = (0, 0, 0),
+    workers: int | None = 1,
+    stats: Callable[[dict[str, Any]], Any] | None = None,
+) -> IPython.display.Image | None:
+    """
+    Encode frames you've already rendered into a GIF (or another ``format``).
+
+    This is the second half of `gif`, for when you have the colors already: there's no
+    rescaling, colormapping, or timestamps, just picking palettes and compressing. C-contiguous
+    RGBA frames are handed to the encoder as they are, without copying them; RGB frames are
+    copied into Pillow's own 4-byte-per-pixel layout.
+
+    Parameters
+    ----------
+    frames:
+        The frames to animate, in order, as uint8 arrays of shape (``y``, ``x``, 4) for RGBA,
+        or (``y``, ``x``, 3) for RGB. Fully transparent pixels (alpha of 0) are missing;
+        any other alpha counts as opaque in GIFs. Can be one (``time``, ``y``, ``x``, 4 or 3)
+        array, a list of frames, or (unless ``palette="global"``) any iterator of them, which is
+        only read one frame at a time (except for WebP and APNG, which Pillow needs all at once).
+    to:
+        Where to write the GIF. If None (default), an `IPython.display.Image` is returned,
+        which will display the GIF in your Jupyter notebook.
+    fps:
+        Frames per second
+    palette:
+        How to pick the (at most 256) colors in the GIF. ``"frame"`` (default) picks a separate
+        palette for every frame. ``"global"`` picks one palette for the whole animation from a
+        sample of frames, which is faster but less accurate, and needs ``frames`` to be an array
+        or list. See `gif`.
+    delta:
+        Only write the part of each frame that changed since the previous one (default False).
+        Only applies with ``palette="global"``. See `gif`.
+    format:
+        Animation format to write: ``"gif"`` (default), ``"webp"``, ``"png"`` (APNG),
+        or ``"mp4"``. See `gif`.
+    format_options:
+        Options for the encoder of a WebP, APNG, or MP4, or for gifsicle. See `gif`.
+    encoder:
+        How to compress GIF frames: ``"pillow"`` (default), ``"gifsicle"``, or a function
+        to LZW-compress each frame. See `gif`.
+    nodata_color:
+        Color for missing pixels in MP4 videos, as an RGB 3-tuple. Default: ``(0, 0, 0)`` (black).
+    workers:
+        Number of threads to fit frames to palettes and compress them with (default 1).
+        If None, use one thread per CPU.
+    stats:
+        Function to call with statistics about encoding the animation, like for `gif`.
+        The stages are ``"palette"``, ``"quantize"`` (fitting frames to the palette),
+        and ``"encode"``.
+
+    Returns
+    -------
+    IPython.display.Image or None
+        If ``to`` is None, returns an `IPython.display.Image`, which will display the
+        GIF in a Jupyter Notebook. For ``format="mp4"``, it's an `IPython.display.Video`.
+        Otherwise, returns None, and the GIF data is written to ``to``.
+
+    Example
+    -------
+    >>> # Animate RGBA frames rendered some other way, like with matplotlib:
+    >>> rgba = np.stack([render(t) for t in times])  # (time, y, x, 4) uint8
+    >>> geogif.encode(rgba, to="animation.gif", fps=8)
+    """
+    assert palette in (
+        "global",
+        "frame",
+    ), f"palette must be 'global' or 'frame', not {palette!r}"
+    assert format in _FORMATS, f"format must be one of {_FORMATS}, not {format!r}"
+    assert workers is None or workers > 0, f"workers must be positive, not {workers}"
+    workers = workers if workers is not None else os.cpu_count() or 1
+    lzw = _check_encoder(encoder, format)
+    global_palette = format == "gif" and palette == "global"
+    if global_palette and not isinstance(frames, (Sequence, np.ndarray)):
+        raise ValueError(
+            "`palette='global'` needs all the frames up front to pick colors from. "
+            "Pass them as an array or list, or use `palette='frame'`."
+        )
+
+    rest = iter(frames)
+    first = next(rest, None)
+    if first is None:
+        raise ValueError("No frames to encode")
+    first = _check_frame(first)
+    n_frames = 1
+
+    def checked() -> Iterator[np.ndarray]:
+        nonlocal n_frames
+        yield first
+        for frame in rest:
+            n_frames += 1
+            yield _check_frame(frame, first.shape)
+
+    out = to if to is not None else io.BytesIO()
+    with _measuring(stats) if stats is not None else contextlib.nullcontext():
+        with _frame_map(workers) as imap, _open_output(out) as fp:
+            start = _tell(fp)
+            if format != "gif":
+                _write_animation(
+                    fp, checked(), format, fps, format_options, nodata_color
+                )
+            else:
+                duration = _gif_duration(fps)
+                gif_palette = None
+                parts: Iterator[tuple[Image.Image, int | None, int, tuple[int, int]]]
+                if global_palette:
+                    assert isinstance(frames, (Sequence, np.ndarray))
+                    with _stage("palette"):
+                        gif_palette = _rgb_palette(
+                            (
+                                _check_frame(frames[i])
+                                for i in _sample_frames(len(frames))
+                            ),
+                            False,
+                            (0, 0, 0),
+                            None,
+                        )
+                    match = _color_matcher(gif_palette)
+
+                    def index(frame: np.ndarray) -> tuple[np.ndarray, bool]:
+                        with _stage("quantize"):
+                            return _match_frame(frame, gif_palette, match)
+
+                    parts = _indexed_parts(imap(index, checked()), gif_palette, delta)
+                else:
+                    parts = (
+                        (p, transparency, 2, (0, 0))
+                        for p, transparency in imap(
+                            lambda frame: _quantize(_frame_image(frame)), checked()
+                        )
+                    )
+
+                def encode_part(
+                    part: tuple[Image.Image, int | None, int, tuple[int, int]]
+                ) -> bytes:
+                    p, transparency, disposal, offset = part
+                    return _encode_gif_frame(
+                        p,
+                        transparency,
+                        duration,
+                        disposal,
+                        offset,
+                        not global_palette,
+                        lzw,
+                    )
+
+                with (
+                    _gifsicle(fp, format_options)
+                    if encoder == "gifsicle"
+                    else contextlib.nullcontext(fp)
+                ) as gif_fp:
+                    gif_fp.write(
+                        _gif_header(
+                            (first.shape[1], first.shape[0]),
+                            gif_palette.colors if gif_palette is not None else None,
+                        )
+                    )
+                    gif_fp.writelines(imap(encode_part, parts))
+                    gif_fp.write(_GIF_TRAILER)
+            _record_output(n_frames, _bytes_written(fp, start))
+
+    if to is None and isinstance(out, io.BytesIO):
+        return _display_image(out.getvalue(), format)
+    return None
+
+
+def _gif(
+    arr: xr.DataArray,
+    bytes=False,
+    to: str | MutableMapping[Any, bytes] | None = None,
+    key: Any = None,
+    **kwargs,
+):
+    if to is not None:
+        return _store_gif(lambda f: gif(arr, to=f, **kwargs), to, key, len(arr))
+    buffer = io.BytesIO() if bytes else None
+    out = gif(arr, to=buffer, **kwargs)
+    return buffer.getvalue() if buffer is not None else out
+
+
+class _DeltaChunk(NamedTuple):
+    """
+    A chunk of delta frames (see `_delta_frames`), rendered apart from the others by `_gif_chunk`.
+
+    A frame drawn right after one that's cleared (disposal 2) depends on exactly what was cleared,
+    which depends on the frames before it, back to the last one that wasn't cleared. So the
+    frames at the start of the chunk that depend on chunks before it are left as palette indices
+    in ``head``, for `_resolve_delta` to encode once that's known. ``before`` and ``after`` are
+    the indices of the frames on either side of ``head`` (None at the ends of the animation).
+
+    ``data`` holds the encoded blocks of the rest of the chunk, and ``rect`` the ``(x0, y0, x1, y1)``
+    box its last frame clears, if it's cleared.
+    """
+
+    head: list[np.ndarray]
+    before: np.ndarray | None
+    after: np.ndarray | None
+    data: bytes
+    rect: tuple[int, int, int, int] | None
+
+
+def _encode_delta(
+    indexed: Sequence[np.ndarray],
+    count: int,
+    palette: _Palette,
+    screen: np.ndarray | None,
+    duration: int,
+    local_palette: bool,
+    lzw: Callable[[np.ndarray], bytes] | None = None,
+) -> tuple[bytes, tuple[int, int, int, int] | None]:
+    """
+    Encode the first ``count`` frames of palette indices as `_delta_frames`, drawn over ``screen``.
+
+    Returns the GIF image blocks, and the ``(x0, y0, x1, y1)`` box the last frame clears, if any.
+    """
+    blocks = []
+    rect = None
+    crops = _delta_frames(indexed, palette, screen)
+    for crop, (x, y), disposal, transparency in itertools.islice(crops, count):
+        blocks.append(
+            _encode_gif_frame(
+                _palette_image(crop, palette),
+                transparency,
+                duration,
+                disposal,
+                (x, y),
+                local_palette,
+                lzw,
+            )
+        )
+        rect = (x, y, x + crop.shape[1], y + crop.shape[0]) if disposal == 2 else None
+    return b"".join(blocks), rect
+
+
+def _delta_chunk(
+    indexed: list[np.ndarray],
+    start: int,
+    stop: int,
+    palette: _Palette,
+    duration: int,
+    local_palette: bool,
+    lzw: Callable[[np.ndarray], bytes] | None = None,
+) -> _DeltaChunk:
+    "Encode the frames ``indexed[start:stop]`` as a `_DeltaChunk`, given the frames on either side of them"
+    transparent = palette.missing if palette.missing_transparent else None
+
+    def cleared(i: int) -> bool:
+        # Whether frame ``i`` is cleared after it's shown, since pixels go missing in the next one
+        return (
+            transparent is not None
+            and i + 1 < len(indexed)
+            and bool(
+                ((indexed[i + 1] == transparent) & (indexed[i] != transparent)).any()
+            )
+        )
+
+    head_stop = start
+    if start > 0 and cleared(start - 1):
+        head_stop += 1
+        while head_stop < stop and cleared(head_stop - 1):
+            head_stop += 1
+
+    # After a frame that isn't cleared, the screen shows exactly that frame
+    data, rect = _encode_delta(
+        indexed[head_stop:],
+        stop - head_stop,
+        palette,
+        indexed[head_stop - 1] if head_stop > 0 else None,
+        duration,
+        local_palette,
+        lzw,
+    )
+    return _DeltaChunk(
+        indexed[start:head_stop],
+        indexed[start - 1] if start > 0 else None,
+        indexed[head_stop] if head_stop < len(indexed) else None,
+        data,
+        rect,
+    )
+
+
+def _resolve_delta(
+    chunk: _DeltaChunk,
+    rect: tuple[int, int, int, int] | None,
+    palette: _Palette,
+    duration: int,
+    local_palette: bool,
+    lzw: Callable[[np.ndarray], bytes] | None = None,
+) -> tuple[bytes, tuple[int, int, int, int] | None]:
+    """
+    Finish encoding a `_DeltaChunk`, given the box ``rect`` the chunk before it clears at the end, if any.
+
+    Returns the chunk's GIF image blocks, and the box it clears at the end, for the next chunk.
+    """
+    if not chunk.head:
+        return chunk.data, chunk.rect
+
+    assert chunk.before is not None
+    screen = chunk.before
+    if rect is not None:
+        x0, y0, x1, y1 = rect
+        screen = screen.copy()
+        screen[y0:y1, x0:x1] = palette.missing
+    head, head_rect = _encode_delta(
+        chunk.head + ([chunk.after] if chunk.after is not None else []),
+        len(chunk.head),
+        palette,
+        screen,
+        duration,
+        local_palette,
+        lzw,
+    )
+    return head + chunk.data, chunk.rect if chunk.data else head_rect
+
+
+def _gif_chunk(
+    block: np.ndarray,
+    labels: Sequence[str] | None,
+    vmin: float | None,
+    vmax: float | None,
+    robust: bool,
+    cmap: matplotlib.colors.Colormap | None,
+    palette: _Palette | None,
+    font_size: int | float,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+    duration: int,
+    local_palette: bool,
+    delta: bool = False,
+    prev_frame: np.ndarray | None = None,
+    next_frame: np.ndarray | None = None,
+    lzw: Callable[[np.ndarray], bytes] | None = None,
+) -> bytes | _DeltaChunk:
+    """
+    Render a chunk of frames into concatenated GIF image blocks.
+
+    For ``delta`` with a ``palette``, ``prev_frame`` and ``next_frame`` are the
+    (1, ``band``, ``y``, ``x``) frames on either side of the chunk (None at the ends of the
+    animation), and ``labels`` must include them. The frames at the edges of the chunk depend on
+    them, and maybe on the chunks before, so this returns a `_DeltaChunk` to `_resolve_delta` instead.
+    """
+    start = int(prev_frame is not None)
+    stop = start + len(block)
+    if prev_frame is not None or next_frame is not None:
+        block = np.concatenate(
+            [frame for frame in (prev_frame, block, next_frame) if frame is not None]
+        )
+    # Limits that need the data have already been computed; this just fills in defaults
+    # (or raises errors about them) the same way `gif` would.
+    vmin, vmax = _resolve_limits(block, vmin, vmax, robust)
+    fnt = _get_font(font_size, labels, block.shape[-1]) if labels is not None else None
+    if delta and palette is not None:
+        indexed = [
+            indices
+            for indices, _ in _indexed_frames(
+                block, labels, vmin, vmax, cmap, palette, fnt, date_position
+            )
+        ]
+        return _delta_chunk(indexed, start, stop, palette, duration, local_palette, lzw)
+    return b"".join(
+        _gif_frames(
+            block,
+            labels,
+            vmin,
+            vmax,
+            cmap,
+            palette,
+            fnt,
+            date_position,
+            date_color,
+            date_bg,
+            duration,
+            local_palette,
+            lzw=lzw,
+        )
+    )
+
+
+# Most frames each `dgif` task renders and compresses
+_TASK_FRAMES = 16
+
+
+def _split_frames(data: da.Array, frames: int) -> da.Array:
+    """
+    Split chunks of ``data`` with more than ``frames`` frames into nearly-equal pieces.
+
+    Chunks are only ever split, never merged, so the frames of one chunk are still computed
+    together, but they're rendered and compressed by several tasks in parallel.
+    """
+    chunks: list[int] = []
+    for chunk in data.chunks[0]:
+        pieces = -(-chunk // frames)
+        chunks.extend(chunk // pieces + (i < chunk % pieces) for i in range(pieces))
+    return data.rechunk({0: tuple(chunks)})
+
+
+def _tile_chunks(data: da.Array, tile_size: int) -> da.Array:
+    """
+    Rechunk ``data`` as little as possible for `_index_tile`: all bands together, and ``y`` and ``x``
+    chunks no bigger than ``tile_size``. Smaller chunks are left as they are.
+    """
+    chunks: dict[int, int] = {1: -1}
+    for axis in (2, 3):
+        if max(data.chunks[axis]) > tile_size:
+            chunks[axis] = tile_size
+    return data.rechunk(chunks)
+
+
+def _index_tile(
+    block: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    robust: bool,
+    cmap: matplotlib.colors.Colormap | None,
+    palette: _Palette,
+) -> np.ndarray:
+    "Render a (``time``, ``band``, ``y``, ``x``) tile into (``time``, ``y``, ``x``) indices into ``palette``"
+    # Like `_gif_chunk`, this just fills in default limits
+    vmin, vmax = _resolve_limits(block, vmin, vmax, robust)
+    match = _color_matcher(palette) if cmap is None else None
+    indices = np.empty((len(block),) + block.shape[2:], dtype="uint8")
+    for i, frame in enumerate(block):
+        indices[i], _ = _render_indexed_frame(frame, vmin, vmax, palette, match)
+    return indices
+
+
+def _gif_tiles_chunk(
+    tiles: list[list[np.ndarray]],
+    labels: Sequence[str] | None,
+    font_size: int | float,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    palette: _Palette,
+    duration: int,
+    local_palette: bool,
+    scratch_dir: str | os.PathLike | None = None,
+    lzw: Callable[[np.ndarray], bytes] | None = None,
+) -> bytes:
+    """
+    Encode a chunk of frames from a grid (rows, then columns) of `_index_tile` results, like `_gif_chunk`.
+
+    Each frame is pieced together in a `_scratch` array in ``scratch_dir`` before it's labeled
+    and encoded.
+    """
+    ys = np.cumsum([0] + [row[0].shape[1] for row in tiles])
+    xs = np.cumsum([0] + [tile.shape[2] for tile in tiles[0]])
+    fnt = _get_font(font_size, labels, xs[-1]) if labels is not None else None
+
+    def indexed() -> Iterator[tuple[np.ndarray, bool]]:
+        for i in range(len(tiles[0][0])):
+            indices = _scratch((ys[-1], xs[-1]), dir=scratch_dir)
+            missing = False
+            for row, y0, y1 in zip(tiles, ys[:-1], ys[1:]):
+                for tile, x0, x1 in zip(row, xs[:-1], xs[1:]):
+                    indices[y0:y1, x0:x1] = tile[i]
+                    missing = missing or bool((tile[i] == palette.missing).any())
+            if labels is not None:
+                assert fnt is not None
+                _draw_indexed_label(indices, labels[i], fnt, date_position, palette)
+            yield indices, missing
+
+    return b"".join(
+        _encode_gif_frame(
+            p, transparency, duration, disposal, offset, local_palette, lzw
+        )
+        for p, transparency, disposal, offset in _indexed_parts(indexed(), palette)
+    )
+
+
+def _sampled_palette(
+    samples: np.ndarray,
+    vmin: float | None,
+    vmax: float | None,
+    robust: bool,
+    labels: bool,
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+) -> _Palette:
+    "Pick a global palette for RGB data from sample frames, filling in default limits like `_gif_chunk`"
+    vmin, vmax = _resolve_limits(samples, vmin, vmax, robust)
+    return _global_palette(samples, vmin, vmax, None, labels, date_color, date_bg)
+
+
+def _assemble_gif(
+    size: tuple[int, int],
+    chunks: list[bytes],
+    palette: _Palette | None = None,
+    bytes: bool = False,
+    to: str | MutableMapping[Any, bytes] | None = None,
+    key: Any = None,
+    frames: int = 0,
+    gifsicle: bool = False,
+    options: dict[str, Any] | None = None,
+):
+    """
+    Join rendered chunks of frames into a complete GIF, with ``palette`` as its global color table.
+
+    With ``to``, write the GIF there (see `_store_gif`) instead of returning it.
+    With ``gifsicle``, the GIF is optimized by `_gifsicle` (with ``options``) on the way.
+    """
+    header = _gif_header(size, palette.colors if palette is not None else None)
+    blocks = [header, *chunks, _GIF_TRAILER]
+
+    def write(fp: BinaryIO) -> None:
+        with _gifsicle(fp, options) if gifsicle else contextlib.nullcontext(fp) as f:
+            f.writelines(blocks)
+
+    if to is not None:
+        return _store_gif(write, to, key, frames)
+    if gifsicle:
+        buffer = io.BytesIO()
+        write(buffer)
+        data = buffer.getvalue()
+    else:
+        data = b"".join(blocks)
+    _record_output(frames, len(data))
+    return data if bytes else _display_image(data)
+
+
+def _rgba_chunk(
+    block: np.ndarray,
+    labels: Sequence[str] | None,
+    vmin: float | None,
+    vmax: float | None,
+    robust: bool,
+    cmap: matplotlib.colors.Colormap | None,
+    font_size: int | float,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+    scratch_dir: str | os.PathLike | None = None,
+) -> np.ndarray:
+    """
+    Render a chunk of frames into a (``time``, ``y``, ``x``, 4) RGBA array, for `_assemble_animation`.
+
+    With ``scratch_dir``, the array is `_spill`ed to a scratch file there instead of kept in memory.
+    """
+    vmin, vmax = _resolve_limits(block, vmin, vmax, robust)
+    fnt = _get_font(font_size, labels, block.shape[-1]) if labels is not None else None
+    frames = _rgba_frames(
+        block, labels, vmin, vmax, cmap, fnt, date_position, date_color, date_bg
+    )
+    if scratch_dir is not None:
+        return _spill(frames, len(block), scratch_dir)
+    return np.stack(list(frames))
+
+
+def _assemble_animation(
+    chunks: list[np.ndarray],
+    format: Literal["webp", "png", "mp4"],
+    fps: int,
+    options: dict[str, Any] | None,
+    nodata_color: tuple[int, int, int] = (0, 0, 0),
+    bytes: bool = False,
+    to: str | MutableMapping[Any, bytes] | None = None,
+    key: Any = None,
+    frames: int = 0,
+):
+    "Encode rendered chunks of frames as one animated WebP, APNG, or MP4, like `_assemble_gif`"
+
+    def write(fp: BinaryIO) -> None:
+        rgbas = (rgba for chunk in chunks for rgba in chunk)
+        _write_animation(fp, rgbas, format, fps, options, nodata_color)
+
+    if to is not None:
+        return _store_gif(write, to, key, frames)
+    buffer = io.BytesIO()
+    write(buffer)
+    data = buffer.getvalue()
+    _record_output(frames, len(data))
+    return data if bytes else _display_image(data, format)
+
+
+@contextlib.contextmanager
+def _open_storage(path: str) -> Iterator[BinaryIO]:
+    "Open a local path (making its directory if needed) or fsspec URL for writing"
+    if "://" not in path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            yield f
+        return
+
+    try:
+        import fsspec
+    except ImportError:
+        raise ImportError(
+            f"fsspec must be installed to write GIFs to URLs like {path!r}.\n"
+            "Install it with `pip install fsspec`, or write to a local path instead."
+        )
+    with fsspec.open(path, "wb") as f:
+        yield f
+
+
+def _store_gif(
+    write: Callable[[BinaryIO], Any],
+    to: str | MutableMapping[Any, bytes],
+    key: Any,
+    frames: int,
+) -> dict[str, Any]:
+    """
+    Call ``write`` to write a GIF straight into the path ``to``, or else store it in the mapping ``to``
+    under ``key``. Returns a summary of the GIF, instead of the GIF itself.
+    """
+    start = time.perf_counter()
+    if isinstance(to, str):
+        with _open_storage(to) as f:
+            write(f)
+            size = f.tell()
+        path = to
+    else:
+        buffer = io.BytesIO()
+        write(buffer)
+        to[key] = data = buffer.getvalue()
+        size = len(data)
+        path = key
+    _record_output(frames, size)
+    return {
+        "path": path,
+        "size": size,
+        "frames": frames,
+        "seconds": time.perf_counter() - start,
+    }
+
 
+def _output_path(template: str | os.PathLike, arr: xr.DataArray) -> str:
+    "Fill in the ``{name}``, ``{start}``, and ``{end}`` fields of a path template for ``arr``"
+    times = arr[arr.dims[0]].to_index()
+    return os.fspath(template).format(name=arr.name, start=times[0], end=times[-1])
 
-def _get_font(
-    date_size: int | float, labels: list[str], image_width: int
-) -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
+
+class _Failed:
+    "Stands in for the result of a task that raised ``error``, and for anything computed from it"
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def __getitem__(self, key: Any) -> _Failed:
+        # so it can stand in for a tuple of results, too
+        return self
+
+
+class _Isolated:
     """
-    Get an appropriately-sized font for the requested ``date_size``
+    Wrap a task's function to return a `_Failed` instead of raising, so an error fails
+    only the GIF it's part of, not the whole graph.
 
-    When ``date_size`` is a float, figure out a font size that will make the width of the
-    text that fraction of the width of the image.
+    If any argument (or anything nested in a list or tuple argument) already failed, that's the result.
     """
-    if isinstance(date_size, int):
-        # absolute font size
-        return ImageFont.load_default(size=date_size)
 
-    target_width = date_size * image_width
-    test_label = max(labels, key=len)
+    def __init__(self, func: Callable[..., Any]):
+        # (Wrapping another wrapper copies its attributes, so set ``func`` after)
+        functools.update_wrapper(self, func)
+        self.func = func
 
-    fnt = ImageFont.load_default(size=5)
-    if isinstance(fnt, ImageFont.FreeTypeFont):
-        # NOTE: if Pillow doesn't have FreeType support, we won't get a font
-        # with adjustable size. So trying to increase the size would just
-        # loop infinitely.
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        failed = _find_failed(args) or _find_failed(list(kwargs.values()))
+        if failed is not None:
+            return failed
+        try:
+            return self.func(*args, **kwargs)
+        except Exception as e:
+            return _Failed(e)
 
-        def text_width(font) -> int:
-            bbox = font.getbbox(test_label)
-            return bbox[2] - bbox[0]
 
-        if text_width(fnt) > 0:
-            # check for zero-width so we don't loop forever.
-            # (could happen if `test_label` is an empty string or non-printable character)
+def _find_failed(x: Any) -> _Failed | None:
+    "The first `_Failed` in ``x``, or nested in it if it's a list or tuple, if any"
+    if isinstance(x, _Failed):
+        return x
+    if isinstance(x, (list, tuple)):
+        for y in x:
+            failed = _find_failed(y)
+            if failed is not None:
+                return failed
+    return None
 
-            # increment font until you get large enough text
-            while text_width(fnt) <= target_width:
-                try:
-                    size = fnt.size + 1
-                    fnt = ImageFont.load_default(size)
-                except OSError as e:
-                    raise RuntimeError(f"Invalid font size: {size}") from e
 
-    return fnt
+def _isolate_task(task: Any) -> Any:
+    "A dask task (or list of them) with every function in it, including in nested tasks, `_Isolated`"
+    if dask.core.istask(task):
+        func, *args = task
+        return (
+            func if isinstance(func, _Isolated) else _Isolated(func),
+            *(_isolate_task(arg) for arg in args),
+        )
+    if isinstance(task, list):
+        return [_isolate_task(t) for t in task]
+    return task
 
 
-def gif(
-    arr: xr.DataArray,
-    *,
-    to: str | Path | BinaryIO | None = None,
-    fps: int = 16,
-    robust: bool = True,
-    vmin: float | None = None,
-    vmax: float | None = None,
-    cmap: str | matplotlib.colors.Colormap | None = None,
-    date_format: str | None = "%Y-%m-%d",
-    date_position: Literal["ul", "ur", "ll", "lr"] = "ul",
-    date_color: tuple[int, int, int] = (255, 255, 255),
-    date_bg: tuple[int, int, int] | None = (0, 0, 0),
-    date_size: int | float = 0.15,
-) -> IPython.display.Image | None:
+def _isolate_graph(result: Delayed) -> Delayed:
     """
-    Render a `~xarray.DataArray` timestack (``time``, ``band``, ``y``, ``x``) into a GIF.
+    ``result``, with every task it depends on `_Isolated`, down to the ones that compute its input
+    arrays, so an error anywhere (like failing to read the data) only fails ``result``.
+    """
+    graph = dict(result.__dask_graph__())
+    return Delayed(
+        result.key, {key: _isolate_task(task) for key, task in graph.items()}
+    )
 
-    If the `~xarray.DataArray` contains a `dask.array.Array`, use `dgif` (delayed-GIF) instead.
 
-    The `~xarray.DataArray` must have 1 or 3 bands.
+class _WithStats:
+    """
+    The result of a `_Measured` task, along with the stats of that task and every measured task
+    it depends on, keyed by a unique ID for each task (so each is only counted once).
+    """
 
-    Unless ``date_format=None``, a small timestamp will be printed onto each frame of the animation.
-    You can control the position and styling of this with the ``date_position``, ``date_color``, and
-    ``date_bg`` arguments.
+    def __init__(self, value: Any, tasks: dict[str, dict[str, Any]]):
+        self.value = value
+        self.tasks = tasks
 
-    Parameters
-    ----------
-    arr:
-        Time-stacked array to animate. Must have 3 or 4 dimensions, which are assumed to be
-        in the order ``time``, [optional ``band``], ``y``, ``x``.
-    to:
-        Where to write the GIF. If None (default), an `IPython.display.Image` is returned,
-        which will display the GIF in your Jupyter notebook.
-    fps:
-        Frames per second
-    robust:
-        Calculate ``vmin`` and ``vmax`` from the 2nd and 98th percentiles of the data
-        (default True)
-    vmin:
-        Value in the data to map to 0 (black). If None (default), it's calculated
-        from the minimum value of the data or the 2nd percentile, depending on ``robust``.
-    vmax:
-        Value in the data to map to 255 (white). If None (default), it's calculated
-        from the maximum value of the data or the 98nd percentile, depending on ``robust``.
-    cmap:
-        Colormap to use for single-band data. Can be a
-        :doc:`matplotlib colormap name <gallery/color/colormap_reference>` as a string,
-        or a `~matplotlib.colors.Colormap` object for custom colormapping.
+    def __getitem__(self, key: Any) -> _WithStats:
+        # so it can stand in for a tuple of results, too
+        return _WithStats(self.value[key], self.tasks)
 
-        If None (default), the default matplotlib colormap (usually ``viridis``) will automatically
-        be used for 1-band data. Setting a colormap for multi-band data is an error.
-    date_format:
-        Date format string (like ``"%Y-%m-%d"``, the default) used to format the timestamps
-        written onto each frame of the animation. If the coordinates for axis 0 of the
-        `~xarray.DataArray` are not timestamps or timedeltas, you must explicitly pass
-        ``date_format=None``.
 
-        See the `Python string format doc
-        <https://docs.python.org/3/library/datetime.html#strftime-strptime-behavior>`__
-        for details.
-    date_position:
-        Where to print the timestamp on each frame.
-        One of ``"ul"`` (upper-left), ``"ur"`` (upper-right), ``"ll"`` (lower-left),
-        ``"lr"`` (lower-right), default ``"ul"``.
-    date_color:
-        Color for the timestamp font, as an RGB 3-tuple. Default: ``(255, 255, 255)``
-        (white).
-    date_bg:
-        Fill color to draw behind the timestamp (for legibility), as an RGB 3-tuple.
-        Default: ``(0, 0, 0)`` (black). Set to None to disable.
-    date_size:
-        If a float, make the label this fraction of the width of the image.
-        If an int, use this absolute font size for the label.
-        Default: 0.15 (so the label is 15% of the image width).
+class _Measured:
+    """
+    Wrap a task's function to collect `_Stats` while it runs, and return its result as a `_WithStats`.
 
-        Note that if Pillow does not have FreeType support, the font size
-        cannot be adjusted, and the text will be whatever size Pillow's
-        default basic font is (usually rather small).
+    Arguments (or elements of list arguments) that are `_WithStats` are unwrapped, and their stats
+    passed along.
+    """
 
-    Returns
-    -------
-    IPython.display.Image or None
-        If ``to`` is None, returns an `IPython.display.Image`, which will display the
-        GIF in a Jupyter Notebook. (You can also get the GIF data as bytes from the Image's
-        ``.data`` attribute.)
+    def __init__(self, func: Callable[..., Any]):
+        # (Wrapping another wrapper copies its attributes, so set ``func`` after)
+        functools.update_wrapper(self, func)
+        self.func = func
 
-        Otherwise, returns None, and the GIF data is written to ``to``.
+    def __call__(self, *args: Any, **kwargs: Any) -> _WithStats:
+        tasks: dict[str, dict[str, Any]] = {}
 
-    Example
-    -------
-    >>> # Generate a GIF and show it in your notebook:
-    >>> geogif.gif(arr, date_format="Year: %Y")
+        def unwrap(x: Any) -> Any:
+            if isinstance(x, list):
+                return [unwrap(y) for y in x]
+            if isinstance(x, _WithStats):
+                tasks.update(x.tasks)
+                return x.value
+            return x
 
-    >>> # Write the GIF to a file, with no timestamp printed:
-    >>> geogif.gif(arr, to="animation.gif", fps=24, date_format=None)
+        args = tuple(unwrap(arg) for arg in args)
+        kwargs = {k: unwrap(v) for k, v in kwargs.items()}
+        with _measuring() as stats:
+            result = self.func(*args, **kwargs)
+        tasks[uuid.uuid4().hex] = stats.as_dict()
+        return _WithStats(result, tasks)
 
-    >>> # Show a colormapped GIF of single-band data in your notebook,
-    >>> # with the timestamp font in black and no background behind it:
-    >>> geogif.gif(
-    ...     arr.sel(band="ndvi"), cmap="YlGn", date_color=(0, 0, 0), date_bg=None
-    ... )
-    """
-    if isinstance(arr.data, da.Array):
-        raise TypeError("DataArray contains delayed data; use `dgif` instead.")
 
-    arr, cmap = _validate_arr_for_gif(arr, cmap, date_format, date_position, date_size)
+def _task(
+    func: Callable[..., Any],
+    isolate: bool = False,
+    nout: int | None = None,
+    measure: bool = False,
+):
+    "`dask.delayed` version of ``func``, optionally `_Measured` and/or `_Isolated`"
+    func = _Measured(func) if measure else func
+    return dask.delayed(_Isolated(func) if isolate else func, pure=True, nout=nout)
 
-    # Rescale
-    if arr.dtype.kind == "b":
-        data = arr.data.astype("uint8", copy=False)
-    else:
-        if not robust and vmin is None and vmax is None:
-            vmin = np.nanmin(arr)
-            vmax = np.nanmax(arr)
-        rescaled: xr.DataArray = _rescale_imshow_rgb(arr, vmin, vmax, robust)
-        data: np.ndarray = rescaled.data
 
-    # Colormap
-    if arr.shape[1] == 1:
-        assert isinstance(cmap, matplotlib.colors.Colormap)
-        data = data[:, 0]
-        data = cmap(data)
-        data = np.moveaxis(data, -1, -3)  # colormap puts RGB last
-
-    # Convert to uint8
-    u8 = (data * 255).astype("uint8")
-    u8 = np.clip(u8, 0, 255, out=u8)
-    u8 = np.moveaxis(u8, -3, -1)
-
-    # Add alpha mask
-    if data.shape[1] == 4:
-        # colormap has already added the alpha band
-        frames = u8
-    else:
-        mask: np.ndarray = arr.isnull().data.any(axis=-3)
-        alpha = (~mask).astype("uint8", copy=False) * 255
-        frames = np.concatenate([u8, alpha[..., None]], axis=-1)
+def _result_with_stats(result: _WithStats) -> tuple[Any, dict[str, Any]]:
+    "The final result of a measured graph, and a summary of the stats of all its tasks"
+    return result.value, _merge_stats(result.tasks.values())
 
-    imgs = [Image.fromarray(frame) for frame in frames]
 
-    # Write timestamps onto each frame
-    if date_format:
-        time_coord = arr[arr.dims[0]]
-        labels = time_coord.dt.strftime(date_format).data
-
-        fnt = _get_font(date_size, labels, imgs[0].size[0])
-        for label, img in zip(labels, imgs):
-            # get a drawing context
-            d = ImageDraw.Draw(img)
-            d = cast(ImageDraw.ImageDraw, d)
-
-            width, height = img.size
-            t_bbox = fnt.getbbox(label)
-            t_width = t_bbox[2] - t_bbox[0]
-            t_height = t_bbox[3] - t_bbox[1]
-
-            offset = 15
-            if date_position[0] == "u":
-                y = offset
-            else:
-                y = height - t_height - offset
+def _prepare_dgif(
+    arr: xr.DataArray,
+    cmap: str | matplotlib.colors.Colormap | None,
+    fps: int,
+    robust_method: Literal["histogram", "exact"],
+    date_format: str | None,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_size: int | float,
+    palette: Literal["global", "frame"],
+    format: Literal["gif", "webp", "png", "mp4"],
+    max_size: int | None,
+    scale: int,
+    max_frames: int | None,
+    resample: str | None,
+    max_duration: float | None,
+    delta: bool = False,
+    tile_size: int | None = None,
+    encoder: str | Callable[[np.ndarray], bytes] = "pillow",
+) -> tuple[xr.DataArray, matplotlib.colors.Colormap | None]:
+    "Check the arguments to `dgif`, and select and shrink the array, all without computing anything"
+    if not isinstance(arr.data, da.Array):
+        raise TypeError(
+            "DataArray does not contain delayed (Dask) data; use `gif` instead to render a GIF locally."
+        )
 
-            if date_position[1] == "l":
-                x = offset
-            else:
-                x = width - t_width - offset
+    # Do some quick sanity checks to save you a lot of compute
+    arr, cmap = _validate_arr_for_gif(arr, cmap, date_format, date_position, date_size)
+    arr = _select_frames(arr, max_frames, resample, max_duration, fps)
+    arr = _downsample(arr, max_size, scale)
+    assert palette in (
+        "global",
+        "frame",
+    ), f"palette must be 'global' or 'frame', not {palette!r}"
+    assert robust_method in (
+        "histogram",
+        "exact",
+    ), f"robust_method must be 'histogram' or 'exact', not {robust_method!r}"
+    assert format in _FORMATS, f"format must be one of {_FORMATS}, not {format!r}"
+    _check_tiles(tile_size, format, palette, cmap, delta)
+    _check_encoder(encoder, format)
+    return arr, cmap
 
-            if date_bg:
-                pad = 0.1 * t_height  # looks nicer
-                d.rectangle(
-                    (x - pad, y - pad, x + t_width + pad, y + t_height + pad),
-                    fill=date_bg,
-                )
 
-            # NOTE: sometimes the text seems to incorporate its own internal offset.
-            # This will show up in the first two coordinates of `t_bbox`, so we
-            # "de-offset" by these to make the rectangle and text align.
-            d.multiline_text(
-                (x - t_bbox[0], y - t_bbox[1]), label, font=fnt, fill=date_color
-            )
+def _dgif_graph(
+    arr: xr.DataArray,
+    cmap: matplotlib.colors.Colormap | None,
+    *,
+    bytes: bool,
+    parallel: bool,
+    fps: int,
+    robust: bool,
+    robust_method: Literal["histogram", "exact"],
+    vmin: float | Delayed | None,
+    vmax: float | Delayed | None,
+    per_band: bool,
+    date_format: str | None,
+    date_position: Literal["ul", "ur", "ll", "lr"],
+    date_color: tuple[int, int, int],
+    date_bg: tuple[int, int, int] | None,
+    date_size: int | float,
+    palette: Literal["global", "frame"],
+    delta: bool,
+    format: Literal["gif", "webp", "png", "mp4"] = "gif",
+    format_options: dict[str, Any] | None = None,
+    encoder: str | Callable[[np.ndarray], bytes] = "pillow",
+    nodata_color: tuple[int, int, int] = (0, 0, 0),
+    tile_size: int | None = None,
+    scratch_dir: str | os.PathLike | None = None,
+    to: str | Delayed | None = None,
+    key: Any = None,
+    isolate: bool = False,
+    measure: bool = False,
+) -> Delayed:
+    """
+    Build the graph to render a GIF, from an array that's already been through `_prepare_dgif` and optimized.
 
-    out = to if to is not None else io.BytesIO()
-    imgs[0].save(
-        out,
-        format="gif",
-        save_all=True,
-        append_images=imgs[1:],
-        duration=1 / fps * 1000,  # ms
-        loop=False,
-        disposal=2,
+    With ``to`` (a path, or a delayed mapping to store the GIF in under ``key``), the GIF is
+    written there by the final task, which returns a summary of it (see `_store_gif`).
+    With ``isolate``, errors in rendering come out as a `_Failed` result instead of being raised.
+    With ``measure``, every task is `_Measured`, so the result is a `_WithStats`.
+    With ``tile_size``, each spatial chunk (at most ``tile_size`` across) of each frame is rendered separately.
+    """
+    if tile_size is not None:
+        # Like `gif`, since exact percentiles would need all the data in one place
+        robust_method = "histogram"
+    needs_percentiles = (
+        arr.dtype.kind != "b" and robust and (vmin is None or vmax is None)
     )
-    if to is None and isinstance(out, io.BytesIO):
-        # second `isinstance` is just for the typechecker
-        try:
-            import IPython.display
-        except ImportError:
-            raise ImportError(
-                "Cannot return an Image to display in a notebook, since IPython is not installed. "
-                "Pass a path or file to save the GIF to as the `to=` argument. "
-                "To get the GIF data as bytes, pass an instance of `io.BytesIO()`.\n"
-                "If this error is coming from your distributed cluster and you called `dgif`, "
-                "then IPython is not installed on your dask workers. Either install it, or "
-                "pass `dgif(arr, bytes=True)` to return the GIF as bytes. "
-                "Then use `IPython.display.Image(data=computed_bytes)` to show the image."
+    if needs_percentiles and robust_method == "histogram":
+        vmin, vmax = _dask_robust_limits(arr.data, vmin, vmax, per_band)
+
+    if not parallel:
+        return _task(_gif, isolate, measure=measure)(
+            arr,
+            bytes=bytes,
+            to=to,
+            key=key,
+            fps=fps,
+            robust=robust,
+            vmin=vmin,
+            vmax=vmax,
+            per_band=per_band,
+            cmap=cmap,
+            date_format=date_format,
+            date_position=date_position,
+            date_color=date_color,
+            date_bg=date_bg,
+            date_size=date_size,
+            palette=palette,
+            delta=delta,
+            format=format,
+            format_options=format_options,
+            encoder=encoder,
+            nodata_color=nodata_color,
+            tile_size=tile_size,
+            scratch_dir=scratch_dir,
+        )
+
+    if needs_percentiles and robust_method == "exact":
+        # Exact percentiles need all the data in one place
+        vmin, vmax = _task(_stretch_limits, isolate, nout=2, measure=measure)(
+            arr.data, vmin, vmax, robust, "exact", per_band
+        )
+    elif arr.dtype.kind != "b" and not robust and vmin is None and vmax is None:
+        # These are lazy reductions in dask
+        axis = (0, 2, 3) if per_band and arr.shape[1] > 1 else None
+        vmin, vmax = np.nanmin(arr.data, axis=axis), np.nanmax(arr.data, axis=axis)
+
+    labels = None
+    font_size = date_size
+    if date_format:
+        labels = arr[arr.dims[0]].dt.strftime(date_format).data
+        # Pick the font size once up front, so it's consistent across chunks
+        font_size = getattr(
+            _get_font(date_size, labels, arr.shape[-1]), "size", date_size
+        )
+
+    if tile_size is None:
+        # Each task needs whole frames
+        data = arr.data.rechunk({1: -1, 2: -1, 3: -1})
+    else:
+        data = _tile_chunks(arr.data, tile_size)
+    # So long animations are compressed in parallel, even if they're all one chunk.
+    # Tiles are gathered to encode a frame at a time, so each task only holds one frame.
+    data = _split_frames(data, _TASK_FRAMES if tile_size is None else 1)
+    offsets = np.cumsum((0,) + data.chunks[0])
+
+    if format != "gif":
+        # Other formats can't be encoded in pieces, so chunks are only rendered here
+        rgba_chunk = _task(_rgba_chunk, isolate, measure=measure)
+        rgba_chunks = [
+            rgba_chunk(
+                block,
+                labels[start:stop] if labels is not None else None,
+                vmin,
+                vmax,
+                robust,
+                cmap,
+                font_size,
+                date_position,
+                date_color,
+                date_bg,
+                scratch_dir,
             )
-        else:
-            return IPython.display.Image(data=out.getvalue())
+            for block, start, stop in zip(
+                data.to_delayed(optimize_graph=False).ravel(),
+                offsets[:-1],
+                offsets[1:],
+            )
+        ]
+        return _task(_assemble_animation, isolate, measure=measure)(
+            rgba_chunks,
+            format,
+            fps,
+            format_options,
+            nodata_color,
+            bytes=bytes,
+            to=to,
+            key=key,
+            frames=len(arr),
+        )
 
+    gif_palette = None
+    if cmap is not None:
+        gif_palette = _colormap_palette(cmap, bool(date_format), date_color, date_bg)
+    elif palette == "global":
+        gif_palette = _task(_sampled_palette, isolate, measure=measure)(
+            _palette_samples(arr.data, tile_size),
+            vmin,
+            vmax,
+            robust,
+            bool(date_format),
+            date_color,
+            date_bg,
+        )
+    # The colormap is one palette for every frame, so it's only stored once
+    global_palette = palette == "global" or cmap is not None
+    lzw = encoder if callable(encoder) else None
 
-def _gif(arr: xr.DataArray, bytes=False, **kwargs):
-    to = io.BytesIO() if bytes else None
-    out = gif(arr, to=to, **kwargs)
-    return to.getvalue() if bytes else out
+    if tile_size is not None:
+        # Only the palette indices of each tile, one byte per pixel, are gathered to encode
+        index_tile = _task(_index_tile, isolate, measure=measure)
+        gif_tiles_chunk = _task(_gif_tiles_chunk, isolate, measure=measure)
+        blocks = data.to_delayed(optimize_graph=False)
+        tile_chunks = [
+            gif_tiles_chunk(
+                [
+                    [
+                        index_tile(block, vmin, vmax, robust, cmap, gif_palette)
+                        for block in row
+                    ]
+                    for row in time_blocks[0]
+                ],
+                labels[start:stop] if labels is not None else None,
+                font_size,
+                date_position,
+                gif_palette,
+                _gif_duration(fps),
+                not global_palette,
+                scratch_dir,
+                lzw,
+            )
+            for time_blocks, start, stop in zip(blocks, offsets[:-1], offsets[1:])
+        ]
+        return _task(_assemble_gif, isolate, measure=measure)(
+            (arr.shape[-1], arr.shape[-2]),
+            tile_chunks,
+            gif_palette if global_palette else None,
+            bytes=bytes,
+            to=to,
+            key=key,
+            frames=len(arr),
+            gifsicle=encoder == "gifsicle",
+            options=format_options,
+        )
 
+    # Delta frames depend on their neighbors, so each chunk also gets the frames next to it,
+    # and what's on screen at the end of each chunk is passed along to the next
+    context = delta and gif_palette is not None
 
-_dgif = dask.delayed(_gif, pure=True)
+    gif_chunk = _task(_gif_chunk, isolate, measure=measure)
+    resolve_delta = _task(_resolve_delta, isolate, nout=2, measure=measure)
+    rect = None
+    chunks = []
+    for block, start, stop in zip(
+        data.to_delayed(optimize_graph=False).ravel(), offsets[:-1], offsets[1:]
+    ):
+        prev_frame = next_frame = None
+        if context and start > 0:
+            prev_frame = data[start - 1][None].to_delayed(optimize_graph=False).item()
+            start -= 1
+        if context and stop < len(arr):
+            next_frame = data[stop][None].to_delayed(optimize_graph=False).item()
+            stop += 1
+        chunk = gif_chunk(
+            block,
+            labels[start:stop] if labels is not None else None,
+            vmin,
+            vmax,
+            robust,
+            cmap,
+            gif_palette,
+            font_size,
+            date_position,
+            date_color,
+            date_bg,
+            _gif_duration(fps),
+            not global_palette,
+            delta,
+            prev_frame,
+            next_frame,
+            lzw,
+        )
+        if context:
+            chunk, rect = resolve_delta(
+                chunk, rect, gif_palette, _gif_duration(fps), not global_palette, lzw
+            )
+        chunks.append(chunk)
+    return _task(_assemble_gif, isolate, measure=measure)(
+        (arr.shape[-1], arr.shape[-2]),
+        chunks,
+        gif_palette if global_palette else None,
+        bytes=bytes,
+        to=to,
+        key=key,
+        frames=len(arr),
+        gifsicle=encoder == "gifsicle",
+        options=format_options,
+    )
 
 
 def dgif(
     arr: xr.DataArray,
     *,
     bytes=False,
+    to: str | os.PathLike | MutableMapping[Any, bytes] | None = None,
+    parallel: bool = True,
     fps: int = 16,
     robust: bool = True,
+    robust_method: Literal["histogram", "exact"] = "histogram",
     vmin: float | None = None,
     vmax: float | None = None,
+    per_band: bool = False,
     cmap: str | matplotlib.colors.Colormap | None = None,
     date_format: str | None = "%Y-%m-%d",
     date_position: Literal["ul", "ur", "ll", "lr"] = "ul",
     date_color: tuple[int, int, int] = (255, 255, 255),
     date_bg: tuple[int, int, int] | None = (0, 0, 0),
     date_size: int | float = 0.15,
+    palette: Literal["global", "frame"] = "frame",
+    delta: bool = False,
+    format: Literal["gif", "webp", "png", "mp4"] = "gif",
+    format_options: dict[str, Any] | None = None,
+    encoder: Literal["pillow", "gifsicle"] | Callable[[np.ndarray], bytes] = "pillow",
+    nodata_color: tuple[int, int, int] = (0, 0, 0),
+    tile_size: int | None = None,
+    scratch_dir: str | os.PathLike | None = None,
+    max_size: int | None = None,
+    scale: int = 1,
+    max_frames: int | None = None,
+    resample: str | None = None,
+    max_duration: float | None = None,
+    stats: bool = False,
 ) -> Delayed:
     """
     Turn a dask-backed `~xarray.DataArray` timestack into a GIF, as a `~dask.delayed.Delayed` object.
@@ -389,17 +3783,55 @@ def dgif(
 
         Note that you can also access the raw bytes from an `IPython.display.Image`
         with the ``.data`` attribute.
+    to:
+        Where to write the GIF, straight from the worker that assembles it, so the GIF itself
+        never has to be sent back to you. Default: None (return it instead).
+
+        Either a path, or a mutable mapping (like an `fsspec.FSMap`) to store the GIF in,
+        under the name of ``arr``. Paths can be local (missing directories are created),
+        or URLs like ``"s3://bucket/animation.gif"`` if `fsspec` is installed. Paths are
+        templates: ``{name}`` is replaced with the name of ``arr``, and ``{start}`` and
+        ``{end}`` with the first and last time coordinates (which take format specs, like
+        ``"{name}-{start:%Y%m%d}.gif"``).
+
+        Then ``bytes`` is ignored, and the result is instead a summary of the GIF: a dict
+        with its ``"path"`` (or key in the mapping), ``"size"`` in bytes, number of
+        ``"frames"``, and the ``"seconds"`` the final task took to assemble and write it
+        (with ``parallel=False``, including rendering it).
+    parallel:
+        If True (default), frames are rendered in parallel: each chunk of ``arr`` along ``time``
+        (split into pieces of at most 16 frames, if it's longer) is rescaled, colormapped,
+        labeled, and compressed in its own task, and only the compressed frames are sent to
+        one final task that assembles them into the GIF, in order.
+
+        If False, the whole array is gathered onto one worker, which renders the entire GIF
+        (just like calling `gif` there).
     fps:
         Frames per second
     robust:
         Calculate ``vmin`` and ``vmax`` from the 2nd and 98th percentiles of the data
         (default True)
+    robust_method:
+        How to calculate the percentiles when ``robust=True``.
+
+        ``"histogram"`` (default) estimates them from a histogram of the data, which is computed
+        chunk-by-chunk on the workers, so only a few small arrays ever need to be combined.
+        The estimates are within 1/65536th of the data's range of the exact values. For 8- and
+        16-bit integer data, the histogram counts every possible value, so they're exact.
+
+        ``"exact"`` gathers the whole array onto one worker to calculate the exact percentiles,
+        giving output identical to `gif`.
     vmin:
         Value in the data to map to 0 (black). If None (default), it's calculated
         from the minimum value of the data or the 2nd percentile, depending on ``robust``.
     vmax:
         Value in the data to map to 255 (white). If None (default), it's calculated
         from the maximum value of the data or the 98nd percentile, depending on ``robust``.
+    per_band:
+        Stretch each band of RGB data separately (default False). Missing ``vmin`` and ``vmax``
+        are calculated for each band on its own, like a per-band contrast stretch, which can
+        bring out color in hazy or unbalanced imagery. Given ``vmin`` or ``vmax`` apply to
+        every band.
     cmap:
         Colormap to use for single-band data. Can be a
         :doc:`matplotlib colormap name <gallery/color/colormap_reference>` as a string,
@@ -434,12 +3866,129 @@ def dgif(
         Note that if Pillow does not have FreeType support, the font size
         cannot be adjusted, and the text will be whatever size Pillow's
         default basic font is (usually rather small).
+    palette:
+        How to pick the (at most 256) colors in the GIF. Single-band data always uses one palette
+        made from the colormap, whichever you pick; this only matters for RGB data.
+
+        ``"frame"`` (default) picks a separate palette for every frame, which matches each frame's
+        colors as closely as possible.
+
+        ``"global"`` uses one palette for the whole animation, picked from a sample of frames, and
+        stored once in the GIF. This is much faster, keeps colors from flickering between frames,
+        and is needed for ``delta`` and ``tile_size``. But 256 colors shared by every frame can't
+        match any one of them as well, so colors are noticeably less accurate: typically about
+        20% more error on average, and much more in the worst-matched pixels.
+    delta:
+        Only write the part of each frame that changed since the previous one (default False).
+
+        Each frame is cropped to the box around the pixels that changed, and unchanged pixels in
+        that box are made transparent, so they compress to almost nothing. For timestacks with
+        large static areas (nodata, water, masked clouds), this makes the GIF much smaller and
+        faster to write. It only applies when frames share a palette; RGB data with
+        ``palette="frame"`` (the default) is always written as full frames.
+    format:
+        Animation format to write: ``"gif"`` (default), ``"webp"`` for animated WebP,
+        ``"png"`` for APNG (animated PNG), or ``"mp4"`` for H.264 video.
+        ``palette`` and ``delta`` only apply to GIFs.
+
+        WebP and APNG aren't limited to 256 colors, and are often several times smaller
+        than GIFs. They're encoded by Pillow, which needs all the rendered frames in memory
+        at once (or on disk, with ``scratch_dir``).
+
+        MP4 is best for very long timestacks, which would make huge GIFs. Frames are encoded
+        one at a time, with `PyAV <https://pyav.org>`__ if it's installed, otherwise with the
+        ``ffmpeg`` program. Video has no transparency, so missing pixels are ``nodata_color``.
+    format_options:
+        Extra options for the encoder, when ``format`` isn't ``"gif"``. For WebP, like
+        ``{"lossless": True}`` or ``{"quality": 90, "method": 6, "minimize_size": True}``;
+        for APNG, like ``{"optimize": True}``. See the `Pillow docs
+        <https://pillow.readthedocs.io/en/stable/handbook/image-file-formats.html>`__
+        for all the options. For MP4, these are
+        `libx264 options <https://trac.ffmpeg.org/wiki/Encode/H.264>`__,
+        like ``{"crf": 28, "preset": "fast"}``. For GIFs with ``encoder="gifsicle"``, these are
+        `gifsicle options <https://www.lcdf.org/gifsicle/man.html>`__, like
+        ``{"optimize": 3, "lossy": 20}`` (default ``{"optimize": 3}``).
+    encoder:
+        How to compress GIF frames. ``"pillow"`` (default) LZW-compresses each frame with Pillow,
+        in the task that renders it, so chunks of frames are compressed in parallel.
+
+        ``"gifsicle"`` also runs the whole GIF through the `gifsicle
+        <https://www.lcdf.org/gifsicle>`__ program in the final task, for more control over how
+        hard it tries to shrink it, with ``format_options``. It must be installed where that
+        task runs.
+
+        Or, a function to LZW-compress each frame instead of Pillow, like a faster native
+        implementation. It's given the frame's palette indices, as a (``y``, ``x``) uint8
+        array, and must return the LZW code stream (with a minimum code size of 8) as bytes.
+        It must be picklable to run on a distributed cluster.
+    nodata_color:
+        Color for missing (NaN) pixels in MP4 videos, as an RGB 3-tuple.
+        Default: ``(0, 0, 0)`` (black).
+    tile_size:
+        Render each frame in tiles, for rasters too big to render all at once. Default: None
+        (whole frames). The tiles are the array's spatial chunks, as they are (only chunks more
+        than ``tile_size`` pixels across are split up), so there's no rechunking. Each tile is
+        rescaled, colormapped, and matched to the palette in its own task, one frame at a time.
+        Then only those palette indices, one byte per pixel, are gathered to piece together each
+        frame in a temporary file, and label and compress it. So besides computing ``arr``'s own
+        chunks, each task's memory use depends on the size of the tiles, or of one frame of
+        palette indices (``height * width`` bytes) for the tasks that encode, not on the number
+        of frames or the time chunks.
+
+        Robust ``vmin`` and ``vmax`` are always estimated with ``robust_method="histogram"``,
+        and the palette for RGB data is picked from a thinned-out sample of frames. Only works
+        for GIFs with one palette (``palette="global"``, or single-band data), without ``delta``.
+    scratch_dir:
+        Directory on the workers to keep rendered frames in while they wait to be encoded, in
+        memory-mapped temporary files instead of memory, so the OS can page them out. Default:
+        None (in memory). For WebP, APNG, and MP4, each task's chunk of RGBA frames is kept here
+        until they're all encoded together. With ``tile_size``, each frame of palette indices
+        is pieced together here (otherwise, in the default temporary directory).
+    max_size:
+        Largest width or height of the GIF, in pixels. If ``arr`` is bigger, it's shrunk by the
+        smallest whole-number factor that fits, just like ``scale``. Default: None (no limit).
+    scale:
+        Shrink ``arr`` by this whole-number factor in both ``x`` and ``y`` (default 1), by averaging
+        each ``scale`` by ``scale`` block of pixels. NaNs are ignored in the average, so a pixel
+        is only missing if its whole block was.
+
+        This happens before anything else (including calculating ``vmin`` and ``vmax``), so it's
+        a cheap way to make small GIFs of huge arrays. The data is shrunk chunk-by-chunk
+        on the workers, so only the smaller array ever has to move.
+    max_frames:
+        Most frames to animate. If there are more, this many are picked, evenly spaced in time.
+        Default: None (no limit).
+    resample:
+        Keep only the first frame in each period of this `pandas frequency
+        <https://pandas.pydata.org/docs/user_guide/timeseries.html#offset-aliases>`__, like
+        ``"MS"`` for one frame per month. The time coordinates must be datetimes or timedeltas.
+        Default: None (keep every frame).
+    max_duration:
+        Longest the animation should run, in seconds. Like ``max_frames``, with the number
+        of frames that fit in this time at ``fps``. Default: None (no limit).
+
+        Frames are selected (after ``resample``, then ``max_frames`` or ``max_duration``)
+        from the time coordinate alone, before any data is read, so chunks that
+        only contain dropped frames are never computed.
+    stats:
+        Also return statistics about rendering the animation (default False), to find out where
+        the time went. They're the same as the dict passed to ``stats`` in `gif`, but combined from
+        every task that rendered part of the animation: seconds are summed over all the tasks
+        (``"tasks"`` is how many), and ``"memory"`` is the peak of any one task. Memory can
+        only be told apart for tasks that ran alone, so with a threaded scheduler (or
+        distributed workers with more than one thread), it's only from the tasks that happened
+        not to run at the same time as another, or None if none did. For the real peak of
+        each task, compute with one thread, like ``scheduler="single-threaded"``. Time spent
+        in dask's own array operations, like computing the data, or ``robust_method="histogram"``
+        limits, isn't counted.
 
     Returns
     -------
     dask.Delayed
-        Delayed object which, when computed, resolves to either an `IPython.display.Image`,
-        or `bytes`.
+        Delayed object which, when computed, resolves to either an `IPython.display.Image`
+        (or `IPython.display.Video` for ``format="mp4"``), `bytes`, or (with ``to``) a dict
+        summarizing the GIF that was written. With ``stats=True``, it resolves to a tuple
+        of that, and the dict of statistics.
 
     Examples
     --------
@@ -457,17 +4006,45 @@ def dgif(
     >>> bucket = dask.delayed(fsspec.get_mapper('s3://my-sweet-gifs/latest'))
     >>> gif = geogif.dgif(arr, bytes=True)
     >>> bucket.setitems({"neat.gif": gif}).compute()
-    """
 
-    if not isinstance(arr.data, da.Array):
-        raise TypeError(
-            "DataArray does not contain delayed (Dask) data; use `gif` instead to render a GIF locally."
-        )
+    >>> # Or have the worker write it to the bucket itself:
+    >>> geogif.dgif(arr, to="s3://my-sweet-gifs/latest/{start:%Y}-{end:%Y}.gif").compute()
+    {'path': 's3://my-sweet-gifs/latest/2018-2021.gif', 'size': 1843962, 'frames': 48, 'seconds': 0.41}
+    """
 
-    # Do some quick sanity checks to save you a lot of compute
-    _validate_arr_for_gif(arr, cmap, date_format, date_position, date_size)
+    arr, cmap = _prepare_dgif(
+        arr,
+        cmap,
+        fps,
+        robust_method,
+        date_format,
+        date_position,
+        date_size,
+        palette,
+        format,
+        max_size,
+        scale,
+        max_frames,
+        resample,
+        max_duration,
+        delta,
+        tile_size,
+        encoder,
+    )
 
-    if not bytes:
+    key = None
+    if isinstance(to, (str, os.PathLike)):
+        to = _output_path(to, arr)
+    elif to is not None:
+        if arr.name is None:
+            raise ValueError(
+                "To store the GIF in a mapping, the DataArray must have a name to use as its key. "
+                "Use `arr.rename(...)` to give it one."
+            )
+        key = arr.name
+        # Otherwise dask would unpack a dict into a copy, and write to that
+        to = dask.delayed(to, traverse=False)
+    elif not bytes:
         try:
             import IPython.display  # noqa: F401
         except ImportError:
@@ -486,17 +4063,282 @@ def dgif(
     # TODO condition this on a LooseVersion check for this once #7587 is closed
     (arr,) = dask.optimize(arr)
 
-    return _dgif(
+    result = _dgif_graph(
         arr,
+        cmap,
         bytes=bytes,
+        parallel=parallel,
         fps=fps,
         robust=robust,
+        robust_method=robust_method,
         vmin=vmin,
         vmax=vmax,
-        cmap=cmap,
+        per_band=per_band,
         date_format=date_format,
         date_position=date_position,
         date_color=date_color,
         date_bg=date_bg,
         date_size=date_size,
+        palette=palette,
+        delta=delta,
+        format=format,
+        format_options=format_options,
+        encoder=encoder,
+        nodata_color=nodata_color,
+        tile_size=tile_size,
+        scratch_dir=scratch_dir,
+        to=to,
+        key=key,
+        measure=stats,
     )
+    return _task(_result_with_stats)(result) if stats else result
+
+
+def _shared_limits(
+    datas: Sequence[da.Array],
+    vmin: float | None,
+    vmax: float | None,
+    robust: bool,
+    robust_method: Literal["histogram", "exact"],
+    per_band: bool = False,
+) -> tuple[Any, Any]:
+    """
+    Lazily figure out one ``vmin`` and ``vmax`` for all of ``datas`` together.
+
+    With ``per_band``, ``datas`` must all have the same number of bands, and each band gets
+    its own limits, as delayed tuples.
+    """
+    datas = [data for data in datas if data.dtype.kind != "b"]
+    if not datas or (vmin is not None and vmax is not None):
+        return vmin, vmax
+    if per_band and datas[0].shape[1] > 1:
+        limits = [
+            _shared_limits(
+                [data[:, slice(band, band + 1)] for data in datas],
+                _band_limit(vmin, band),
+                _band_limit(vmax, band),
+                robust,
+                robust_method,
+            )
+            for band in range(datas[0].shape[1])
+        ]
+        return _dtuple([lo for lo, _ in limits]), _dtuple([hi for _, hi in limits])
+    if robust and robust_method == "histogram":
+        return _dask_robust_limits(datas, vmin, vmax)
+    if robust:
+        return _task(_resolve_limits, nout=2)(
+            da.concatenate([data.ravel() for data in datas]), vmin, vmax, robust
+        )
+    if vmin is None and vmax is None:
+        return (
+            da.nanmin(da.stack([da.nanmin(data) for data in datas])),
+            da.nanmax(da.stack([da.nanmax(data) for data in datas])),
+        )
+    # `_resolve_limits` fills in the other one with a constant, not from the data
+    return vmin, vmax
+
+
+def _batch_results(keys: list, results: list) -> dict:
+    "Pair up `dgif_many`'s keys with their results, unwrapping failures into their exceptions"
+    return {
+        key: result.error if isinstance(result, _Failed) else result
+        for key, result in zip(keys, results)
+    }
+
+
+def dgif_many(
+    arrays: Mapping[Hashable, xr.DataArray],
+    *,
+    to: str | Path | MutableMapping[Any, bytes] | None = None,
+    shared_limits: bool = False,
+    parallel: bool = True,
+    fps: int = 16,
+    robust: bool = True,
+    robust_method: Literal["histogram", "exact"] = "histogram",
+    vmin: float | None = None,
+    vmax: float | None = None,
+    per_band: bool = False,
+    cmap: str | matplotlib.colors.Colormap | None = None,
+    date_format: str | None = "%Y-%m-%d",
+    date_position: Literal["ul", "ur", "ll", "lr"] = "ul",
+    date_color: tuple[int, int, int] = (255, 255, 255),
+    date_bg: tuple[int, int, int] | None = (0, 0, 0),
+    date_size: int | float = 0.15,
+    palette: Literal["global", "frame"] = "frame",
+    delta: bool = False,
+    format: Literal["gif", "webp", "png", "mp4"] = "gif",
+    format_options: dict[str, Any] | None = None,
+    encoder: Literal["pillow", "gifsicle"] | Callable[[np.ndarray], bytes] = "pillow",
+    nodata_color: tuple[int, int, int] = (0, 0, 0),
+    tile_size: int | None = None,
+    scratch_dir: str | os.PathLike | None = None,
+    max_size: int | None = None,
+    scale: int = 1,
+    max_frames: int | None = None,
+    resample: str | None = None,
+    max_duration: float | None = None,
+    stats: bool = False,
+) -> Delayed:
+    """
+    Turn many dask-backed `~xarray.DataArray` timestacks into GIFs, as one `~dask.delayed.Delayed` object.
+
+    Like calling `dgif` on each array, but everything goes into one graph: the arrays are
+    optimized together, the colormap is looked up once, and (with ``shared_limits=True``)
+    one ``vmin`` and ``vmax`` is calculated for all of them, so their colors are comparable.
+
+    A problem with one array doesn't stop the others. If an array is invalid, computing it
+    raises an error (like failing to read data), or rendering its GIF does, the exception is
+    returned as its result instead. With ``shared_limits``, an error in any of the arrays
+    that share limits is returned for all of them, since none of their limits can be calculated.
+
+    Parameters
+    ----------
+    arrays:
+        Mapping of names to time-stacked arrays to animate, each of which could be passed
+        to `dgif`.
+    to:
+        Where to store the GIFs. If a path to a directory, each GIF is written to
+        ``<to>/<name>.<format>``, like ``<to>/<name>.gif`` (the extension is only added if
+        the name doesn't already end with it).
+        If a mutable mapping (like an `fsspec.FSMap`), each GIF is stored under its name.
+        Either way, each GIF is written by the worker that assembles it, so the GIFs
+        never have to be sent back to you (see ``to`` in `dgif`).
+
+        If None (default), the GIFs are returned as bytes.
+    shared_limits:
+        Calculate one ``vmin`` and ``vmax`` from all the arrays together (following
+        ``robust`` and ``robust_method``), instead of separately for each one. Default: False.
+        With ``per_band``, RGB arrays share limits for each band, separately from single-band
+        arrays.
+
+    All other arguments are the same as for `dgif`, and apply to every array.
+
+    Returns
+    -------
+    dask.Delayed
+        Delayed object which, when computed, resolves to a dict with the same keys as
+        ``arrays``. Each value is the GIF as `bytes` (if ``to`` is None), a dict summarizing
+        it once it's been stored in ``to``, or the exception that prevented making it.
+        With ``stats=True``, each GIF that was made is a tuple of that, and its statistics.
+
+    Examples
+    --------
+    >>> # Render a GIF for every tile, with the same color scale, and write them to a bucket:
+    >>> import fsspec
+    >>> results = geogif.dgif_many(
+    ...     {f"tile-{i}": tile for i, tile in enumerate(tiles)},
+    ...     to=fsspec.get_mapper("s3://my-sweet-gifs/tiles"),
+    ...     shared_limits=True,
+    ... ).compute()
+    >>> failed = {name: e for name, e in results.items() if isinstance(e, Exception)}
+    """
+    if isinstance(cmap, str):
+        # Look it up once, so every GIF shares its lookup table
+        cmap = matplotlib.cm.get_cmap(cmap)
+    default_cmap = None
+
+    keys = list(arrays)
+    results: list[Any] = [None] * len(keys)
+    prepared = {}
+    for i, key in enumerate(keys):
+        try:
+            arr, arr_cmap = _prepare_dgif(
+                arrays[key],
+                cmap,
+                fps,
+                robust_method,
+                date_format,
+                date_position,
+                date_size,
+                palette,
+                format,
+                max_size,
+                scale,
+                max_frames,
+                resample,
+                max_duration,
+                delta,
+                tile_size,
+                encoder,
+            )
+        except Exception as e:
+            results[i] = e
+            continue
+        if cmap is None and arr_cmap is not None:
+            default_cmap = arr_cmap = default_cmap or arr_cmap
+        prepared[i] = (arr, arr_cmap)
+
+    # Array optimizations won't be applied once we convert to delayed, so do it now (see `dgif`)
+    optimized = dask.optimize(*(arr for arr, _ in prepared.values()))
+    prepared = {
+        i: (arr, arr_cmap)
+        for (i, (_, arr_cmap)), arr in zip(prepared.items(), optimized)
+    }
+
+    limits = {}
+    if shared_limits:
+        # With ``per_band``, RGB arrays share limits band-by-band, apart from single-band ones
+        groups: dict[int, list[int]] = {}
+        for i, (arr, _) in prepared.items():
+            groups.setdefault(arr.shape[1] if per_band else 1, []).append(i)
+        for group in groups.values():
+            group_limits = _shared_limits(
+                [prepared[i][0].data for i in group],
+                vmin,
+                vmax,
+                robust,
+                robust_method,
+                per_band,
+            )
+            limits.update(dict.fromkeys(group, group_limits))
+
+    directory = None
+    if isinstance(to, (str, os.PathLike)):
+        directory = os.fspath(to)
+    elif to is not None:
+        # Otherwise dask would unpack a dict into a copy, and write to that
+        to = dask.delayed(to, traverse=False)
+
+    for i, (arr, arr_cmap) in prepared.items():
+        arr_vmin, arr_vmax = limits.get(i, (vmin, vmax))
+        if directory is not None:
+            name = str(keys[i])
+            ext = f".{format}"
+            to = os.path.join(directory, name if name.endswith(ext) else name + ext)
+        try:
+            result = _dgif_graph(
+                arr,
+                arr_cmap,
+                bytes=True,
+                parallel=parallel,
+                fps=fps,
+                robust=robust,
+                robust_method=robust_method,
+                vmin=arr_vmin,
+                vmax=arr_vmax,
+                per_band=per_band,
+                date_format=date_format,
+                date_position=date_position,
+                date_color=date_color,
+                date_bg=date_bg,
+                date_size=date_size,
+                palette=palette,
+                delta=delta,
+                format=format,
+                format_options=format_options,
+                encoder=encoder,
+                nodata_color=nodata_color,
+                tile_size=tile_size,
+                scratch_dir=scratch_dir,
+                to=to,
+                key=keys[i],
+                isolate=True,
+                measure=stats,
+            )
+        except Exception as e:
+            results[i] = e
+            continue
+        result = _isolate_graph(result)
+        results[i] = _task(_result_with_stats, True)(result) if stats else result
+
+    return _task(_batch_results)(keys, results)
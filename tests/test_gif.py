@@ -1,25 +1,48 @@
 from __future__ import annotations
 
+import importlib
+import io
+import json
+import shutil
+import subprocess
+import sys
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 from io import IOBase
 from pathlib import Path
 from typing import BinaryIO
 from unittest import mock
 
 import dask
+import dask.array as da
 import hypothesis.strategies as st
 import IPython.display
 import matplotlib.cm
 import matplotlib.colors
+import numpy as np
+import pandas as pd
 import pytest
 import xarray as xr
 from hypothesis import given, note, settings
+from PIL import Image, ImageDraw, ImageFont
 from typing_extensions import Literal
 
-from geogif.gif import _get_font
-from geogif import dgif, gif
+from geogif.gif import (
+    _LABEL_SPRITES,
+    _dask_robust_limits,
+    _draw_label,
+    _get_font,
+    _label_box,
+    _render_frame,
+)
+from geogif import dgif, dgif_many, encode, gif
 
 from .strategies import colormaps, dataarrays, date_formats, rgb
-from .util import fails, ignore, xerr
+from .util import fails, gif_blocks, ignore, lzw, xerr
+
+# `geogif.gif` itself is shadowed by the `gif` function
+gif_module = importlib.import_module("geogif.gif")
 
 
 def test_get_font_empty():
@@ -27,6 +50,1145 @@ def test_get_font_empty():
     assert fnt.size > 0
 
 
+@pytest.mark.parametrize("date_size", [0.05, 0.15, 0.5, 0.9])
+@pytest.mark.parametrize("image_width", [10, 300, 2000])
+def test_get_font_fits(date_size, image_width):
+    labels = ["2021-01-01", "2021-1-1"]
+    fnt = _get_font(date_size, labels, image_width)
+
+    def text_width(size):
+        bbox = ImageFont.load_default(size).getbbox("2021-01-01")
+        return bbox[2] - bbox[0]
+
+    # the smallest size (starting from 5) that's wider than the target
+    target = date_size * image_width
+    assert fnt.size == 5 or text_width(fnt.size) > target >= text_width(fnt.size - 1)
+    # and it's only figured out once
+    assert _get_font(date_size, labels, image_width) is fnt
+
+
+def test_gif_streams_frames():
+    data = np.random.default_rng(0).random((12, 3, 20, 30))
+    data[3, :, :5, :5] = np.nan
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=12)},
+    )
+
+    out = io.BytesIO()
+    gif(arr, to=out, fps=10)
+    img = Image.open(io.BytesIO(out.getvalue()))
+    assert img.n_frames == 12
+    assert img.size == (30, 20)
+
+    frames = gif_blocks(out.getvalue())
+    assert len(frames) == 12
+    for i, frame in enumerate(frames):
+        assert frame["disposal"] == 2
+        assert frame["duration"] == 10
+        assert frame["bbox"] == (0, 0, 30, 20)
+        # only the frame with NaNs needs a transparent color
+        assert (frame["transparency"] is not None) == (i == 3)
+
+
+def test_dgif_parallel_matches_gif():
+    data = np.random.default_rng(0).random((10, 3, 20, 30))
+    data[2, 0, :4, :4] = np.nan
+    arr = xr.DataArray(
+        da.from_array(data, chunks=(3, 1, 10, 30)),
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=10)},
+    )
+
+    delayed = dgif(arr, bytes=True, parallel=True, robust_method="exact")
+    # one rendering task per time-chunk
+    assert sum(str(k).startswith("_gif_chunk-") for k in delayed.dask) == 4
+
+    expected = io.BytesIO()
+    gif(arr.compute(), to=expected)
+    assert delayed.compute() == expected.getvalue()
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_dgif_splits_long_chunks(delta: bool):
+    data = np.random.default_rng(0).random((50, 20, 30))
+    data[20:30] = data[19]
+    arr = xr.DataArray(
+        da.from_array(data, chunks=(40, 10, 30)),
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=50)},
+    )
+    delayed = dgif(arr, bytes=True, delta=delta, robust_method="exact")
+    # 40 frames in 3 pieces, then the last 10
+    assert sum(str(k).startswith("_gif_chunk-") for k in delayed.dask) == 4
+    assert delayed.compute() == gif(arr.compute(), delta=delta).data
+
+    chunks = gif_module._split_frames(arr.data, 16).chunks[0]
+    assert chunks == (14, 13, 13, 10)
+
+
+@pytest.mark.parametrize("chunks", [1, 2, 3, 4, 5])
+def test_dgif_delta_chunk_boundaries(chunks: int):
+    # A static scene where a small patch changes, then goes missing, then comes back.
+    # Frames before a patch goes missing are cleared (disposal 2) over just what changed,
+    # so each chunk has to start from exactly what's on screen at the end of the one before.
+    data = np.tile(np.random.default_rng(0).random((1, 40, 50)), (12, 1, 1))
+    data[3:, 10:20] += 0.5
+    data[4:6, 10:20] = np.nan
+    data[7, 10:20] = np.nan
+    data[8:11, 15:25] = np.nan
+    data[8, 0, 0] = np.nan
+    data[9, 30:] = np.nan
+    arr = xr.DataArray(
+        da.from_array(data, chunks=(chunks, 40, 50)),
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=12)},
+    )
+    expected = gif(arr.compute(), delta=True).data
+    assert any(frame["disposal"] == 2 for frame in gif_blocks(expected))
+    result = dgif(arr, bytes=True, delta=True, robust_method="exact").compute()
+    assert gif_blocks(result) == gif_blocks(expected)
+    assert result == expected
+
+
+@pytest.mark.parametrize("dtype", ["u1", "i1", "<u2", ">u2", ">i2"])
+def test_int_percentile(dtype):
+    info = np.iinfo(dtype)
+    rng = np.random.default_rng(0)
+    for size in [1, 2, 7, 1000]:
+        data = rng.integers(info.min, info.max, (size, 3), endpoint=True).astype(dtype)
+        for q in [0, 2, 50, 98, 100]:
+            assert gif_module._int_percentile(data, q) == np.nanpercentile(data, q)
+
+
+@pytest.mark.parametrize("dtype", ["float64", "uint16"])
+def test_dask_robust_limits(dtype):
+    data = np.random.default_rng(0).normal(1000, 200, size=(20, 3, 50, 50))
+    data = data.astype(dtype)
+    if dtype == "float64":
+        data[0, 0, :5] = np.nan
+        data[1, 1, :2] = np.inf
+    darr = da.from_array(data, chunks=(5, 1, 25, 25))
+
+    vmin, vmax = dask.compute(*_dask_robust_limits(darr, None, None))
+    finite = data[np.isfinite(data)]
+    tolerance = (finite.max() - finite.min()) / 2**16
+    assert vmin == pytest.approx(np.percentile(finite, 2), abs=tolerance)
+    assert vmax == pytest.approx(np.percentile(finite, 98), abs=tolerance)
+
+    if dtype == "uint16":
+        # every value is counted, so these are exact
+        assert (vmin, vmax) == tuple(np.nanpercentile(data, [2, 98]))
+
+    # given limits are left alone
+    assert dask.compute(*_dask_robust_limits(darr, -1, None))[0] == -1
+
+    vmins, vmaxes = dask.compute(*_dask_robust_limits(darr, None, None, per_band=True))
+    assert len(vmins) == len(vmaxes) == 3
+    for band, (lo, hi) in enumerate(zip(vmins, vmaxes)):
+        finite = data[:, band][np.isfinite(data[:, band])]
+        # fewer values per band, so they're sparser in the tails: allow a bit of rank error too
+        lo_range = np.percentile(finite, [1.99, 2.01])
+        hi_range = np.percentile(finite, [97.99, 98.01])
+        assert lo_range[0] - tolerance <= lo <= lo_range[1] + tolerance
+        assert hi_range[0] - tolerance <= hi <= hi_range[1] + tolerance
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64", "int16", ">u2", "int32"])
+def test_streaming_limits(dtype):
+    data = np.random.default_rng(0).normal(1000, 200, size=(20, 1, 30, 30))
+    data = data.astype(dtype)
+    if data.dtype.kind == "f":
+        data[0, 0, :5] = np.nan
+        data[1, 0, :2] = -np.inf
+
+    vmin, vmax = gif_module._streaming_limits(data, None, None)
+    finite = data[np.isfinite(data)]
+    expected = np.percentile(finite, [2, 98])
+    if gif_module._has_int_lut(data):
+        assert (vmin, vmax) == tuple(expected)
+    else:
+        # within a bin, or a little rank error where the values are sparse in the tails
+        tolerance = (finite.max() - finite.min()) / 2**16
+        lo_range = np.percentile(finite, [1.99, 2.01])
+        hi_range = np.percentile(finite, [97.99, 98.01])
+        assert lo_range[0] - tolerance <= vmin <= lo_range[1] + tolerance
+        assert hi_range[0] - tolerance <= vmax <= hi_range[1] + tolerance
+
+    assert gif_module._streaming_limits(data, -1, None)[0] == -1
+
+
+def test_per_band_limits():
+    data = np.random.default_rng(0).random((10, 3, 20, 30))
+    data *= np.array([1, 10, 100]).reshape(1, 3, 1, 1)
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=10)},
+    )
+
+    vmin, vmax = gif_module._stretch_limits(data, None, 1.5, True, per_band=True)
+    assert vmin == tuple(np.nanpercentile(data[:, b], 2) for b in range(3))
+    assert vmax == (1.5, 1.5, 1.5)
+
+    # each band is stretched to the full range
+    limits = gif_module._stretch_limits(data, None, None, True, per_band=True)
+    frame = _render_frame(data[0], *limits, None)
+    for band in range(3):
+        assert frame[..., band].max() == 255
+
+    expected = io.BytesIO()
+    gif(arr, to=expected, per_band=True)
+    expected = expected.getvalue()
+    together = io.BytesIO()
+    gif(arr, to=together)
+    assert expected != together.getvalue()
+
+    darr = arr.chunk({"time": 3})
+    for parallel in [True, False]:
+        result = dgif(
+            darr, bytes=True, parallel=parallel, robust_method="exact", per_band=True
+        )
+        assert result.compute() == expected
+    # not robust: each band's min and max
+    expected = io.BytesIO()
+    gif(arr, to=expected, robust=False, per_band=True)
+    result = dgif(darr, bytes=True, robust=False, per_band=True).compute()
+    assert result == expected.getvalue()
+
+
+@pytest.mark.parametrize("cmap", ["viridis", "tab10", "RdBu"])
+def test_render_frame_colormap_lut(cmap):
+    cmap = matplotlib.cm.get_cmap(cmap)
+    data = np.random.default_rng(0).random((1, 20, 30))
+    data[0, :3, :3] = np.nan
+
+    rgba = _render_frame(data, 0, 1, cmap)
+    expected = cmap(data[0].astype("f4"), bytes=True)
+    np.testing.assert_array_equal(rgba, expected)
+
+
+@pytest.mark.parametrize(
+    "dtype, bands", [("u1", 3), (">i2", 3), ("i1", 1), ("<u2", 1), (">i2", 1)]
+)
+def test_render_frame_int_lut(dtype, bands):
+    info = np.iinfo(dtype)
+    frame = np.random.default_rng(0).integers(
+        info.min, info.max, (bands, 20, 30), endpoint=True
+    )
+    frame = frame.astype(dtype)
+    cmap = matplotlib.cm.get_cmap() if bands == 1 else None
+    vmin, vmax = info.min / 2 + 0.3, info.max / 2 - 0.7
+    # float32 holds these exactly, and goes through the same arithmetic
+    expected = _render_frame(frame.astype("f4"), vmin, vmax, cmap)
+    np.testing.assert_array_equal(_render_frame(frame, vmin, vmax, cmap), expected)
+
+
+def test_gif_single_band_uses_colormap_palette():
+    data = np.linspace(0, 1, 12 * 20 * 30).reshape(12, 20, 30)
+    data[:, :4, :4] = np.nan
+    arr = xr.DataArray(data, dims=["time", "y", "x"])
+
+    out = io.BytesIO()
+    gif(arr, to=out, cmap="magma", vmin=0, vmax=1, date_format=None)
+    img = Image.open(io.BytesIO(out.getvalue()))
+    img.seek(5)
+    rgba = np.asarray(img.convert("RGBA")).astype(int)
+
+    expected = matplotlib.cm.get_cmap("magma")(data[5], bytes=True).astype(int)
+    valid = ~np.isnan(data[5])
+    # off by at most one level of the 255 in the palette
+    assert np.abs(rgba[valid] - expected[valid]).max() <= 6
+    assert all(f["transparency"] == 255 for f in gif_blocks(out.getvalue()))
+
+
+@pytest.mark.parametrize("dims", [("time", "y", "x"), ("time", "band", "y", "x")])
+def test_gif_global_palette(dims):
+    shape = {"time": 6, "band": 3, "y": 20, "x": 30}
+    data = np.random.default_rng(0).random([shape[d] for d in dims])
+    data[2, ..., :4, :4] = np.nan
+    arr = xr.DataArray(data, dims=dims)
+
+    out = io.BytesIO()
+    gif(arr, to=out, vmin=0, vmax=1, date_format=None, palette="global")
+    # a global color table in the header, and no local ones
+    assert out.getvalue()[10] & 0x80
+    frames = gif_blocks(out.getvalue())
+    assert len(frames) == 6
+    assert not any(f["local_palette"] for f in frames)
+
+    default = io.BytesIO()
+    gif(arr, to=default, vmin=0, vmax=1, date_format=None)
+    dgif_default = dgif(
+        arr.chunk({arr.dims[0]: 2}), bytes=True, vmin=0, vmax=1, date_format=None
+    ).compute()
+    if arr.ndim == 3:
+        # the colormap is the global palette by default too
+        assert default.getvalue() == out.getvalue()
+        assert dgif_default[10] & 0x80
+        assert not any(f["local_palette"] for f in gif_blocks(dgif_default))
+    else:
+        # each RGB frame gets its own color table by default
+        assert not default.getvalue()[10] & 0x80
+        assert all(f["local_palette"] for f in gif_blocks(default.getvalue()))
+        assert all(f["local_palette"] for f in gif_blocks(dgif_default))
+
+    img = Image.open(io.BytesIO(out.getvalue()))
+    img.seek(4)
+    rgb = np.asarray(img.convert("RGB")).astype(int)
+    cmap = matplotlib.cm.get_cmap("viridis") if arr.ndim == 3 else None
+    frame = data[4] if arr.ndim == 4 else data[4][None]
+    expected = _render_frame(frame, 0, 1, cmap)[..., :3].astype(int)
+    # uniform noise is the worst case for a 247-color palette
+    assert np.median(np.abs(rgb - expected)) <= 16
+
+
+def test_gif_delta():
+    data = np.full((12, 60, 80), 0.5)
+    rng = np.random.default_rng(0)
+    for t in range(12):
+        # a patch that moves and changes
+        rows = slice(10 + t, 20 + t)
+        data[t, rows, 30:40] = rng.random((10, 10))
+    # missing data that appears then goes away
+    data[3:6, :5] = np.nan
+    data[8, 40:, 60:] = np.nan
+    arr = xr.DataArray(
+        data,
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=12)},
+    )
+
+    full = io.BytesIO()
+    gif(arr, to=full, vmin=0, vmax=1)
+    out = io.BytesIO()
+    gif(arr, to=out, vmin=0, vmax=1, delta=True)
+    assert len(out.getvalue()) < len(full.getvalue())
+
+    frames = gif_blocks(out.getvalue())
+    assert len(frames) == 12
+    assert frames[0]["bbox"] == (0, 0, 80, 60)
+    assert all(f["bbox"][2] * f["bbox"][3] < 80 * 60 for f in frames[1:])
+    # frames right before pixels become transparent are cleared, the rest left in place
+    assert [f["disposal"] for f in frames] == [
+        2 if i in (2, 7) else 1 for i in range(12)
+    ]
+
+    full_img = Image.open(io.BytesIO(full.getvalue()))
+    img = Image.open(io.BytesIO(out.getvalue()))
+    for i in range(12):
+        full_img.seek(i)
+        img.seek(i)
+        valid = ~np.isnan(data[i])
+        np.testing.assert_array_equal(
+            np.asarray(img.convert("RGBA"))[valid],
+            np.asarray(full_img.convert("RGBA"))[valid],
+        )
+
+    # chunks rendered separately come out the same
+    delayed = dgif(arr.chunk({"time": 5}), bytes=True, vmin=0, vmax=1, delta=True)
+    assert delayed.compute() == out.getvalue()
+
+
+@pytest.mark.parametrize("dims", [("time", "y", "x"), ("time", "band", "y", "x")])
+@pytest.mark.parametrize("kwargs", [{}, {"palette": "frame"}, {"delta": True}])
+def test_gif_workers(dims, kwargs):
+    shape = {"time": 20, "band": 3, "y": 40, "x": 50}
+    data = np.random.default_rng(0).random([shape[d] for d in dims])
+    data[5:8, ..., :10, :10] = np.nan
+    arr = xr.DataArray(
+        data,
+        dims=dims,
+        coords={"time": pd.date_range("2021-01-01", periods=20)},
+    )
+
+    expected = io.BytesIO()
+    gif(arr, to=expected, **kwargs)
+    out = io.BytesIO()
+    gif(arr, to=out, workers=4, **kwargs)
+    assert out.getvalue() == expected.getvalue()
+
+
+@pytest.mark.parametrize("date_bg", [None, (0, 0, 128)])
+@pytest.mark.parametrize("label", ["2021-01-01", "Jan\n2021"])
+@pytest.mark.parametrize("date_position", ["ul", "lr"])
+def test_draw_label_matches_pillow(date_bg, label, date_position):
+    rng = np.random.default_rng(0)
+    rgba = rng.integers(0, 256, (40, 90, 4), dtype="uint8")
+    rgba[..., 3] = np.where(rng.random((40, 90)) < 0.3, 0, 255)
+    fnt = _get_font(20, [label], 90)
+
+    # draw it the way Pillow would
+    img = Image.fromarray(rgba)
+    d = ImageDraw.Draw(img)
+    x, y, t_bbox = _label_box(img.size, fnt, label, date_position)
+    t_width, t_height = t_bbox[2] - t_bbox[0], t_bbox[3] - t_bbox[1]
+    if date_bg:
+        pad = 0.1 * t_height
+        d.rectangle(
+            (x - pad, y - pad, x + t_width + pad, y + t_height + pad), fill=date_bg
+        )
+    d.multiline_text(
+        (x - t_bbox[0], y - t_bbox[1]), label, font=fnt, fill=(255, 200, 0)
+    )
+
+    _draw_label(rgba, label, fnt, date_position, (255, 200, 0), date_bg)
+    np.testing.assert_array_equal(rgba, np.asarray(img))
+
+
+def test_label_sprites_cached():
+    _LABEL_SPRITES.clear()
+    arr = xr.DataArray(
+        np.random.default_rng(0).random((12, 20, 30)),
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=12)},
+    )
+    with mock.patch.object(
+        gif_module,
+        "_render_indexed_label",
+        wraps=gif_module._render_indexed_label,
+    ) as render:
+        gif(arr, to=io.BytesIO(), date_format="%Y-%m")
+        assert render.call_count == 1
+        gif(arr, to=io.BytesIO(), date_format="%Y-%m")
+        assert render.call_count == 1
+        gif(arr, to=io.BytesIO(), date_format="%Y-%m-%d")
+        assert render.call_count == 13
+
+
+def test_gif_downsample():
+    data = np.random.default_rng(0).random((3, 50, 70))
+    data[:, :8, :8] = np.nan  # a whole 4x4 block (and more) is missing
+    data[:, 8:10, 8:10] = np.nan  # part of a block is missing
+    arr = xr.DataArray(
+        data,
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=3)},
+    )
+
+    out = io.BytesIO()
+    gif(arr, to=out, max_size=20, date_format=None)
+    img = Image.open(io.BytesIO(out.getvalue()))
+    # shrunk by 4, keeping the partial blocks at the edges
+    assert img.size == (18, 13)
+    transparent = np.asarray(img.convert("RGBA"))[..., 3] == 0
+    expected = np.zeros((13, 18), dtype=bool)
+    expected[:2, :2] = True
+    np.testing.assert_array_equal(transparent, expected)
+
+    # same as shrinking it ourselves
+    coarse = arr.coarsen(y=4, x=4, boundary="pad").mean()
+    expected_out = io.BytesIO()
+    gif(coarse, to=expected_out, date_format=None)
+    assert out.getvalue() == expected_out.getvalue()
+
+    scaled = io.BytesIO()
+    gif(arr, to=scaled, scale=4, date_format=None)
+    assert scaled.getvalue() == out.getvalue()
+
+    delayed = dgif(
+        arr.chunk({"x": 30}),
+        bytes=True,
+        max_size=20,
+        date_format=None,
+        robust_method="exact",
+    )
+    assert delayed.compute() == out.getvalue()
+
+
+@pytest.mark.parametrize("dtype", ["uint8", "int16"])
+def test_gif_downsample_ints(dtype: str):
+    info = np.iinfo(dtype)
+    data = np.random.default_rng(0).integers(info.min, info.max, (3, 50, 70), dtype)
+    arr = xr.DataArray(
+        data,
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=3)},
+    )
+    coarse = gif_module._downsample(arr, 20, 1)
+    assert coarse.dtype == dtype
+    expected = arr.coarsen(y=4, x=4, boundary="pad").mean().round()
+    np.testing.assert_array_equal(coarse, expected)
+    dcoarse = gif_module._downsample(arr.chunk({"x": 30}), 20, 1)
+    assert dcoarse.dtype == dtype
+    np.testing.assert_array_equal(dcoarse, coarse)
+
+    # Integers still take the exact, lookup-table paths after shrinking
+    with mock.patch.object(
+        gif_module, "_value_counts", wraps=gif_module._value_counts
+    ) as value_counts, mock.patch.object(
+        gif_module, "_int_lut", wraps=gif_module._int_lut
+    ) as int_lut:
+        out = gif(arr, max_size=20, robust_method="exact", date_format=None).data
+    assert value_counts.called and int_lut.called
+    assert out == gif(coarse, robust_method="exact", date_format=None).data
+
+
+def test_gif_select_frames():
+    data = np.random.default_rng(0).random((100, 20, 30))
+    arr = xr.DataArray(
+        data,
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=100)},
+    )
+
+    def n_frames(**kwargs) -> int:
+        out = io.BytesIO()
+        gif(arr, to=out, **kwargs)
+        return Image.open(io.BytesIO(out.getvalue())).n_frames
+
+    assert n_frames(max_frames=10) == 10
+    assert n_frames(max_frames=1000) == 100
+    assert n_frames(max_duration=0.5, fps=10) == 5
+    # Jan, Feb, Mar, Apr
+    assert n_frames(resample="MS") == 4
+    assert n_frames(resample="MS", max_frames=2) == 2
+
+    # first frame of each month
+    out = io.BytesIO()
+    gif(arr, to=out, resample="MS", vmin=0, vmax=1)
+    expected = io.BytesIO()
+    gif(arr.isel(time=[0, 31, 59, 90]), to=expected, vmin=0, vmax=1)
+    assert out.getvalue() == expected.getvalue()
+
+    with pytest.raises(TypeError, match="must be datetimes or timedeltas"):
+        gif(arr.drop_vars("time"), date_format=None, resample="MS")
+
+
+def test_dgif_select_frames_skips_chunks():
+    data = np.random.default_rng(0).random((100, 20, 30))
+    computed = []
+
+    def record(block, block_info=None):
+        computed.append(block_info[0]["chunk-location"][0])
+        return block
+
+    arr = xr.DataArray(
+        da.from_array(data, chunks=(10, 20, 30)).map_blocks(record, dtype=data.dtype),
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=100)},
+    )
+    result = dgif(arr, bytes=True, max_frames=3).compute(scheduler="sync")
+    assert Image.open(io.BytesIO(result)).n_frames == 3
+    # frames 0, 50, and 99
+    assert set(computed) == {0, 5, 9}
+
+
+@pytest.mark.parametrize(
+    "format, options",
+    [("webp", {"lossless": True}), ("webp", {"quality": 50, "method": 6}), ("png", {})],
+)
+def test_gif_formats(format, options):
+    data = np.random.default_rng(0).random((5, 1, 20, 30))
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=5)},
+    )
+    kwargs = dict(format=format, format_options=options, fps=10, date_format=None)
+    out = gif(arr, **kwargs).data
+    img = Image.open(io.BytesIO(out))
+    assert img.format == format.upper()
+    assert img.n_frames == 5
+    img.seek(1)
+    img.load()
+    assert img.info["duration"] == 100
+
+    if options.get("lossless") or format == "png":
+        # Colors aren't limited to a palette
+        vmin, vmax = np.percentile(data, [2, 98])
+        cmap = matplotlib.cm.get_cmap()
+        img = Image.open(io.BytesIO(out))
+        for i in range(5):
+            img.seek(i)
+            expected = _render_frame(data[i], vmin, vmax, cmap)
+            np.testing.assert_array_equal(np.asarray(img.convert("RGBA")), expected)
+
+    darr = arr.copy(data=da.from_array(data, chunks=(2, 1, 20, 30)))
+    for parallel in [True, False]:
+        result = dgif(
+            darr, bytes=True, robust_method="exact", parallel=parallel, **kwargs
+        )
+        assert result.compute() == gif(arr.copy(), **kwargs).data
+
+
+def mp4_frames(data: bytes, backend: str, tmp_path: Path) -> np.ndarray:
+    "Every frame of an MP4, as RGB, decoded with PyAV or (checked with ffprobe) ffmpeg"
+    if backend == "av":
+        import av
+
+        with av.open(io.BytesIO(data)) as container:
+            return np.stack(
+                [f.to_ndarray(format="rgb24") for f in container.decode(video=0)]
+            )
+
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-count_frames"]
+        + ["-show_entries", "stream=width,height,nb_read_frames", "-of", "json"]
+        + [str(path)],
+        check=True,
+        capture_output=True,
+    )
+    (stream,) = json.loads(probe.stdout)["streams"]
+    raw = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(path), "-f", "rawvideo"]
+        + ["-pix_fmt", "rgb24", "-"],
+        check=True,
+        capture_output=True,
+    ).stdout
+    frames = np.frombuffer(raw, dtype="uint8")
+    shape = (int(stream["nb_read_frames"]), stream["height"], stream["width"], 3)
+    assert frames.size == np.prod(shape)
+    return frames.reshape(shape)
+
+
+@pytest.mark.parametrize("backend", ["av", "ffmpeg"])
+def test_gif_mp4(backend, monkeypatch, tmp_path: Path):
+    if backend == "av":
+        pytest.importorskip("av")
+    else:
+        if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+            pytest.skip("ffmpeg is not installed")
+        # Make importing PyAV fail (if it's installed), so ffmpeg is used
+        monkeypatch.setitem(sys.modules, "av", None)
+
+    data = np.random.default_rng(0).random((12, 1, 21, 31))
+    data[3] = np.nan
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=12)},
+    )
+    kwargs = dict(format="mp4", nodata_color=(255, 0, 0), date_format=None)
+    out = gif(arr, **kwargs)
+    assert isinstance(out, IPython.display.Video)
+    data = out.data
+    assert isinstance(data, bytes)
+
+    frames = mp4_frames(data, backend, tmp_path)
+    assert len(frames) == 12
+    # Padded to even dimensions
+    assert frames[0].shape == (22, 32, 3)
+    # Missing pixels are the nodata color, give or take compression
+    np.testing.assert_allclose(
+        frames[3], np.broadcast_to([255, 0, 0], (22, 32, 3)), atol=8
+    )
+
+    darr = arr.copy(data=da.from_array(arr.data, chunks=(5, 1, 21, 31)))
+    result = dgif(darr, bytes=True, robust_method="exact", **kwargs).compute()
+    np.testing.assert_array_equal(mp4_frames(result, backend, tmp_path), frames)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("palette", ["global", "frame"])
+def test_gif_stats(tmp_path: Path, workers: int, palette: str):
+    data = np.random.default_rng(0).random((10, 3, 20, 30))
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=10)},
+    )
+    stats: list[dict] = []
+    tracemalloc.start()
+    try:
+        gif(
+            arr,
+            to=tmp_path / "test.gif",
+            stats=stats.append,
+            workers=workers,
+            palette=palette,
+        )
+    finally:
+        tracemalloc.stop()
+
+    (result,) = stats
+    assert result["frames"] == 10
+    assert result["bytes"] == (tmp_path / "test.gif").stat().st_size
+    assert result["memory"] > data.nbytes
+    assert result["tasks"] == 1
+    stages = result["stages"]
+    expected = {"limits", "render", "labels", "encode"}
+    expected.add("palette" if palette == "global" else "quantize")
+    assert set(stages) == expected
+    assert stages["labels"]["calls"] == stages["encode"]["calls"] == 10
+    if workers == 1:
+        # stages don't overlap
+        assert sum(s["seconds"] for s in stages.values()) <= result["seconds"]
+
+    # nothing is collected otherwise
+    assert gif_module._STATS.get() is None
+    gif(arr, to=io.BytesIO(), stats=None)
+    assert stats == [result]
+
+
+def test_stats_memory_overlap():
+    def measure(started: threading.Event, release: threading.Event):
+        with gif_module._measuring() as stats:
+            started.set()
+            release.wait()
+        return stats
+
+    tracemalloc.start()
+    try:
+        # tracemalloc can't tell apart measurements running at the same time in different threads
+        started, release = threading.Event(), threading.Event()
+        with ThreadPoolExecutor(1) as pool:
+            other = pool.submit(measure, started, release)
+            started.wait()
+            with gif_module._measuring() as stats:
+                release.set()
+                other.result()
+        assert stats.memory is None and other.result().memory is None
+        assert stats.seconds > 0
+
+        with gif_module._measuring() as stats:
+            block = np.ones(100_000)
+        assert stats.memory >= block.nbytes
+
+        arr = xr.DataArray(
+            da.from_array(np.random.default_rng(0).random((6, 20, 30)), chunks=2),
+            dims=["time", "y", "x"],
+            coords={"time": pd.date_range("2021-01-01", periods=6)},
+        )
+        delayed = dgif(arr, bytes=True, stats=True)
+        _, result = delayed.compute(scheduler="single-threaded")
+        assert result["memory"] > 0
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+@pytest.mark.parametrize("format", ["gif", "png"])
+def test_dgif_stats(parallel: bool, format: str):
+    arr = xr.DataArray(
+        da.from_array(
+            np.random.default_rng(0).random((10, 20, 30)), chunks=(3, 20, 30)
+        ),
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=10)},
+    )
+    kwargs = dict(parallel=parallel, format=format, robust_method="exact")
+    data, stats = dgif(arr, bytes=True, stats=True, **kwargs).compute()
+    assert data == dgif(arr, bytes=True, **kwargs).compute()
+    assert stats["frames"] == 10
+    assert stats["bytes"] == len(data)
+    # limits, one task per chunk, and assembling them
+    assert stats["tasks"] == (6 if parallel else 1)
+    assert stats["stages"]["render"]["calls"] == 10
+    assert stats["stages"]["limits"]["calls"] == 1
+
+    results = dgif_many({"a": arr, "b": arr}, stats=True, **kwargs).compute()
+    for key in ["a", "b"]:
+        assert results[key][0] == data
+        assert results[key][1]["frames"] == 10
+
+
+def gif_frames(data: bytes) -> list[np.ndarray]:
+    "Every frame of a GIF, as RGBA"
+    img = Image.open(io.BytesIO(data))
+    frames = []
+    for i in range(img.n_frames):
+        img.seek(i)
+        frames.append(np.asarray(img.convert("RGBA")))
+    return frames
+
+
+@pytest.mark.parametrize("dims", [("time", "y", "x"), ("time", "band", "y", "x")])
+def test_gif_tiles(dims):
+    shape = (5, 3, 50, 70) if "band" in dims else (5, 50, 70)
+    data = np.random.default_rng(0).random(shape)
+    data[1, ..., 10:20, 10:30] = np.nan
+    arr = xr.DataArray(
+        data, dims=dims, coords={"time": pd.date_range("2021-01-01", periods=5)}
+    )
+
+    indices, missing = gif_module._render_tiled_frame(
+        data[1][None] if data.ndim == 3 else data[1],
+        0,
+        1,
+        gif_module._colormap_palette(matplotlib.cm.get_cmap("viridis"), False, 0, 0),
+        None if data.ndim == 3 else lambda rgb: np.zeros(rgb.shape[:2], "uint8"),
+        16,
+    )
+    assert isinstance(indices, np.memmap) and indices.shape == (50, 70)
+    assert missing
+
+    # RGB palettes are sampled from thinned-out frames, which doesn't happen with one tile
+    tile_size = 16 if "band" not in dims else 70
+    expected = io.BytesIO()
+    gif(arr, to=expected, robust_method="histogram", palette="global")
+    tiled = io.BytesIO()
+    gif(arr, to=tiled, tile_size=tile_size, palette="global")
+    for a, b in zip(gif_frames(expected.getvalue()), gif_frames(tiled.getvalue())):
+        np.testing.assert_array_equal(a, b)
+
+    # tiles aren't all the same size at the edges, and each one's histogram is counted
+    limits = gif_module._streaming_limits(data.reshape(5, -1, 50, 70), None, None, 16)
+    assert limits == gif_module._streaming_limits(
+        data.reshape(5, -1, 50, 70), None, None
+    )
+
+    with pytest.raises(ValueError, match="tile_size"):
+        gif(arr, to=io.BytesIO(), tile_size=16, palette="global", delta=True)
+    with pytest.raises(ValueError, match="tile_size"):
+        gif(arr, to=io.BytesIO(), tile_size=16, palette="global", format="webp")
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_dgif_tiles(parallel: bool):
+    data = np.random.default_rng(0).random((5, 3, 50, 70))
+    data[1, :, 10:20, 10:30] = np.nan
+    arr = xr.DataArray(
+        da.from_array(data, chunks=(1, 3, 20, 30)),
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=5)},
+    )
+    expected = io.BytesIO()
+    gif(arr.compute(), to=expected, tile_size=70, palette="global")
+
+    delayed = dgif(arr, bytes=True, tile_size=70, palette="global", parallel=parallel)
+    if parallel:
+        # chunks that fit in a tile aren't rechunked; each is rendered separately
+        assert not any("rechunk" in str(k) for k in delayed.dask)
+        assert sum(str(k).startswith("_index_tile-") for k in delayed.dask) == 5 * 3 * 3
+    result = delayed.compute()
+    for a, b in zip(gif_frames(expected.getvalue()), gif_frames(result)):
+        np.testing.assert_array_equal(a, b)
+
+    # bigger chunks are split into tiles, and into single frames,
+    # so no task holds more than one frame of palette indices
+    delayed = dgif(arr.chunk(-1), bytes=True, tile_size=30, palette="global")
+    assert sum(str(k).startswith("_index_tile-") for k in delayed.dask) == 5 * 2 * 3
+    assert sum(str(k).startswith("_gif_tiles_chunk-") for k in delayed.dask) == 5
+    result = delayed.compute()
+    expected = io.BytesIO()
+    gif(arr.compute(), to=expected, tile_size=30, palette="global")
+    for a, b in zip(gif_frames(expected.getvalue()), gif_frames(result)):
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize("format", ["webp", "png", "gif"])
+def test_scratch_dir(tmp_path: Path, format: str):
+    data = np.random.default_rng(0).random((5, 3, 20, 30))
+    data[1, :, 5:10] = np.nan
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=5)},
+    )
+    if format == "gif":
+        # Only tiles use scratch files for GIFs
+        kwargs: dict = dict(tile_size=16, palette="global")
+    else:
+        kwargs = dict(format=format, format_options={"lossless": True})
+        kwargs["robust_method"] = "exact"
+    expected = gif(arr, **kwargs).data
+
+    assert gif(arr, scratch_dir=tmp_path, **kwargs).data == expected
+    # The scratch files are deleted as soon as they're made
+    assert not list(tmp_path.iterdir())
+    with pytest.raises(FileNotFoundError):
+        gif(arr, scratch_dir=tmp_path / "missing", **kwargs)
+
+    darr = arr.copy(data=da.from_array(data, chunks=(2, 3, 10, 30)))
+    for parallel in [True, False]:
+        result = dgif(
+            darr, bytes=True, parallel=parallel, scratch_dir=tmp_path, **kwargs
+        )
+        assert result.compute() == expected
+
+    frames = [np.full((2, 3, 4), i, dtype="uint8") for i in range(3)]
+    spilled = gif_module._spill(iter(frames), 3, tmp_path)
+    assert isinstance(spilled, np.memmap)
+    np.testing.assert_array_equal(spilled, np.stack(frames))
+
+
+@pytest.mark.parametrize("palette", ["global", "frame"])
+def test_encode(palette: Literal["global", "frame"]):
+    data = np.random.default_rng(0).random((6, 3, 20, 30))
+    data[2, :, 5:10] = np.nan
+    data[3:] = data[2]
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=6)},
+    )
+    limits = np.nanpercentile(data, [2, 98])
+    rgba = np.stack([_render_frame(frame, *limits, None) for frame in data])
+
+    # Same as `gif`, minus the rendering
+    for delta in [False, True]:
+        kwargs = dict(fps=10, palette=palette, delta=delta)
+        expected = gif(arr, date_format=None, **kwargs).data
+        assert encode(rgba, **kwargs).data == expected
+        assert encode(list(rgba), workers=3, **kwargs).data == expected
+    if palette == "frame":
+        assert encode(iter(rgba)).data == encode(rgba, palette=palette).data
+    else:
+        with pytest.raises(ValueError, match="palette='global'"):
+            encode(iter(rgba), palette=palette)
+
+    # RGB frames have no missing pixels
+    rgb = np.ascontiguousarray(rgba[1:2, ..., :3])
+    img = Image.open(io.BytesIO(encode(rgb, palette=palette).data))
+    assert "transparency" not in img.info
+    out = encode(rgb, format="png").data
+    np.testing.assert_array_equal(np.asarray(Image.open(io.BytesIO(out))), rgb[0])
+
+    results = []
+    encode(rgba, palette=palette, to=io.BytesIO(), stats=results.append)
+    assert results[0]["frames"] == 6
+    assert "encode" in results[0]["stages"]
+
+    with pytest.raises(ValueError, match="uint8"):
+        encode(data.transpose(0, 2, 3, 1))
+    with pytest.raises(ValueError, match="same shape"):
+        encode([rgba[0], rgba[1, :10]], palette="frame")
+    with pytest.raises(ValueError, match="No frames"):
+        encode([])
+
+
+def test_frame_image():
+    rgba = np.zeros((2, 3, 4), dtype="uint8")
+    img = gif_module._frame_image(rgba)
+    assert img.size == (3, 2)
+    # A view of the frame, not a copy
+    rgba[1, 2] = (1, 2, 3, 4)
+    assert img.getpixel((2, 1)) == (1, 2, 3, 4)
+
+    # Not C-contiguous, so it has to be copied
+    img = gif_module._frame_image(rgba[:, ::-1])
+    assert img.getpixel((0, 1)) == (1, 2, 3, 4)
+    rgba[1, 2] = (5, 6, 7, 8)
+    assert img.getpixel((0, 1)) == (1, 2, 3, 4)
+
+    # Pillow stores RGB with 4 bytes per pixel, so RGB frames are always copied
+    rgb = np.zeros((2, 3, 3), dtype="uint8")
+    img = gif_module._frame_image(rgb)
+    assert img.mode == "RGB" and img.size == (3, 2)
+    rgb[1, 2] = (1, 2, 3)
+    assert img.getpixel((2, 1)) == (0, 0, 0)
+
+    # Palette indices are used in place too
+    palette = gif_module._colormap_palette(
+        matplotlib.cm.get_cmap("viridis"), False, 0, 0
+    )
+    indices = np.zeros((2, 3), dtype="uint8")
+    img = gif_module._palette_image(indices, palette)
+    indices[1, 2] = 7
+    assert img.getpixel((2, 1)) == 7
+
+
+def test_encoder_lzw():
+    data = np.random.default_rng(0).random((4, 3, 40, 60))
+    data[1, :, 5:20] = np.nan
+    arr = xr.DataArray(
+        data,
+        dims=["time", "band", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=4)},
+    )
+    shapes = []
+
+    def encoder(indices: np.ndarray) -> bytes:
+        assert indices.dtype == np.uint8
+        shapes.append(indices.shape)
+        return lzw(indices)
+
+    for kwargs in [{}, dict(palette="global"), dict(palette="global", delta=True)]:
+        expected = gif(arr, **kwargs).data
+        shapes.clear()
+        assert gif(arr, encoder=encoder, workers=2, **kwargs).data == expected
+        assert len(shapes) == 4
+
+    rgba = np.stack([np.asarray(img) for img in gif_frames(expected)])
+    assert encode(rgba, encoder=lzw).data == encode(rgba).data
+
+    darr = arr.copy(data=da.from_array(data, chunks=(2, 3, 20, 30)))
+    for kwargs in [{}, dict(tile_size=30, palette="global"), dict(parallel=False)]:
+        expected = dgif(darr, bytes=True, **kwargs).compute()
+        assert dgif(darr, bytes=True, encoder=lzw, **kwargs).compute() == expected
+
+    blocks = gif_module._sub_blocks(bytes(600))
+    assert blocks == b"\xff" + bytes(255) + b"\xff" + bytes(255) + b"\x5a" + bytes(90)
+
+    with pytest.raises(ValueError, match="encoder"):
+        gif(arr, format="webp", encoder=lzw)
+    with pytest.raises(ValueError, match="encoder"):
+        dgif(darr, format="png", encoder="gifsicle")
+
+
+def test_encoder_gifsicle(tmp_path: Path, monkeypatch):
+    # A stand-in for gifsicle that writes the GIF back out as it is, and records its arguments
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "gifsicle"
+    script.write_text(f'#!/bin/sh\necho "$@" > {tmp_path}/args\nexec /bin/cat\n')
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+
+    arr = xr.DataArray(
+        np.random.default_rng(0).random((4, 20, 30)),
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=4)},
+        name="ndvi",
+    )
+    expected = gif(arr).data
+
+    results = []
+    out = gif(arr, encoder="gifsicle", stats=results.append).data
+    assert out == expected
+    assert results[0]["bytes"] == len(expected)
+    assert (tmp_path / "args").read_text().split() == ["--no-warnings", "--optimize=3"]
+
+    options = {"lossy": 20, "careful": True}
+    assert encode(gif_frames(expected), encoder="gifsicle", format_options=options)
+    assert (tmp_path / "args").read_text().split() == [
+        "--no-warnings",
+        "--lossy=20",
+        "--careful",
+    ]
+
+    darr = arr.chunk({"time": 2})
+    expected = dgif(darr, bytes=True).compute()
+    assert dgif(darr, bytes=True, encoder="gifsicle").compute() == expected
+    dgif(darr, to=tmp_path / "out.gif", encoder="gifsicle").compute()
+    assert (tmp_path / "out.gif").read_bytes() == expected
+
+    script.write_text(
+        '#!/bin/sh\n/bin/cat > /dev/null\necho "bad option" >&2\nexit 1\n'
+    )
+    with pytest.raises(RuntimeError, match="bad option"):
+        gif(arr, encoder="gifsicle")
+
+    monkeypatch.setenv("PATH", str(tmp_path / "missing"))
+    with pytest.raises(ImportError, match="gifsicle"):
+        gif(arr, encoder="gifsicle")
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_dgif_to(tmp_path: Path, parallel: bool):
+    arr = xr.DataArray(
+        da.from_array(np.random.default_rng(0).random((6, 20, 30)), chunks=(2, 20, 30)),
+        dims=["time", "y", "x"],
+        coords={"time": pd.date_range("2021-01-01", periods=6)},
+        name="ndvi",
+    )
+    expected = dgif(arr, bytes=True, parallel=parallel).compute()
+
+    template = str(tmp_path / "out" / "{name}-{start:%Y%m%d}-{end:%d}.gif")
+    info = dgif(arr, to=template, parallel=parallel).compute()
+    path = tmp_path / "out" / "ndvi-20210101-06.gif"
+    assert info["path"] == str(path)
+    assert info["size"] == len(expected)
+    assert info["frames"] == 6
+    assert info["seconds"] >= 0
+    assert path.read_bytes() == expected
+
+    store: dict = {}
+    info = dgif(arr, to=store, parallel=parallel).compute()
+    assert info["path"] == "ndvi"
+    assert store == {"ndvi": expected}
+
+    with pytest.raises(ValueError, match="must have a name"):
+        dgif(arr.rename(None), to=store)
+
+
+def test_dgif_many(tmp_path: Path):
+    rng = np.random.default_rng(0)
+    time = pd.date_range("2021-01-01", periods=6)
+    arrays = {
+        "dim": xr.DataArray(
+            da.from_array(rng.random((6, 20, 30)), chunks=(2, 20, 30)),
+            dims=["time", "y", "x"],
+            coords={"time": time},
+        ),
+        "bright": xr.DataArray(
+            da.from_array(rng.random((6, 20, 30)) + 10, chunks=(2, 20, 30)),
+            dims=["time", "y", "x"],
+            coords={"time": time},
+        ),
+        "two-bands": xr.DataArray(
+            da.zeros((6, 2, 20, 30)),
+            dims=["time", "band", "y", "x"],
+            coords={"time": time},
+        ),
+    }
+
+    results = dgif_many(arrays).compute()
+    assert list(results) == list(arrays)
+    assert isinstance(results["two-bands"], ValueError)
+    for key in ["dim", "bright"]:
+        assert results[key] == dgif(arrays[key], bytes=True).compute()
+
+    # A failure while rendering only fails that GIF: the default vmax is 1 for floats
+    ints = arrays["dim"].copy(data=(arrays["dim"].data * 100).astype(int))
+    results = dgif_many({"floats": arrays["dim"], "ints": ints}, robust=False, vmin=5)
+    results = results.compute()
+    assert isinstance(results["floats"], ValueError)
+    assert results["ints"] == dgif(ints, bytes=True, robust=False, vmin=5).compute()
+
+    # So does a failure while computing an array itself, even in threads shared with the others
+    def poison(block: np.ndarray) -> np.ndarray:
+        raise OSError("failed to read")
+
+    poisoned = arrays["dim"].copy(
+        data=arrays["dim"].data.map_blocks(poison, dtype=float) + 1
+    )
+    good = {key: arrays[key] for key in ["dim", "bright"]}
+    for kwargs in [{}, dict(robust=False), dict(stats=True), dict(parallel=False)]:
+        results = dgif_many({**good, "poisoned": poisoned}, **kwargs).compute()
+        assert isinstance(results["poisoned"], OSError)
+        for key, arr in good.items():
+            expected = dgif(arr, bytes=True, **kwargs).compute()
+            if kwargs.get("stats"):
+                assert results[key][0] == expected[0]
+            else:
+                assert results[key] == expected
+    # Arrays that share limits with it can't be made either
+    results = dgif_many({**good, "poisoned": poisoned}, shared_limits=True).compute()
+    assert all(isinstance(result, OSError) for result in results.values())
+
+    to: dict = {}
+    results = dgif_many(arrays, to=to, shared_limits=True, robust=False).compute()
+    assert results["dim"]["path"] == "dim" and results["bright"]["path"] == "bright"
+    assert set(to) == {"dim", "bright"}
+    vmin = float(arrays["dim"].min())
+    vmax = float(arrays["bright"].max())
+    for key in ["dim", "bright"]:
+        expected = dgif(arrays[key], bytes=True, robust=False, vmin=vmin, vmax=vmax)
+        assert to[key] == expected.compute()
+
+    # per-band limits are shared only between the RGB arrays, band by band
+    rgb = xr.concat([arrays["dim"], arrays["bright"], arrays["dim"] * 2], "band")
+    rgb = rgb.transpose("time", "band", "y", "x")
+    results = dgif_many(
+        {"dim": arrays["dim"], "rgb": rgb, "rgb2": rgb * 2},
+        shared_limits=True,
+        robust=False,
+        per_band=True,
+    ).compute()
+    assert results["dim"] == dgif(arrays["dim"], bytes=True, robust=False).compute()
+    vmin = tuple(float(rgb[:, b].min()) for b in range(3))
+    vmax = tuple(float(rgb[:, b].max()) * 2 for b in range(3))
+    for key, arr in [("rgb", rgb), ("rgb2", rgb * 2)]:
+        expected = dgif(arr, bytes=True, robust=False, vmin=vmin, vmax=vmax)
+        assert results[key] == expected.compute()
+
+    results = dgif_many(arrays, to=tmp_path / "gifs", parallel=False).compute()
+    assert isinstance(results["two-bands"], ValueError)
+    assert results["dim"]["path"] == str(tmp_path / "gifs" / "dim.gif")
+    assert sorted(p.name for p in (tmp_path / "gifs").iterdir()) == [
+        "bright.gif",
+        "dim.gif",
+    ]
+    assert (tmp_path / "gifs" / "dim.gif").read_bytes() == dgif(
+        arrays["dim"], bytes=True, parallel=False
+    ).compute()
+
+
 @pytest.fixture(scope="module")
 def module_tmp_path(tmp_path_factory):
     # Hypothesis complains about using a function-level fixture
@@ -37,8 +1199,18 @@ def xerrs(
     cmap: str | matplotlib.colors.Colormap | None,
     arr: xr.DataArray,
     date_format: str | None,
+    tile_size: int | None = None,
+    format: str = "gif",
+    palette: str = "global",
+    delta: bool = False,
 ) -> list[tuple[bool, Exception]]:
+    rgb = arr.ndim == 4 and arr.shape[1] > 1
     return [
+        (
+            tile_size is not None
+            and (format != "gif" or delta or (palette == "frame" and rgb)),
+            ValueError("`tile_size`"),
+        ),
         (
             bool(cmap) and arr.ndim == 4 and arr.shape[1] != 1,
             ValueError("Colormaps are only possible on single-band data"),
@@ -60,13 +1232,24 @@ def xerrs(
     to=st.sampled_from([None, "tempfile"]) | st.from_type(BinaryIO),
     fps=st.integers(1, 60),
     robust=st.booleans(),
+    robust_method=st.sampled_from(["histogram", "exact"]),
     vmin=st.none() | st.floats(),
     vmax=st.none() | st.floats(),
+    per_band=st.booleans(),
     cmap=colormaps,
     date_format=st.none() | date_formats,
     date_position=st.sampled_from(["ul", "ur", "ll", "lr"]),
     date_color=rgb,
     date_bg=st.none() | rgb,
+    palette=st.sampled_from(["global", "frame"]),
+    delta=st.booleans(),
+    format=st.sampled_from(["gif", "webp", "png"]),
+    workers=st.none() | st.integers(1, 4),
+    tile_size=st.none() | st.integers(1, 64),
+    max_size=st.none() | st.integers(1, 64),
+    scale=st.integers(1, 3),
+    max_frames=st.none() | st.integers(1, 5),
+    max_duration=st.none() | st.floats(0.01, 10),
     date_size=st.integers(1, 100)
     | st.floats(
         0,
@@ -78,19 +1261,30 @@ def xerrs(
         exclude_max=True,
     ),
 )
-@settings(max_examples=500)
+@settings(max_examples=500, deadline=None)
 def test_gif(
     arr: xr.DataArray,
     to,
     fps: int,
     robust: bool,
+    robust_method: Literal["histogram", "exact"],
     vmin: float | None,
     vmax: float | None,
+    per_band: bool,
     cmap: str | matplotlib.colors.Colormap | None,
     date_format: str | None,
     date_position: Literal["ul", "ur", "ll", "lr"],
     date_color: tuple[int, int, int],
     date_bg: tuple[int, int, int] | None,
+    palette: Literal["global", "frame"],
+    delta: bool,
+    format: Literal["gif", "webp", "png"],
+    workers: int | None,
+    tile_size: int | None,
+    max_size: int | None,
+    scale: int,
+    max_frames: int | None,
+    max_duration: float | None,
     date_size: int | float,
     module_tmp_path: Path,
 ):
@@ -98,7 +1292,7 @@ def test_gif(
         to = module_tmp_path / "test.gif"
 
     succeeded = False
-    errs = xerrs(cmap, arr, date_format)
+    errs = xerrs(cmap, arr, date_format, tile_size, format, palette, delta)
     note(str([e for c, e in errs if c]))
     with ignore(ValueError(r"is less than the default (vmin|vmax)")), xerr(errs):
         out = gif(
@@ -106,14 +1300,25 @@ def test_gif(
             to=to,
             fps=fps,
             robust=robust,
+            robust_method=robust_method,
             vmin=vmin,
             vmax=vmax,
+            per_band=per_band,
             cmap=cmap,
             date_format=date_format,
             date_position=date_position,
             date_color=date_color,
             date_bg=date_bg,
             date_size=date_size,
+            palette=palette,
+            delta=delta,
+            format=format,
+            workers=workers,
+            tile_size=tile_size,
+            max_size=max_size,
+            scale=scale,
+            max_frames=max_frames,
+            max_duration=max_duration,
         )
         succeeded = True
 
@@ -136,6 +1341,10 @@ def test_gif(
     else:
         raise RuntimeError(f"unreachable. type(to): {type(to)}")
 
+    if format != "gif":
+        assert Image.open(io.BytesIO(data)).format == format.upper()
+        return
+
     header, rest = data[:3], data[3:]
     assert header == b"GIF"
     assert len(rest) > 0
@@ -144,32 +1353,54 @@ def test_gif(
 @given(
     arr=dataarrays(dask=True),
     bytes_=st.booleans(),
+    parallel=st.booleans(),
     fps=st.integers(1, 60),
     robust=st.booleans(),
+    robust_method=st.sampled_from(["histogram", "exact"]),
     vmin=st.none() | st.floats(),
     vmax=st.none() | st.floats(),
+    per_band=st.booleans(),
     cmap=colormaps,
     date_format=st.none() | date_formats,
     date_position=st.sampled_from(["ul", "ur", "ll", "lr"]),
     date_color=rgb,
     date_bg=st.none() | rgb,
+    palette=st.sampled_from(["global", "frame"]),
+    delta=st.booleans(),
+    format=st.sampled_from(["gif", "webp", "png"]),
+    tile_size=st.none() | st.integers(1, 64),
+    max_size=st.none() | st.integers(1, 64),
+    scale=st.integers(1, 3),
+    max_frames=st.none() | st.integers(1, 5),
+    max_duration=st.none() | st.floats(0.01, 10),
 )
-@settings(max_examples=500)
+@settings(max_examples=500, deadline=None)
 def test_dgif(
     arr: xr.DataArray,
     bytes_: bool,
+    parallel: bool,
     fps: int,
     robust: bool,
+    robust_method: Literal["histogram", "exact"],
     vmin: float | None,
     vmax: float | None,
+    per_band: bool,
     cmap: str | matplotlib.colors.Colormap | None,
     date_format: str | None,
     date_position: Literal["ul", "ur", "ll", "lr"],
     date_color: tuple[int, int, int],
     date_bg: tuple[int, int, int] | None,
+    palette: Literal["global", "frame"],
+    delta: bool,
+    format: Literal["gif", "webp", "png"],
+    tile_size: int | None,
+    max_size: int | None,
+    scale: int,
+    max_frames: int | None,
+    max_duration: float | None,
 ):
     succeeded = False
-    errs = xerrs(cmap, arr, date_format)
+    errs = xerrs(cmap, arr, date_format, tile_size, format, palette, delta)
     note(str([e for c, e in errs if c]))
     with xerr(errs):
 
@@ -184,15 +1415,26 @@ def test_dgif(
             delayed = dgif(
                 arr,
                 bytes=bytes_,
+                parallel=parallel,
                 fps=fps,
                 robust=robust,
+                robust_method=robust_method,
                 vmin=vmin,
                 vmax=vmax,
+                per_band=per_band,
                 cmap=cmap,
                 date_format=date_format,
                 date_position=date_position,
                 date_color=date_color,
                 date_bg=date_bg,
+                palette=palette,
+                delta=delta,
+                format=format,
+                tile_size=tile_size,
+                max_size=max_size,
+                scale=scale,
+                max_frames=max_frames,
+                max_duration=max_duration,
             )
             mock_optimize.assert_called_once()
         succeeded = True
@@ -215,6 +1457,10 @@ def test_dgif(
         assert isinstance(result, IPython.display.Image)
         data = result.data
 
+    if format != "gif":
+        assert Image.open(io.BytesIO(data)).format == format.upper()
+        return
+
     header, rest = data[:3], data[3:]
     assert header == b"GIF"
     assert len(rest) > 0
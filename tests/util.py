@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import contextlib
 import re
+import struct
 from typing import Any, Callable
 
 import pytest
@@ -46,3 +47,94 @@ def ignore(*errs: Exception):
             if isinstance(e, type(match)) and re.search(str(match), e_str):
                 return
         raise
+
+
+def gif_blocks(data: bytes) -> list[dict[str, Any]]:
+    """
+    Walk the blocks of a GIF, returning the control info of each frame.
+
+    Each frame is a dict with ``disposal``, ``transparency`` (None if unset), ``duration``,
+    ``bbox`` (x, y, width, height), and ``local_palette`` (whether it has a local color table).
+    """
+    assert data[:6] == b"GIF89a", data[:6]
+    flags = data[10]
+    i = 13
+    if flags & 0x80:
+        i += 3 * (2 << (flags & 0x07))
+
+    def skip_sub_blocks(i: int) -> int:
+        while data[i]:
+            i += data[i] + 1
+        return i + 1
+
+    frames = []
+    control: dict[str, Any] = {}
+    while data[i] != 0x3B:  # trailer
+        if data[i] == 0x21:  # extension
+            if data[i + 1] == 0xF9:
+                packed, duration, transparency = struct.unpack_from("<BHB", data, i + 3)
+                control = dict(
+                    disposal=(packed >> 2) & 0x07,
+                    transparency=transparency if packed & 1 else None,
+                    duration=duration,
+                )
+            i = skip_sub_blocks(i + 2)
+        elif data[i] == 0x2C:  # image descriptor
+            bbox = struct.unpack_from("<HHHH", data, i + 1)
+            flags = data[i + 9]
+            i += 10
+            if flags & 0x80:
+                i += 3 * (2 << (flags & 0x07))
+            i = skip_sub_blocks(i + 1)  # skip the LZW minimum code size, then the data
+            frames.append(dict(control, bbox=bbox, local_palette=bool(flags & 0x80)))
+            control = {}
+        else:
+            raise ValueError(f"Unexpected block {data[i]:#x} at offset {i}")
+    return frames
+
+
+def lzw(indices) -> bytes:
+    """
+    LZW-compress 8-bit GIF pixel indices the slow, simple way, to check custom encoders.
+
+    Codes are packed least-significant bit first; the table is cleared when it's full.
+    """
+    clear, end = 256, 257
+    bits = n_bits = 0
+    out = bytearray()
+
+    def emit(code: int, width: int) -> None:
+        nonlocal bits, n_bits
+        bits |= code << n_bits
+        n_bits += width
+        while n_bits >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            n_bits -= 8
+
+    def reset() -> tuple[dict[bytes, int], int, int]:
+        return {bytes([i]): i for i in range(256)}, end + 1, 9
+
+    table, next_code, width = reset()
+    emit(clear, width)
+    word = b""
+    for byte in indices.tobytes():
+        extended = word + bytes([byte])
+        if extended in table:
+            word = extended
+            continue
+        emit(table[word], width)
+        if next_code < 4096:
+            table[extended] = next_code
+            next_code += 1
+            if next_code > 1 << width and width < 12:
+                width += 1
+        else:
+            emit(clear, width)
+            table, next_code, width = reset()
+        word = bytes([byte])
+    emit(table[word], width)
+    emit(end, width)
+    if n_bits:
+        out.append(bits & 0xFF)
+    return bytes(out)